@@ -1,5 +1,74 @@
+import datetime
+
 from django.contrib import admin
-from .models import UserProfile, Category, Budget, Transaction, FinancialTip, SavingsGoal
+from django.contrib.admin.views.main import ChangeList
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import (
+    UserProfile, Category, Budget, Transaction, FinancialTip, SavingsGoal, MonthlyCategoryTotal,
+    CategoryTemplate, CategoryTemplateItem
+)
+from .pagination import EstimatedCountPaginator
+from .periods import month_range
+
+USER_PARAM = 'user__id__exact'
+
+
+class RollupMonthFilter(admin.SimpleListFilter):
+    """Month filter listing the months found in the monthly rollups
+
+    Replaces date_hierarchy, whose drill-down runs a DISTINCT over the
+    dates of the whole (filtered) transaction table.
+    """
+    title = 'month'
+    parameter_name = 'month'
+    max_months = 36
+
+    def lookups(self, request, model_admin):
+        months = MonthlyCategoryTotal.objects.order_by('-year', '-month')
+        if request.GET.get(USER_PARAM, '').isdigit():
+            months = months.filter(user_id=request.GET[USER_PARAM])
+        months = months.values_list('year', 'month').distinct()[:self.max_months]
+        return [
+            (f'{year}-{month:02d}', datetime.date(year, month, 1).strftime('%B %Y'))
+            for year, month in months
+        ]
+
+    def queryset(self, request, queryset):
+        try:
+            year, month = (int(part) for part in self.value().split('-'))
+            return queryset.filter(**month_range(year, month))
+        except (AttributeError, ValueError):
+            return queryset
+
+
+class UserCategoryFilter(admin.SimpleListFilter):
+    """Category filter offered only once the list is filtered to one user"""
+    title = 'category'
+    parameter_name = 'category__id__exact'
+
+    def lookups(self, request, model_admin):
+        user_id = request.GET.get(USER_PARAM, '')
+        if not user_id.isdigit():
+            return []
+        return list(Category.objects.filter(user_id=user_id).order_by('name').values_list('pk', 'name'))
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(category_id=self.value())
+        return queryset
+
+
+class TransactionChangeList(ChangeList):
+    """Changelist rendering rows from TransactionQuerySet.for_display()
+
+    Kept off ModelAdmin.get_queryset: the change view saves only the loaded
+    fields, so the deferred updated_at would never move.
+    """
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_display()
 
 
 @admin.register(UserProfile)
@@ -7,6 +76,8 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'monthly_income', 'savings_goal', 'created_at']
     list_filter = ['created_at']
     search_fields = ['user__username', 'user__email']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
 @admin.register(Category)
@@ -14,6 +85,8 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'category_type', 'user', 'icon', 'color']
     list_filter = ['category_type', 'created_at']
     search_fields = ['name', 'user__username']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
 @admin.register(Budget)
@@ -21,6 +94,12 @@ class BudgetAdmin(admin.ModelAdmin):
     list_display = ['user', 'category', 'amount', 'month', 'year', 'percentage_used']
     list_filter = ['month', 'year', 'category__category_type']
     search_fields = ['user__username', 'category__name']
+    list_select_related = ['user', 'category']
+    autocomplete_fields = ['user', 'category']
+
+    def get_queryset(self, request):
+        # Spend for the whole page comes from one correlated subquery
+        return super().get_queryset(request).with_spend()
     
     def percentage_used(self, obj):
         return f"{obj.percentage_used:.1f}%"
@@ -29,10 +108,26 @@ class BudgetAdmin(admin.ModelAdmin):
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ['user', 'description', 'category', 'amount', 'transaction_type', 'date']
-    list_filter = ['transaction_type', 'category', 'date']
+    list_display = ['owner', 'description', 'category', 'amount', 'transaction_type', 'date']
+    list_filter = ['transaction_type', RollupMonthFilter, UserCategoryFilter]
     search_fields = ['description', 'user__username', 'category__name']
-    date_hierarchy = 'date'
+    list_select_related = ['user', 'category']
+    autocomplete_fields = ['user', 'category']
+    ordering = ['-date', '-created_at', 'id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'category')
+
+    def get_changelist(self, request, **kwargs):
+        return TransactionChangeList
+
+    def owner(self, obj):
+        url = reverse('admin:budget_transaction_changelist')
+        return format_html('<a href="{}?{}={}">{}</a>', url, USER_PARAM, obj.user_id, obj.user)
+    owner.short_description = 'User'
+    owner.admin_order_field = 'user__username'
 
 
 @admin.register(FinancialTip)
@@ -47,7 +142,21 @@ class SavingsGoalAdmin(admin.ModelAdmin):
     list_display = ['user', 'title', 'target_amount', 'current_amount', 'progress_percentage', 'target_date']
     list_filter = ['target_date', 'created_at']
     search_fields = ['title', 'user__username']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
     
     def progress_percentage(self, obj):
         return f"{obj.progress_percentage:.1f}%"
     progress_percentage.short_description = 'Progress %'
+
+
+class CategoryTemplateItemInline(admin.TabularInline):
+    model = CategoryTemplateItem
+    extra = 1
+
+
+@admin.register(CategoryTemplate)
+class CategoryTemplateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'description', 'created_at']
+    search_fields = ['name']
+    inlines = [CategoryTemplateItemInline]
@@ -0,0 +1,128 @@
+"""Aggregate figures for the dashboard, reports and chart APIs"""
+from datetime import timedelta
+
+from django.db.models import Q, Sum
+
+from .models import MonthlyCategoryTotal, Transaction
+from .periods import shift_month
+
+
+def _sum(field, condition):
+    return Sum(field, filter=condition, default=0)
+
+
+def monthly_windows(user, year, month):
+    """Income/expense totals for the given month, the month before and all time
+
+    Every window, plus the all-time transaction count, comes back from one
+    conditional aggregate over the rollup table.
+    """
+    last_year, last_month = shift_month(year, month, -1)
+    current = Q(year=year, month=month)
+    previous = Q(year=last_year, month=last_month)
+    income = Q(transaction_type='income')
+    expense = Q(transaction_type='expense')
+    return MonthlyCategoryTotal.objects.filter(user=user).aggregate(
+        current_income=_sum('total', current & income),
+        current_expenses=_sum('total', current & expense),
+        last_income=_sum('total', previous & income),
+        last_expenses=_sum('total', previous & expense),
+        all_time_income=_sum('total', income),
+        all_time_expenses=_sum('total', expense),
+        transaction_count=Sum('transaction_count', default=0),
+    )
+
+
+def recent_window(user, today, days=30):
+    """Income/expense totals for the trailing window of days, in one query"""
+    return Transaction.objects.filter(
+        user=user,
+        date__gte=today - timedelta(days=days)
+    ).aggregate(
+        income=_sum('amount', Q(transaction_type='income')),
+        expenses=_sum('amount', Q(transaction_type='expense')),
+    )
+
+
+def dashboard_totals(user, year, month, today):
+    """Resolve the dashboard's income/expense figures with a fixed query count
+
+    Falls back from the current month to last month and then to the last 30
+    days when a window is empty, as long as the user has any data at all.
+    At most two queries run whichever window is chosen.
+    """
+    windows = monthly_windows(user, year, month)
+    income, expenses = windows['current_income'], windows['current_expenses']
+    has_history = windows['all_time_income'] > 0 or windows['all_time_expenses'] > 0
+    if income == 0 and expenses == 0 and has_history:
+        income, expenses = windows['last_income'], windows['last_expenses']
+        if income == 0 and expenses == 0:
+            recent = recent_window(user, today)
+            income, expenses = recent['income'], recent['expenses']
+    return {
+        'income': income,
+        'expenses': expenses,
+        'transaction_count': windows['transaction_count'],
+    }
+
+
+TREND_WINDOWS = (6, 12, 24, 60)
+
+
+def month_window(start_year, start_month, end_year, end_month):
+    """Q selecting rollup rows from (start_year, start_month) to (end_year, end_month) inclusive"""
+    condition = Q()
+    if start_year is not None:
+        condition &= Q(year__gt=start_year) | Q(year=start_year, month__gte=start_month)
+    if end_year is not None:
+        condition &= Q(year__lt=end_year) | Q(year=end_year, month__lte=end_month)
+    return condition
+
+
+def monthly_trend(user, year, month, months=6):
+    """Income, expenses and savings for the months window ending at (year, month)
+
+    Returns oldest-first rows for every month in the window, zero-filled where
+    the user has no transactions, from a single grouped query.
+    """
+    start_year, start_month = shift_month(year, month, -(months - 1))
+    in_window = month_window(start_year, start_month, year, month)
+    rows = MonthlyCategoryTotal.objects.filter(in_window, user=user).values(
+        'year', 'month'
+    ).annotate(
+        income=_sum('total', Q(transaction_type='income')),
+        expenses=_sum('total', Q(transaction_type='expense')),
+    ).order_by()
+    totals = {(row['year'], row['month']): row for row in rows}
+
+    trend = []
+    for offset in range(months):
+        trend_year, trend_month = shift_month(start_year, start_month, offset)
+        row = totals.get((trend_year, trend_month), {'income': 0, 'expenses': 0})
+        trend.append({
+            'month': f"{trend_month}/{trend_year}",
+            'income': float(row['income']),
+            'expenses': float(row['expenses']),
+            'savings': float(row['income'] - row['expenses'])
+        })
+    return trend
+
+
+def approximate_transaction_count(user, start_date=None, end_date=None, category=None, transaction_type=None):
+    """Count the user's transactions matching the list filters from the rollups
+
+    Exact without a date filter; with one, whole months at either end of the
+    range are counted, so the figure can overshoot by up to two months.
+    """
+    rows = MonthlyCategoryTotal.objects.filter(
+        month_window(
+            start_date.year if start_date else None, start_date.month if start_date else None,
+            end_date.year if end_date else None, end_date.month if end_date else None
+        ),
+        user=user
+    )
+    if category is not None:
+        rows = rows.filter(category=category)
+    if transaction_type:
+        rows = rows.filter(transaction_type=transaction_type)
+    return rows.aggregate(count=Sum('transaction_count', default=0))['count']
@@ -0,0 +1,211 @@
+"""Benchmarks for the hot views and model properties
+
+Each dataset is one generated user (see budget.datasets) of a fixed size.
+Every case is run a number of times with a fresh payload-cache version, so
+the measured work is what a user sees right after changing their data,
+and reports the median and best wall time, the query count and the peak
+memory allocated while it ran. Results are plain dicts that can be written
+as JSON and compared with a stored baseline; BASELINE_PATH is the one kept
+in the repository.
+"""
+import datetime
+import gc
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from .cache import bump_data_version
+from .datasets import DatasetSpec, create_users, generate_user
+from .models import Budget, Category, SavingsGoal, Transaction, UserProfile
+from .pagination import KeysetPaginator
+from .periods import current_period
+from .views import TRANSACTION_PAGE_ORDERING
+
+DATASETS = {
+    'small': 200,
+    'medium': 2_000,
+    'heavy': 20_000,
+}
+DATASET_YEARS = 3
+DEEP_PAGE_FRACTION = 0.9
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.2
+
+
+def seed_dataset(name, seed=0):
+    """Create the dataset's user and return it"""
+    user_id = create_users(f'bench-{name}-', 1, 'benchmark')[0]
+    spec = DatasetSpec(transactions=DATASETS[name], years=DATASET_YEARS, seed=seed)
+    generate_user(user_id, 0, spec)
+    return User.objects.get(pk=user_id)
+
+
+def deep_cursor(user):
+    """Cursor for the transaction list page DEEP_PAGE_FRACTION of the way down"""
+    transactions = Transaction.objects.filter(user=user)
+    paginator = KeysetPaginator(transactions, TRANSACTION_PAGE_ORDERING, 20)
+    offset = int(transactions.count() * DEEP_PAGE_FRACTION)
+    row = transactions.order_by(*TRANSACTION_PAGE_ORDERING)[offset:offset + 1].first()
+    return paginator.encode_cursor(row, 'next') if row else None
+
+
+def view_cases(user):
+    """(name, callable) pairs requesting each hot view as the user"""
+    client = Client()
+    client.force_login(user)
+
+    def get(url, data=None):
+        def run():
+            response = client.get(url, data)
+            assert response.status_code == 200, f'{url} returned {response.status_code}'
+        return run
+
+    cursor = deep_cursor(user)
+    return [
+        ('dashboard', get(reverse('dashboard'))),
+        ('transaction_list', get(reverse('transaction_list'))),
+        ('transaction_list_deep', get(reverse('transaction_list'), {'cursor': cursor})),
+        ('budget_overview', get(reverse('budget_overview'))),
+        ('reports_view', get(reverse('reports_view'))),
+        ('category_list', get(reverse('category_list'))),
+        ('expense_data_api', get(reverse('expense_data_api'))),
+        ('budget_progress_api', get(reverse('budget_progress_api'))),
+    ]
+
+
+def property_cases(user):
+    """(name, callable) pairs reading each model property on fresh instances"""
+    year, month = current_period()
+
+    def profile_totals():
+        profile = UserProfile.objects.get(user=user)
+        return profile.current_month_income, profile.current_month_expenses, profile.current_savings
+
+    def budget_spend():
+        return [
+            (budget.spent_amount, budget.remaining_amount, budget.percentage_used, budget.is_over_budget)
+            for budget in Budget.objects.filter(user=user, year=year, month=month)
+        ]
+
+    def category_totals():
+        return [category.current_month_total for category in Category.objects.filter(user=user)]
+
+    def goal_progress():
+        return [goal.progress_percentage for goal in SavingsGoal.objects.filter(user=user)]
+
+    return [
+        ('UserProfile.current_savings', profile_totals),
+        ('Budget.spent_amount', budget_spend),
+        ('Category.current_month_total', category_totals),
+        ('SavingsGoal.progress_percentage', goal_progress),
+    ]
+
+
+class QueryCounter:
+    """execute_wrapper counting queries
+
+    Used instead of CaptureQueriesContext, whose log is cleared by the
+    request_started signal in the middle of a client request.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(run, user, repeat):
+    """Time run() repeat times and return its wall time, query and memory figures
+
+    An untimed first run fills per-process caches such as the category
+    registry, so the query count does not depend on repeat. Peak memory
+    comes from one extra run under tracemalloc, which would otherwise slow
+    down the timed runs.
+    """
+    bump_data_version(user.pk)
+    run()
+    timings = []
+    for _ in range(repeat):
+        bump_data_version(user.pk)
+        gc.collect()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+
+    bump_data_version(user.pk)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'queries': counter.count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(datasets=DATASETS, repeat=5, progress=None):
+    """Seed each dataset and measure every case against it
+
+    Returns {'meta': {...}, 'results': {dataset: {case: figures}}}. Must run
+    against a disposable database, such as the test database. The category
+    registry is on, as in a deployment with a shared cache, so the figures
+    do not depend on the configured cache backend.
+    """
+    results = {}
+    with override_settings(
+        BUDGET_QUERY_INSPECTOR_MODE='', BUDGET_PROFILE_SAMPLE_RATE=0, BUDGET_CATEGORY_REGISTRY=True
+    ):
+        for name in datasets:
+            user = seed_dataset(name)
+            results[name] = {}
+            for case, run in view_cases(user) + property_cases(user):
+                results[name][case] = measure(run, user, repeat)
+                if progress:
+                    progress(name, case, results[name][case])
+    return {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'repeat': repeat,
+            'vendor': connection.vendor,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=None):
+    """List the cases that regressed against the baseline
+
+    A case regresses when it runs more queries than before or, given a
+    threshold (a fraction), when its median time or peak memory grows by
+    more than that. Time and memory depend on the machine, so only compare
+    them with a baseline taken on the same one. Cases missing from either
+    side are ignored.
+    """
+    regressions = []
+    for dataset, cases in current['results'].items():
+        for case, figures in cases.items():
+            before = baseline.get('results', {}).get(dataset, {}).get(case)
+            if before is None:
+                continue
+            for metric in ('median_ms', 'peak_kb') if threshold is not None else ():
+                if before[metric] and figures[metric] > before[metric] * (1 + threshold):
+                    regressions.append((dataset, case, metric, before[metric], figures[metric]))
+            if figures['queries'] > before['queries']:
+                regressions.append((dataset, case, 'queries', before['queries'], figures['queries']))
+    return regressions
@@ -0,0 +1,188 @@
+"""Per-user versioned cache for computed page and API payloads
+
+Every cached payload key embeds the user's data version. Writes to any of the
+user's budget data bump the version (see budget.signals), which makes all of
+their cached payloads unreachable at once; stale entries are then left to
+expire through the timeout or the backend's eviction.
+"""
+import datetime
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .metrics import record_cache_lookup
+
+DEFAULT_TIMEOUT = 300
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for the payload cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[getattr(settings, 'BUDGET_CACHE_ALIAS', 'default')]
+
+
+def cache_is_shared():
+    """Whether other worker processes read and write the same cache"""
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def get_version(key):
+    """Return the version stored under key, creating one if needed
+
+    Versions are nanosecond timestamps, so a version recreated after an
+    eviction never matches anything cached under an older one.
+    """
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Store a version under key that is newer than the current one"""
+    cache = get_cache()
+    previous = cache.get(key) or 0
+    cache.set(key, max(time.time_ns(), previous + 1), timeout=None)
+
+
+def _version_key(user_id):
+    return f'budget:data-version:{user_id}'
+
+
+def get_data_version(user_id):
+    """Return the user's current data version, creating one if needed"""
+    return get_version(_version_key(user_id))
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached payload for the user"""
+    bump_version(_version_key(user_id))
+
+
+def get_data_versions(user_ids):
+    """{user_id: data version} for many users with one cache round trip"""
+    found = get_cache().get_many([_version_key(user_id) for user_id in user_ids])
+    return {
+        user_id: found.get(_version_key(user_id)) or get_data_version(user_id)
+        for user_id in user_ids
+    }
+
+
+def payload_key(user_id, name, version):
+    return f'budget:payload:{name}:{user_id}:{version}'
+
+
+def store_payloads(name, payloads, versions, timeout=None):
+    """Cache precomputed {user_id: payload} under the versions read before computing them"""
+    if timeout is None:
+        timeout = getattr(settings, 'BUDGET_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    get_cache().set_many(
+        {payload_key(user_id, name, versions[user_id]): payload for user_id, payload in payloads.items()},
+        timeout
+    )
+
+
+def cached_payload(user_id, name, build, timeout=None):
+    """Return the cached payload called name for the user, building it on a miss"""
+    cache = get_cache()
+    key = payload_key(user_id, name, get_data_version(user_id))
+    payload = cache.get(key)
+    if payload is not None:
+        stats.record(hit=True)
+        record_cache_lookup(hit=True)
+        return payload
+    stats.record(hit=False)
+    record_cache_lookup(hit=False)
+    payload = build()
+    if timeout is None:
+        timeout = getattr(settings, 'BUDGET_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+    cache.set(key, payload, timeout)
+    return payload
+
+
+def user_data_etag(request, *args, **kwargs):
+    """Strong ETag for a per-user payload: changes whenever the user's data does"""
+    if not request.user.is_authenticated:
+        return None
+    parts = (
+        request.path,
+        request.META.get('QUERY_STRING', ''),
+        str(request.user.pk),
+        str(get_data_version(request.user.pk)),
+        # Month-based payloads also change when the day rolls over
+        datetime.date.today().isoformat(),
+    )
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+
+def user_data_last_modified(request, *args, **kwargs):
+    """Time of the user's latest data change, or the start of today if later"""
+    if not request.user.is_authenticated:
+        return None
+    version = get_data_version(request.user.pk)
+    changed = datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
+    # Like the ETag, month-based payloads change when the day rolls over
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time.min).astimezone()
+    return max(changed, today)
+
+
+def conditional_on_user_data(view_func):
+    """Answer If-None-Match/If-Modified-Since with 304 before the view runs
+
+    Use on any per-user read-only endpoint whose output only depends on the
+    user's budget data, below @login_required.
+    """
+    conditional_view = condition(
+        etag_func=user_data_etag,
+        last_modified_func=user_data_last_modified
+    )(view_func)
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        # Let browsers keep the body but always revalidate it with us
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return wrapper
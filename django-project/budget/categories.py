@@ -0,0 +1,156 @@
+"""Per-user category registry shared by forms, the save path and importers
+
+A user's categories change rarely but are read on every form render and
+post and on every transaction save. The registry keeps them in a small
+in-process LRU backed by the shared cache, keyed by a per-user category
+version that budget.signals bumps on every Category write, so a lookup
+normally costs one cache read for the version and no query.
+
+The version only reaches other workers through a shared cache. With a
+per-process cache (the local memory default) the registry is off unless
+BUDGET_CATEGORY_REGISTRY says otherwise, and every lookup reads the
+user's categories from the database.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .cache import bump_version, cache_is_shared, get_cache, get_version
+from .models import Category
+
+FIELDS = ('id', 'user_id', 'name', 'category_type', 'color', 'icon')
+DEFAULT_LOCAL_SIZE = 1000
+# Category rows only go stale through a version bump, so keep them a day
+SHARED_TIMEOUT = 60 * 60 * 24
+
+
+class CategoryInfo(namedtuple('CategoryInfo', FIELDS)):
+    """The cached fields of one category"""
+    __slots__ = ()
+
+    @property
+    def label(self):
+        return f"{self.name} ({self.category_type})"
+
+    def as_instance(self):
+        """A Category as if loaded from the database, with created_at deferred"""
+        values = self._asdict()
+        field_names = [field.attname for field in Category._meta.concrete_fields if field.attname in values]
+        return Category.from_db(Category.objects.db, field_names, [values[name] for name in field_names])
+
+
+class UserCategories:
+    """One user's categories by id, in creation order"""
+
+    def __init__(self, rows):
+        self.by_id = {row[0]: CategoryInfo(*row) for row in rows}
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def of_type(self, category_type=None):
+        return [info for info in self if category_type is None or info.category_type == category_type]
+
+    def choices(self, category_type=None):
+        """(id, label) pairs for a choice field"""
+        return [(info.id, info.label) for info in self.of_type(category_type)]
+
+
+def _version_key(user_id):
+    return f'budget:category-version:{user_id}'
+
+
+def get_category_version(user_id):
+    return get_version(_version_key(user_id))
+
+
+def bump_category_version(user_id):
+    """Make every process reload the user's categories on the next lookup"""
+    bump_version(_version_key(user_id))
+
+
+def registry_enabled():
+    """Whether cached categories can be trusted to be current
+
+    BUDGET_CATEGORY_REGISTRY forces the answer; left as None, only a cache
+    shared by every worker carries the version bumps far enough.
+    """
+    enabled = getattr(settings, 'BUDGET_CATEGORY_REGISTRY', None)
+    return cache_is_shared() if enabled is None else enabled
+
+
+def _query(user_id, **filters):
+    return Category.objects.filter(user_id=user_id, **filters).order_by('pk').values_list(*FIELDS)
+
+
+class CategoryRegistry:
+    """Thread-safe LRU of UserCategories, checked against the shared version"""
+
+    def __init__(self, size=None):
+        self.size = size
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+
+    def for_user(self, user_id):
+        if not registry_enabled():
+            return UserCategories(_query(user_id))
+        version = get_category_version(user_id)
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._local.move_to_end(user_id)
+                return entry[1]
+
+        categories = UserCategories(self._load(user_id, version))
+        size = self.size or getattr(settings, 'BUDGET_CATEGORY_REGISTRY_SIZE', DEFAULT_LOCAL_SIZE)
+        with self._lock:
+            self._local[user_id] = (version, categories)
+            self._local.move_to_end(user_id)
+            while len(self._local) > size:
+                self._local.popitem(last=False)
+        return categories
+
+    def _load(self, user_id, version):
+        cache = get_cache()
+        key = f'budget:categories:{user_id}:{version}'
+        rows = cache.get(key)
+        if rows is None:
+            rows = list(_query(user_id))
+            cache.set(key, rows, SHARED_TIMEOUT)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+registry = CategoryRegistry()
+
+
+def user_categories(user_id):
+    """The UserCategories of the user with this id"""
+    return registry.for_user(user_id)
+
+
+def load_category(user_id, pk, category_type=None):
+    """CategoryInfo of one of the user's categories read from the database, or None
+
+    For ids the registry does not know: the category may be newer than the
+    cached list, so the user's cached categories are dropped when it exists.
+    """
+    filters = {'pk': pk}
+    if category_type is not None:
+        filters['category_type'] = category_type
+    row = _query(user_id, **filters).first()
+    if row is None:
+        return None
+    if registry_enabled():
+        bump_category_version(user_id)
+    return CategoryInfo(*row)
@@ -0,0 +1,239 @@
+"""Deterministic synthetic datasets for capacity and performance testing
+
+Every user's data comes from its own random.Random seeded with the dataset
+seed and the user's index, so the same seed, sizes and end date always
+produce the same rows, whichever worker process generates them. Rows are
+written in batches (transactions with executemany) and the monthly rollups
+are filled from the generated rows, as the importer does; the balance
+ledger is then built from the stored transactions.
+"""
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import ledger, rollups
+from .cache import bump_data_version
+from .categories import bump_category_version
+from .models import Budget, Category, SavingsGoal, Transaction, UserProfile
+from .periods import shift_month
+
+# name, type, icon, color, typical amount, relative frequency
+CATEGORY_SET = [
+    ('Salary', 'income', '💼', '#27ae60', 4200, 0),
+    ('Freelance', 'income', '💻', '#2ecc71', 650, 2),
+    ('Investment', 'income', '📈', '#16a085', 120, 1),
+    ('Groceries', 'expense', '🛒', '#e74c3c', 65, 30),
+    ('Food & Dining', 'expense', '🍽️', '#c0392b', 28, 25),
+    ('Transportation', 'expense', '🚗', '#f39c12', 35, 18),
+    ('Shopping', 'expense', '🛍️', '#9b59b6', 55, 10),
+    ('Entertainment', 'expense', '🎬', '#3498db', 30, 8),
+    ('Bills & Utilities', 'expense', '💡', '#e67e22', 120, 4),
+    ('Healthcare', 'expense', '🏥', '#1abc9c', 80, 2),
+    ('Education', 'expense', '📚', '#34495e', 90, 1),
+]
+
+DESCRIPTIONS = {
+    'Freelance': ['Client invoice', 'Consulting', 'Design project'],
+    'Investment': ['Dividend payment', 'Interest', 'Fund distribution'],
+    'Groceries': ['Supermarket', 'Farmers market', 'Corner shop'],
+    'Food & Dining': ['Lunch', 'Coffee', 'Dinner out', 'Takeaway'],
+    'Transportation': ['Fuel', 'Train ticket', 'Bus pass', 'Taxi'],
+    'Shopping': ['Clothing', 'Electronics', 'Household items'],
+    'Entertainment': ['Cinema', 'Streaming subscription', 'Concert'],
+    'Bills & Utilities': ['Electricity', 'Water', 'Internet', 'Phone'],
+    'Healthcare': ['Pharmacy', 'Doctor visit', 'Dentist'],
+    'Education': ['Online course', 'Books', 'Workshop'],
+}
+
+SAVINGS_GOALS = [
+    ('Emergency Fund', 10000),
+    ('Vacation', 2500),
+    ('New Laptop', 1500),
+]
+
+
+class DatasetSpec:
+    """Sizes and seed of a generated dataset"""
+
+    def __init__(self, transactions=1000, years=2, seed=0, end_date=None, batch_size=5000):
+        self.transactions = transactions
+        self.years = years
+        self.seed = seed
+        self.end_date = end_date or datetime.date.today()
+        self.batch_size = batch_size
+
+    @property
+    def start_date(self):
+        return self.end_date - datetime.timedelta(days=round(365.25 * self.years))
+
+
+def create_users(prefix, count, password, start=0):
+    """Bulk-create count users named <prefix><index> with profiles and return their ids"""
+    password_hash = make_password(password)
+    users = User.objects.bulk_create([
+        User(
+            username=f'{prefix}{index:06d}',
+            email=f'{prefix}{index:06d}@example.com',
+            first_name='Load',
+            last_name=f'Tester {index}',
+            password=password_hash,
+        )
+        for index in range(start, start + count)
+    ], batch_size=1000)
+    if any(user.pk is None for user in users):
+        # Backends that cannot return ids from bulk inserts
+        users = list(User.objects.filter(username__in=[user.username for user in users]).order_by('username'))
+    UserProfile.objects.bulk_create([
+        UserProfile(
+            user_id=user.pk,
+            monthly_income=Decimal('4200.00'),
+            savings_goal=Decimal('800.00'),
+        )
+        for user in users
+    ], batch_size=1000, ignore_conflicts=True)
+    return [user.pk for user in users]
+
+
+def delete_users(users):
+    """Delete the users and their data, 500 users per cascade"""
+    user_ids = list(users.values_list('pk', flat=True))
+    with transaction.atomic():
+        for start in range(0, len(user_ids), 500):
+            User.objects.filter(pk__in=user_ids[start:start + 500]).delete()
+    return len(user_ids)
+
+
+def _amount(rng, typical):
+    value = rng.lognormvariate(0, 0.5) * typical
+    return Decimal(str(round(max(value, 1.0), 2)))
+
+
+def generate_user(user_id, index, spec):
+    """Create categories, budgets, goals and transactions for one user
+
+    Returns the number of transactions written.
+    """
+    rng = random.Random(f'{spec.seed}:{index}')
+    with transaction.atomic():
+        categories = Category.objects.bulk_create([
+            Category(user_id=user_id, name=name, category_type=kind, icon=icon, color=color)
+            for name, kind, icon, color, _, _ in CATEGORY_SET
+        ])
+        if any(category.pk is None for category in categories):
+            categories = list(Category.objects.filter(user_id=user_id).order_by('pk'))
+        by_name = {category.name: category for category in categories}
+        typical = {name: amount for name, _, _, _, amount, _ in CATEGORY_SET}
+
+        # Budgets near the expected monthly spend for the last year of the range
+        per_month = spec.transactions / max(spec.years * 12, 1)
+        total_frequency = sum(frequency for *_, frequency in CATEGORY_SET)
+        budgets = []
+        for offset in range(12):
+            year, month = shift_month(spec.end_date.year, spec.end_date.month, -offset)
+            for name, kind, _, _, amount, frequency in CATEGORY_SET:
+                if kind == 'expense':
+                    expected = amount * per_month * frequency / total_frequency
+                    budgets.append(Budget(
+                        user_id=user_id, category=by_name[name], month=month, year=year,
+                        amount=Decimal(round(expected * rng.uniform(0.9, 1.3), -1) + 10)
+                    ))
+        Budget.objects.bulk_create(budgets)
+
+        SavingsGoal.objects.bulk_create([
+            SavingsGoal(
+                user_id=user_id, title=title,
+                target_amount=Decimal(target),
+                current_amount=Decimal(str(round(target * rng.uniform(0.05, 0.8), 2))),
+                target_date=spec.end_date + datetime.timedelta(days=rng.randint(60, 720)),
+            )
+            for title, target in SAVINGS_GOALS
+        ])
+
+        rows = _transactions(by_name, typical, spec, rng)
+        deltas = {}
+        for category, date, amount, _ in rows:
+            delta = deltas.setdefault(
+                rollups.rollup_key(user_id, category.pk, date, category.category_type),
+                [Decimal('0.00'), 0]
+            )
+            delta[0] += amount
+            delta[1] += 1
+        for start in range(0, len(rows), spec.batch_size):
+            insert_transactions(user_id, rows[start:start + spec.batch_size])
+        rollups.apply_deltas(deltas)
+        ledger.rebuild_user(user_id)
+    bump_data_version(user_id)
+    bump_category_version(user_id)
+    return len(rows)
+
+
+def insert_transactions(user_id, rows):
+    """Insert (category, date, amount, description) rows with one executemany
+
+    Building and compiling a model instance per row dominates bulk_create
+    at this volume, so values are adapted directly with the backend's
+    operations, as the ORM would, and no signals are sent.
+    """
+    connection = connections[Transaction.objects.db]
+    ops = connection.ops
+    fields = [Transaction._meta.get_field(name) for name in (
+        'user', 'category', 'amount', 'description', 'transaction_type', 'date', 'created_at', 'updated_at'
+    )]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        ops.quote_name(Transaction._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields))
+    )
+    now = ops.adapt_datetimefield_value(timezone.now())
+    params = [
+        (
+            user_id, category.pk, ops.adapt_decimalfield_value(amount, 10, 2), description,
+            category.category_type, ops.adapt_datefield_value(date), now, now
+        )
+        for category, date, amount, description in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _transactions(by_name, typical, spec, rng):
+    """A salary on the first of every month plus weighted random spending"""
+    rows = []
+    salary = by_name['Salary']
+    year, month = spec.start_date.year, spec.start_date.month
+    while (year, month) <= (spec.end_date.year, spec.end_date.month) and len(rows) < spec.transactions:
+        amount = _amount(rng, typical['Salary'] / 8) + Decimal(typical['Salary'])
+        rows.append((salary, datetime.date(year, month, 1), amount, 'Monthly salary'))
+        year, month = shift_month(year, month, 1)
+
+    names = [name for name, _, _, _, _, frequency in CATEGORY_SET if frequency]
+    weights = [frequency for _, _, _, _, _, frequency in CATEGORY_SET if frequency]
+    span = (spec.end_date - spec.start_date).days
+    for name in rng.choices(names, weights, k=spec.transactions - len(rows)):
+        rows.append((
+            by_name[name],
+            spec.start_date + datetime.timedelta(days=rng.randint(0, span)),
+            _amount(rng, typical[name]),
+            rng.choice(DESCRIPTIONS[name]),
+        ))
+    return rows
+
+
+def generate_shard(shard, spec):
+    """Generate every (user_id, index) in shard; run in the caller or a worker process"""
+    started = time.perf_counter()
+    written = sum(generate_user(user_id, index, spec) for user_id, index in shard)
+    return len(shard), written, time.perf_counter() - started
+
+
+def init_worker():
+    """Process pool initializer: set up Django and drop connections inherited by fork"""
+    import django
+    django.setup()
+    connections.close_all()
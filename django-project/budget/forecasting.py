@@ -0,0 +1,221 @@
+"""Cash-flow forecasts projected from the monthly category rollups
+
+A user's history is read with one values_list over MonthlyCategoryTotal
+into NumPy columns and laid out as a (series, month) matrix with one row
+per category and transaction type. Every row's level, linear trend and
+calendar-month seasonal offsets are fitted at once with array operations,
+and so are the projections, so a chunk of thousands of users costs one
+query and a handful of array passes. forecast_all() runs the same engine
+over every user and stores the payloads in the versioned payload cache.
+"""
+import datetime
+
+import numpy as np
+
+from django.contrib.auth.models import User
+
+from .analytics import month_window
+from .cache import get_data_versions, store_payloads
+from .categories import user_categories
+from .models import Category, MonthlyCategoryTotal
+from .periods import shift_month
+
+HISTORY_MONTHS = 36
+MIN_HORIZON = 3
+MAX_HORIZON = 12
+DEFAULT_HORIZON = 6
+# Fewer observed months than this give a flat projection of the mean
+TREND_MIN_MONTHS = 6
+# Seasonal offsets need every calendar month seen at least twice
+SEASONAL_MIN_MONTHS = 24
+# Forecasts only change with the user's data or the month, so keep them a day
+FORECAST_CACHE_TIMEOUT = 60 * 60 * 26
+
+
+def payload_name(year, month):
+    """Name of the cached forecast payload for the period it starts in"""
+    return f'forecast:{year}-{month:02d}'
+
+
+def load_history(user_ids, year, month):
+    """Columnar rollup history of the users for the HISTORY_MONTHS before (year, month)
+
+    Returns (users, categories, income, columns, totals) arrays, where
+    columns count months from the start of the window.
+    """
+    first_year, first_month = shift_month(year, month, -HISTORY_MONTHS)
+    last_year, last_month = shift_month(year, month, -1)
+    rows = list(MonthlyCategoryTotal.objects.filter(
+        month_window(first_year, first_month, last_year, last_month),
+        user_id__in=user_ids
+    ).values_list('user_id', 'category_id', 'transaction_type', 'year', 'month', 'total'))
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0, dtype=bool), empty, np.zeros(0)
+    users, categories, types, years, months, totals = zip(*rows)
+    columns = (
+        np.array(years, dtype=np.int64) * 12 + np.array(months, dtype=np.int64)
+        - (first_year * 12 + first_month)
+    )
+    return (
+        np.array(users, dtype=np.int64),
+        np.array(categories, dtype=np.int64),
+        np.array(types) == 'income',
+        columns,
+        np.array(totals, dtype=np.float64),
+    )
+
+
+def project(matrix, starts, first_month, horizon):
+    """Project every row of a (series, month) history matrix horizon months ahead
+
+    starts holds each row's first observed column; earlier columns are
+    ignored, later empty ones count as zero. first_month is the calendar
+    month (0-11) of column 0.
+    """
+    months = matrix.shape[1]
+    x = np.arange(months, dtype=np.float64)
+    mask = x[None, :] >= starts[:, None]
+    observed = mask.sum(axis=1)
+    count = np.maximum(observed, 1)
+    x_mean = (mask * x).sum(axis=1) / count
+    y_mean = (mask * matrix).sum(axis=1) / count
+
+    dx = (x[None, :] - x_mean[:, None]) * mask
+    spread = (dx ** 2).sum(axis=1)
+    slope = np.divide(
+        (dx * (matrix - y_mean[:, None])).sum(axis=1), spread,
+        out=np.zeros_like(spread), where=spread > 0
+    )
+    slope[observed < TREND_MIN_MONTHS] = 0.0
+
+    fitted = y_mean[:, None] + slope[:, None] * (x[None, :] - x_mean[:, None])
+    residuals = (matrix - fitted) * mask
+    calendar = (first_month + np.arange(months)) % 12
+    one_hot = np.eye(12)[calendar]
+    seen = mask @ one_hot
+    seasonal = np.divide(residuals @ one_hot, seen, out=np.zeros_like(seen), where=seen > 0)
+    seasonal[observed < SEASONAL_MIN_MONTHS] = 0.0
+
+    future = months + np.arange(horizon, dtype=np.float64)
+    projected = (
+        y_mean[:, None] + slope[:, None] * (future[None, :] - x_mean[:, None])
+        + seasonal[:, (first_month + months + np.arange(horizon)) % 12]
+    )
+    # Rows the user has no history for yet stay at zero
+    projected[observed == 0] = 0.0
+    return np.maximum(projected, 0.0)
+
+
+def forecast_users(user_ids, horizon=MAX_HORIZON, today=None, names=None):
+    """{user_id: forecast payload} for the users, starting with the current month
+
+    names maps category ids to names; by default they come from one
+    Category query, or from the category registry for a single user.
+    """
+    user_ids = list(user_ids)
+    today = today or datetime.date.today()
+    year, month = today.year, today.month
+    users, categories, income, columns, totals = load_history(user_ids, year, month)
+
+    # One row per (user, category, type)
+    keys, series = np.unique(np.stack([users, categories, income]), axis=1, return_inverse=True)
+    series = series.reshape(-1)
+    matrix = np.zeros((keys.shape[1], HISTORY_MONTHS))
+    np.add.at(matrix, (series, columns), totals)
+
+    # A user's history starts with their first month of any activity
+    user_index = {user_id: index for index, user_id in enumerate(user_ids)}
+    row_users = np.array([user_index[user_id] for user_id in keys[0].tolist()], dtype=np.int64)
+    user_starts = np.full(len(user_ids), HISTORY_MONTHS, dtype=np.int64)
+    np.minimum.at(user_starts, np.array([user_index[user_id] for user_id in users.tolist()], dtype=np.int64), columns)
+
+    _, first_month = shift_month(year, month, -HISTORY_MONTHS)
+    projected = project(matrix, user_starts[row_users], first_month - 1, horizon)
+    is_income = keys[2].astype(bool)
+    income_totals = np.zeros((len(user_ids), horizon))
+    expense_totals = np.zeros((len(user_ids), horizon))
+    np.add.at(income_totals, row_users[is_income], projected[is_income])
+    np.add.at(expense_totals, row_users[~is_income], projected[~is_income])
+    savings = income_totals - expense_totals
+
+    if names is None:
+        names = _category_names(user_ids)
+    labels = [
+        '{}-{:02d}'.format(*shift_month(year, month, offset)) for offset in range(horizon)
+    ]
+    rows_by_user = {}
+    row_user_list = row_users.tolist()
+    for row in np.argsort(-projected.sum(axis=1), kind='stable').tolist():
+        rows_by_user.setdefault(row_user_list[row], []).append(row)
+    payloads = {}
+    for index, user_id in enumerate(user_ids):
+        payloads[user_id] = {
+            'months': labels,
+            'history_months': int(HISTORY_MONTHS - min(user_starts[index], HISTORY_MONTHS)),
+            'income': _rounded(income_totals[index]),
+            'expenses': _rounded(expense_totals[index]),
+            'savings': _rounded(savings[index]),
+            'cumulative_savings': _rounded(np.cumsum(savings[index])),
+            'categories': [
+                {
+                    'id': int(keys[1, row]),
+                    'name': names.get(int(keys[1, row]), ''),
+                    'type': 'income' if is_income[row] else 'expense',
+                    'amounts': _rounded(projected[row]),
+                }
+                for row in rows_by_user.get(index, [])
+            ],
+        }
+    return payloads
+
+
+def forecast_user(user_id, horizon=MAX_HORIZON, today=None):
+    return forecast_users([user_id], horizon, today)[user_id]
+
+
+def truncate(payload, horizon):
+    """The first horizon months of a forecast payload"""
+    truncated = dict(payload)
+    for field in ('months', 'income', 'expenses', 'savings', 'cumulative_savings'):
+        truncated[field] = payload[field][:horizon]
+    truncated['categories'] = [
+        dict(category, amounts=category['amounts'][:horizon]) for category in payload['categories']
+    ]
+    return truncated
+
+
+def _rounded(values):
+    return np.round(values, 2).tolist()
+
+
+def _category_names(user_ids):
+    if len(user_ids) == 1:
+        return {info.id: info.name for info in user_categories(user_ids[0])}
+    return dict(Category.objects.filter(user_id__in=user_ids).values_list('id', 'name'))
+
+
+def forecast_all(users=None, batch_size=2000, today=None, progress=None):
+    """Forecast every user (or the given users) in chunks and cache the payloads
+
+    Each chunk costs one version lookup in the cache, a rollup and a
+    category query and one cache write. Returns how many users were
+    forecast.
+    """
+    today = today or datetime.date.today()
+    name = payload_name(today.year, today.month)
+    queryset = users if users is not None else User.objects.all()
+    user_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    done = 0
+    for offset in range(0, len(user_ids), batch_size):
+        chunk = user_ids[offset:offset + batch_size]
+        # Read the versions first, so a write during the chunk leaves its
+        # payload under an already outdated version
+        versions = get_data_versions(chunk)
+        store_payloads(
+            name, forecast_users(chunk, MAX_HORIZON, today), versions, FORECAST_CACHE_TIMEOUT
+        )
+        done += len(chunk)
+        if progress:
+            progress(done, len(user_ids))
+    return done
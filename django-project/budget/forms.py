@@ -1,10 +1,65 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from .categories import load_category, user_categories
 from .models import Transaction, Category, Budget, UserProfile, SavingsGoal
 from datetime import datetime
 
 
+class RegistryCategoryField(forms.ModelChoiceField):
+    """Category field whose choices and validation come from the category registry"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = None
+        self.user_id = self.category_type = None
+
+    def use_registry(self, user, category_type=None):
+        self.user_id, self.category_type = user.pk, category_type
+        registry_categories = user_categories(user.pk)
+        self.categories = {info.id: info for info in registry_categories.of_type(category_type)}
+        choices = [(info.id, info.label) for info in self.categories.values()]
+        if self.empty_label is not None:
+            choices.insert(0, ('', self.empty_label))
+        self.choices = choices
+
+    def to_python(self, value):
+        if self.categories is None:
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        if isinstance(value, Category):
+            value = value.pk
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            pk = info = None
+        else:
+            # Not in the registry: possibly created since it was cached
+            info = self.categories.get(pk) or load_category(self.user_id, pk, self.category_type)
+        if info is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return info.as_instance()
+
+
+class RegistryCategoryFormMixin:
+    """Model form mixin for a registry-backed category field
+
+    The field has already checked that the category exists and belongs to
+    the user, so the model's foreign key check (another query) is skipped.
+    """
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        if getattr(self.fields['category'], 'categories', None) is not None:
+            exclude.add('category')
+        return exclude
+
+
 class CustomUserCreationForm(UserCreationForm):
     """Extended user creation form"""
     email = forms.EmailField(required=True)
@@ -96,11 +151,12 @@ class CategoryForm(forms.ModelForm):
         }
 
 
-class TransactionForm(forms.ModelForm):
+class TransactionForm(RegistryCategoryFormMixin, forms.ModelForm):
     """Transaction form"""
     class Meta:
         model = Transaction
         fields = ['category', 'amount', 'description', 'date']
+        field_classes = {'category': RegistryCategoryField}
         widgets = {
             'category': forms.Select(attrs={'class': 'form-select'}),
             'amount': forms.NumberInput(attrs={
@@ -119,14 +175,14 @@ class TransactionForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            self.fields['category'].queryset = Category.objects.filter(user=user)
+            self.fields['category'].use_registry(user)
         
         # Set default date to today
         if not self.instance.pk:
             self.fields['date'].initial = datetime.now().date()
 
 
-class BudgetForm(forms.ModelForm):
+class BudgetForm(RegistryCategoryFormMixin, forms.ModelForm):
     """Budget form"""
     MONTH_CHOICES = [
         (1, 'January'), (2, 'February'), (3, 'March'), (4, 'April'),
@@ -142,6 +198,7 @@ class BudgetForm(forms.ModelForm):
     class Meta:
         model = Budget
         fields = ['category', 'amount', 'month', 'year']
+        field_classes = {'category': RegistryCategoryField}
         widgets = {
             'category': forms.Select(attrs={'class': 'form-select'}),
             'amount': forms.NumberInput(attrs={
@@ -162,10 +219,7 @@ class BudgetForm(forms.ModelForm):
         
         if user:
             # Filter categories to only expense categories for budgeting
-            self.fields['category'].queryset = Category.objects.filter(
-                user=user, 
-                category_type='expense'
-            )
+            self.fields['category'].use_registry(user, category_type='expense')
         
         # Set default month and year
         if not self.instance.pk:
@@ -214,7 +268,7 @@ class DateRangeForm(forms.Form):
         }),
         required=False
     )
-    category = forms.ModelChoiceField(
+    category = RegistryCategoryField(
         queryset=Category.objects.none(),
         widget=forms.Select(attrs={'class': 'form-select'}),
         required=False,
@@ -230,4 +284,25 @@ class DateRangeForm(forms.Form):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            self.fields['category'].queryset = Category.objects.filter(user=user)
\ No newline at end of file
+            self.fields['category'].use_registry(user)
+
+
+class TransactionImportForm(forms.Form):
+    """Form for uploading a bank export to import"""
+    FORMAT_CHOICES = [
+        ('auto', 'Detect from file name'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX / QFX'),
+    ]
+
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.ofx,.qfx'
+        })
+    )
+    file_format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        initial='auto'
+    )
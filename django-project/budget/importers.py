@@ -0,0 +1,291 @@
+"""Streaming CSV/OFX transaction import
+
+Rows are parsed one line at a time and written with bulk_create in
+fixed-size batches, so memory stays bounded by the batch size rather than
+the file size. bulk_create skips model signals, so the importer updates the
+monthly rollups, the balance ledger and the user's cache version itself.
+"""
+import csv
+import datetime
+import re
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Max, Q
+
+from . import ledger, rollups
+from .cache import bump_data_version
+from .categories import FIELDS as CATEGORY_FIELDS, CategoryInfo, user_categories
+from .models import Category, Transaction
+
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d.%m.%Y', '%Y%m%d')
+UNCATEGORIZED = 'Uncategorized'
+MAX_REPORTED_ERRORS = 50
+# (date, amount, description) keys matched per duplicate lookup query; keeps
+# the OR of key conditions well inside the databases' expression limits
+DUPLICATE_LOOKUP_KEYS = 200
+
+
+class RowError(ValueError):
+    """A row that cannot be turned into a transaction"""
+
+
+def parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise RowError(f'Unrecognised date "{value}"')
+
+
+def parse_amount(value):
+    cleaned = value.strip().replace('$', '').replace(',', '')
+    if cleaned.startswith('(') and cleaned.endswith(')'):
+        cleaned = '-' + cleaned[1:-1]
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise RowError(f'Unrecognised amount "{value}"')
+    if not amount.is_finite():
+        raise RowError(f'Unrecognised amount "{value}"')
+    return amount.quantize(Decimal('0.01'))
+
+
+def parse_csv(lines):
+    """Yield row dicts from CSV text lines
+
+    Expects a header with date, description and amount columns, plus
+    optional category and type columns. Column names are case-insensitive.
+    Fields beyond the header are ignored; a line the csv module rejects
+    yields a row with an error message instead.
+    """
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield {'error': f'Unreadable CSV line: {error}'}
+            continue
+        # Extra fields are collected in a list under the None key
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key is not None}
+        yield {
+            'date': row.get('date', ''),
+            'description': row.get('description') or row.get('memo') or row.get('name', ''),
+            'amount': row.get('amount', ''),
+            'category': row.get('category', ''),
+            'type': row.get('type', '').lower(),
+        }
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+def parse_ofx(lines):
+    """Yield row dicts from the STMTTRN blocks of an OFX (SGML or XML) file"""
+    current = None
+    for line in lines:
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing:
+                    if current is not None:
+                        yield {
+                            'date': current.get('DTPOSTED', '')[:8],
+                            'description': current.get('NAME') or current.get('MEMO', ''),
+                            'amount': current.get('TRNAMT', ''),
+                            'category': '',
+                            'type': '',
+                        }
+                    current = None
+                else:
+                    current = {}
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+def detect_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+class ImportResult:
+    """Counters and timing for one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.rows} rows: {self.created} imported, {self.duplicates} duplicates, '
+            f'{self.skipped} skipped in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/sec)'
+        )
+
+
+class TransactionImporter:
+    """Import parsed rows for one user in bulk_create batches
+
+    Categories are matched by name (case-insensitive) against the user's
+    entries in the category registry; rows without a known category go to an
+    "Uncategorized" category of the matching type. A row is a duplicate when
+    the user already had a transaction with the same date, amount and
+    description before the import started; repeated rows inside the file
+    are kept only beyond the number already stored.
+    """
+
+    def __init__(self, user, batch_size=1000, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.progress = progress
+        self._categories = {}
+        for category in user_categories(user.pk):
+            self._categories.setdefault((category.name.lower(), category.category_type), category)
+            self._categories.setdefault((category.name.lower(), None), category)
+
+    def _category_for(self, name, transaction_type):
+        if name:
+            category = (
+                self._categories.get((name.lower(), transaction_type)) or
+                self._categories.get((name.lower(), None))
+            )
+            if category is not None:
+                return category
+        key = (UNCATEGORIZED.lower(), transaction_type)
+        if key not in self._categories:
+            category, _ = Category.objects.get_or_create(
+                user=self.user,
+                name=UNCATEGORIZED,
+                category_type=transaction_type,
+                defaults={'icon': '❓', 'color': '#95a5a6'}
+            )
+            self._categories[key] = CategoryInfo(*(getattr(category, field) for field in CATEGORY_FIELDS))
+        return self._categories[key]
+
+    def build(self, row):
+        """Turn a parsed row into an unsaved Transaction"""
+        if row.get('error'):
+            raise RowError(row['error'])
+        amount = parse_amount(row['amount'])
+        transaction_type = row['type'] if row['type'] in ('income', 'expense') else None
+        if transaction_type is None and row['category']:
+            category = self._categories.get((row['category'].lower(), None))
+            if category is not None:
+                transaction_type = category.category_type
+        if transaction_type is None:
+            transaction_type = 'expense' if amount < 0 else 'income'
+        amount = abs(amount)
+        if amount == 0:
+            raise RowError('Zero amount')
+        category = self._category_for(row['category'], transaction_type)
+        return Transaction(
+            user=self.user,
+            category_id=category.id,
+            amount=amount,
+            description=(row['description'] or 'Imported transaction')[:200],
+            # Set directly so save()-style category lookups are not needed
+            transaction_type=category.category_type,
+            date=parse_date(row['date']),
+        )
+
+    def run(self, rows):
+        result = ImportResult()
+        started = time.perf_counter()
+        with transaction.atomic():
+            # Rows written by this run must not count as pre-existing duplicates
+            self._existing_max_pk = Transaction.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+            self._seen = Counter()
+            self._deltas = {}
+            self._ledger_deltas = {}
+            batch = []
+            for row in rows:
+                result.rows += 1
+                try:
+                    batch.append(self.build(row))
+                except RowError as error:
+                    result.skipped += 1
+                    if len(result.errors) < MAX_REPORTED_ERRORS:
+                        result.errors.append(f'Row {result.rows}: {error}')
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, result)
+                    batch = []
+                    if self.progress:
+                        result.elapsed = time.perf_counter() - started
+                        self.progress(result)
+            self._flush(batch, result)
+            rollups.apply_deltas(self._deltas)
+            ledger.apply_deltas(self._ledger_deltas)
+        if result.created:
+            bump_data_version(self.user.pk)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def _stored_counts(self, keys):
+        """How many pre-existing transactions have each (date, amount, description) key
+
+        Only rows matching one of the keys exactly are read, so the lookup
+        stays bounded by the batch however much history the user has.
+        """
+        stored = Counter()
+        keys = list(keys)
+        for start in range(0, len(keys), DUPLICATE_LOOKUP_KEYS):
+            matches = Q()
+            for date, amount, description in keys[start:start + DUPLICATE_LOOKUP_KEYS]:
+                matches |= Q(date=date, amount=amount, description=description)
+            stored.update(
+                Transaction.objects.filter(
+                    matches, user=self.user, pk__lte=self._existing_max_pk
+                ).values_list('date', 'amount', 'description')
+            )
+        return stored
+
+    def _flush(self, batch, result):
+        if not batch:
+            return
+        stored = self._stored_counts({(txn.date, txn.amount, txn.description) for txn in batch})
+        new = []
+        for txn in batch:
+            key = (txn.date, txn.amount, txn.description)
+            if stored[key]:
+                # Only keys already in the database need remembering across batches
+                self._seen[key] += 1
+                if self._seen[key] <= stored[key]:
+                    result.duplicates += 1
+                    continue
+            new.append(txn)
+        Transaction.objects.bulk_create(new, batch_size=self.batch_size)
+        result.created += len(new)
+        for key, (amount, count) in rollups.collect_deltas(new).items():
+            total = self._deltas.setdefault(key, [Decimal('0.00'), 0])
+            total[0] += amount
+            total[1] += count
+        for key, (amount, count) in ledger.collect_deltas(new).items():
+            total = self._ledger_deltas.setdefault(key, [Decimal('0.00'), 0])
+            total[0] += amount
+            total[1] += count
+
+
+def import_transactions(user, lines, file_format='csv', batch_size=1000, progress=None):
+    """Parse lines in file_format and import them for user"""
+    return TransactionImporter(user, batch_size=batch_size, progress=progress).run(
+        PARSERS[file_format](lines)
+    )
@@ -0,0 +1,296 @@
+"""Maintenance of the daily balance ledger
+
+Each user has one DailyBalance row per day with transactions, holding the
+day's net (income minus expenses) and the running net since the start of
+its month, and one BalanceCheckpoint per month with activity, holding the
+balance carried into that month. The balance after a day is the two added
+together, so a write on a past date only shifts the rest of its month's
+day rows and the later checkpoints: at most a month of rows plus one row
+per later month.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import add, or_
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .models import BalanceCheckpoint, DailyBalance, Transaction
+from .periods import shift_month
+
+ZERO = Decimal('0.00')
+# Users with more changed days than this are rebuilt by apply_deltas
+# instead of shifted in place, which would take two WHEN clauses a day
+SHIFT_DAYS_LIMIT = 31
+
+
+def signed_amount(amount, transaction_type):
+    """The transaction's effect on the balance"""
+    return amount if transaction_type == 'income' else -amount
+
+
+def month_start(date):
+    return date.replace(day=1)
+
+
+def next_month_start(date):
+    year, month = shift_month(date.year, date.month, 1)
+    return datetime.date(year, month, 1)
+
+
+def closing_balance(user_id, before):
+    """Balance at the end of the last day with activity before the date"""
+    day = DailyBalance.objects.filter(
+        user_id=user_id, date__lt=before
+    ).select_related('checkpoint').order_by('-date').first()
+    # A checkpoint left without day rows carries the same balance as the
+    # last day before it, so the day rows alone are enough
+    return day.balance if day is not None else ZERO
+
+
+def _empty_day(user_id, date):
+    """An unsaved zero DailyBalance for date, or None if the day row exists
+
+    Its month balance and checkpoint come from the last earlier day; when
+    that day is in an earlier month (or there is none), the month's
+    checkpoint is created first with that day's balance, unless it exists.
+    """
+    month = month_start(date)
+    last = DailyBalance.objects.filter(
+        user_id=user_id, date__lte=date
+    ).select_related('checkpoint').order_by('-date').first()
+    if last is not None and last.date == date:
+        return None
+    if last is not None and last.date >= month:
+        return DailyBalance(
+            user_id=user_id, checkpoint_id=last.checkpoint_id, date=date, month_balance=last.month_balance
+        )
+    opening = last.balance if last is not None else ZERO
+    BalanceCheckpoint.objects.bulk_create(
+        [BalanceCheckpoint(user_id=user_id, month=month, opening_balance=opening)], ignore_conflicts=True
+    )
+    checkpoint_id = BalanceCheckpoint.objects.filter(user_id=user_id, month=month).values_list('pk', flat=True).get()
+    return DailyBalance(user_id=user_id, checkpoint_id=checkpoint_id, date=date, month_balance=ZERO)
+
+
+def _sum(terms, output_field):
+    return reduce(add, terms) if terms else Value(0, output_field=output_field)
+
+
+@transaction.atomic(savepoint=False)
+def shift_days(user_id, deltas):
+    """Add {date: (signed amount, count)} to the user's ledger in place
+
+    Days gaining transactions are first inserted empty when missing (one
+    query to look each up, plus two for a new month's checkpoint), then one
+    UPDATE moves every changed day and the rest of its month and one moves
+    the later checkpoints. Days left without transactions are deleted.
+    """
+    deltas = {
+        datetime.date.fromisoformat(date) if isinstance(date, str) else date: delta
+        for date, delta in deltas.items() if delta[0] or delta[1]
+    }
+    if not deltas:
+        return
+    empty = [_empty_day(user_id, date) for date, (_, count) in sorted(deltas.items()) if count > 0]
+    DailyBalance.objects.bulk_create([day for day in empty if day is not None], ignore_conflicts=True)
+
+    money = models.DecimalField()
+    rest_of_month = {date: Q(date__gte=date, date__lt=next_month_start(date)) for date in deltas}
+    DailyBalance.objects.filter(reduce(or_, rest_of_month.values()), user_id=user_id).update(
+        net=F('net') + Case(
+            *(When(date=date, then=Value(amount)) for date, (amount, _) in deltas.items() if amount),
+            default=Value(ZERO),
+            output_field=money
+        ),
+        month_balance=F('month_balance') + _sum([
+            Case(When(rest_of_month[date], then=Value(amount)), default=Value(ZERO), output_field=money)
+            for date, (amount, _) in deltas.items() if amount
+        ], money),
+        transaction_count=F('transaction_count') + Case(
+            *(When(date=date, then=Value(count)) for date, (_, count) in deltas.items() if count),
+            default=Value(0)
+        )
+    )
+    moved = {month_start(date): ZERO for date in deltas}
+    for date, (amount, _) in deltas.items():
+        moved[month_start(date)] += amount
+    moved = {month: amount for month, amount in moved.items() if amount}
+    if moved:
+        BalanceCheckpoint.objects.filter(user_id=user_id, month__gt=min(moved)).update(
+            opening_balance=F('opening_balance') + _sum([
+                Case(When(month__gt=month, then=Value(amount)), default=Value(ZERO), output_field=money)
+                for month, amount in moved.items()
+            ], money)
+        )
+    emptied = [date for date, (_, count) in deltas.items() if count < 0]
+    if emptied:
+        DailyBalance.objects.filter(user_id=user_id, date__in=emptied, transaction_count=0).delete()
+
+
+def apply_delta(user_id, date, amount, count):
+    """Add a signed amount and a transaction count to the user's balance on date"""
+    shift_days(user_id, {date: (amount, count)})
+
+
+def collect_deltas(transactions):
+    """Accumulate {(user_id, date): [amount, count]} for unsaved or bulk-created transactions"""
+    deltas = defaultdict(lambda: [ZERO, 0])
+    for txn in transactions:
+        delta = deltas[(txn.user_id, txn.date)]
+        delta[0] += signed_amount(txn.amount, txn.transaction_type)
+        delta[1] += 1
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Bring the ledger up to date after writes given as {(user_id, date): [amount, count]}
+
+    Users with up to SHIFT_DAYS_LIMIT changed days are shifted in place;
+    the ledger of any other user is recomputed from the month of their
+    earliest changed date. Either way it costs a few queries per user
+    however many transactions changed.
+    """
+    by_user = defaultdict(dict)
+    for (user_id, date), delta in deltas.items():
+        by_user[user_id][date] = delta
+    for user_id, days in by_user.items():
+        if len(days) <= SHIFT_DAYS_LIMIT:
+            shift_days(user_id, days)
+        else:
+            rebuild_user(user_id, since=min(days))
+
+
+def compute_days(user_id=None, users=None, since=None, categories=None):
+    """Aggregate raw transactions into {(user_id, date): (net, count)}"""
+    queryset = Transaction.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    if categories is not None:
+        queryset = queryset.filter(category__in=categories)
+    if since is not None:
+        queryset = queryset.filter(date__gte=since)
+    rows = queryset.order_by().values('user_id', 'date').annotate(
+        income=models.Sum('amount', filter=models.Q(transaction_type='income')),
+        expenses=models.Sum('amount', filter=models.Q(transaction_type='expense')),
+        transaction_count=models.Count('id')
+    )
+    return {
+        (row['user_id'], row['date']): ((row['income'] or ZERO) - (row['expenses'] or ZERO), row['transaction_count'])
+        for row in rows
+    }
+
+
+def _write(user_id, days, opening, batch_size):
+    """Create checkpoints and day rows from sorted [(date, net, count)]"""
+    by_month = defaultdict(list)
+    for date, net, count in days:
+        by_month[month_start(date)].append((date, net, count))
+    checkpoints = []
+    for month in sorted(by_month):
+        checkpoints.append(BalanceCheckpoint(user_id=user_id, month=month, opening_balance=opening))
+        opening += sum(net for _, net, _ in by_month[month])
+    BalanceCheckpoint.objects.bulk_create(checkpoints, batch_size=batch_size)
+    if any(checkpoint.pk is None for checkpoint in checkpoints):
+        # Backends that cannot return ids from bulk inserts
+        checkpoints = list(BalanceCheckpoint.objects.filter(
+            user_id=user_id, month__in=[checkpoint.month for checkpoint in checkpoints]
+        ).order_by('month'))
+    rows = []
+    for checkpoint in checkpoints:
+        running = ZERO
+        for date, net, count in by_month[checkpoint.month]:
+            running += net
+            rows.append(DailyBalance(
+                user_id=user_id, checkpoint=checkpoint, date=date, net=net,
+                month_balance=running, transaction_count=count
+            ))
+    DailyBalance.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+@transaction.atomic
+def rebuild_user(user_id, since=None, batch_size=1000):
+    """Recreate the user's ledger from the raw transactions, from since's month on
+
+    Returns how many day rows were written.
+    """
+    month = month_start(since) if since is not None else None
+    checkpoints = BalanceCheckpoint.objects.filter(user_id=user_id)
+    if month is not None:
+        checkpoints = checkpoints.filter(month__gte=month)
+    checkpoints.delete()
+    opening = closing_balance(user_id, month) if month is not None else ZERO
+    days = sorted(
+        (date, net, count)
+        for (_, date), (net, count) in compute_days(user_id=user_id, since=month).items()
+    )
+    return _write(user_id, days, opening, batch_size)
+
+
+@transaction.atomic
+def rebuild(users=None, batch_size=1000):
+    """Recreate the ledger of every user (or the given users) and return the day rows written"""
+    checkpoints = BalanceCheckpoint.objects.all()
+    if users is not None:
+        checkpoints = checkpoints.filter(user__in=users)
+    checkpoints.delete()
+    by_user = defaultdict(list)
+    for (user_id, date), (net, count) in compute_days(users=users).items():
+        by_user[user_id].append((date, net, count))
+    return sum(_write(user_id, sorted(days), ZERO, batch_size) for user_id, days in by_user.items())
+
+
+def verify(users=None):
+    """Compare the ledger with the raw rows and return mismatched (key, expected, stored)
+
+    Values are (net, count, balance) per (user_id, date).
+    """
+    expected = {}
+    balances = defaultdict(lambda: ZERO)
+    for (user_id, date), (net, count) in sorted(compute_days(users=users).items()):
+        balances[user_id] += net
+        expected[(user_id, date)] = (net, count, balances[user_id])
+    stored = DailyBalance.objects.select_related('checkpoint')
+    if users is not None:
+        stored = stored.filter(user__in=users)
+    actual = {
+        (day.user_id, day.date): (day.net, day.transaction_count, day.balance)
+        for day in stored
+    }
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(set(expected) | set(actual))
+        if expected.get(key) != actual.get(key)
+    ]
+
+
+def balance_series(user_id, start, end):
+    """Daily (date, net, balance) from start to end, inclusive
+
+    Reads the day rows in the range with one indexed range scan; days
+    without activity carry the previous balance forward.
+    """
+    days = list(DailyBalance.objects.filter(
+        user_id=user_id, date__gte=start, date__lte=end
+    ).select_related('checkpoint').order_by('date'))
+    if days:
+        balance = days[0].balance - days[0].net
+    else:
+        balance = closing_balance(user_id, start)
+    opening = balance
+    by_date = {day.date: day for day in days}
+    series = []
+    date = start
+    while date <= end:
+        day = by_date.get(date)
+        net = day.net if day else ZERO
+        if day:
+            balance = day.balance
+        series.append((date, net, balance))
+        date += datetime.timedelta(days=1)
+    return opening, series
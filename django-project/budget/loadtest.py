@@ -0,0 +1,228 @@
+"""Scripted load test of the real URL routes
+
+Each worker thread plays one user session after another: log in, then a
+weighted mix of page views, chart API polls and new transactions until
+the run's deadline. Requests go either through the WSGI handler in this
+process (django.test.Client) or over HTTP to a running server, and every
+request's latency is recorded under its route name.
+"""
+import datetime
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from .models import Category
+
+# route name, relative weight
+ACTIONS = [
+    ('dashboard', 30),
+    ('expense_data_api', 15),
+    ('budget_progress_api', 15),
+    ('transaction_list', 15),
+    ('reports_view', 10),
+    ('add_transaction', 10),
+    ('budget_overview', 5),
+]
+
+
+class ClientTransport:
+    """Requests through the WSGI handler in this process"""
+
+    def __init__(self):
+        self.client = Client()
+
+    def get(self, path, data=None):
+        return self.client.get(path, data).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data).status_code
+
+
+class HTTPTransport:
+    """Requests over HTTP with a cookie jar and CSRF token, like a browser"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies),
+            NoRedirect()
+        )
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def get(self, path, data=None):
+        url = self.base_url + path
+        if data:
+            url += '?' + urllib.parse.urlencode(data)
+        return self._open(urllib.request.Request(url))
+
+    def post(self, path, data):
+        if not self._csrf_token():
+            # The form page sets the CSRF cookie
+            self.get(path)
+        data = dict(data, csrfmiddlewaretoken=self._csrf_token() or '')
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=urllib.parse.urlencode(data).encode(),
+            headers={'Referer': self.base_url + path}
+        )
+        return self._open(request)
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return None
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects (e.g. after a form post) instead of following them"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class LoadTestResults:
+    """Thread-safe latency samples and error counts per route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, route, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        """{route: {requests, errors, rps, p50_ms, p95_ms, p99_ms}} plus a 'total' row"""
+        rows = {}
+        everything = []
+        for route, samples in sorted(self.latencies.items()):
+            everything.extend(samples)
+            rows[route] = self._row(samples, self.errors.get(route, 0), elapsed)
+        rows['total'] = self._row(everything, sum(self.errors.values()), elapsed)
+        return rows
+
+    @staticmethod
+    def _row(samples, errors, elapsed):
+        ordered = sorted(samples)
+
+        def percentile(fraction):
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+        return {
+            'requests': len(ordered),
+            'errors': errors,
+            'rps': round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+        }
+
+
+class Session:
+    """One simulated user working through the scripted mix"""
+
+    def __init__(self, transport, user, password, results, rng):
+        self.transport = transport
+        self.user = user
+        self.password = password
+        self.results = results
+        self.rng = rng
+        self.categories = list(
+            Category.objects.filter(user=user, category_type='expense').values_list('pk', flat=True)
+        )
+
+    def timed(self, route, send, expected=(200,)):
+        started = time.perf_counter()
+        try:
+            status = send()
+        except Exception:
+            status = None
+        self.results.record(route, time.perf_counter() - started, status in expected)
+
+    def login(self):
+        self.timed('login', lambda: self.transport.post(
+            reverse('login'), {'username': self.user.username, 'password': self.password}
+        ), expected=(302,))
+
+    def add_transaction(self):
+        if not self.categories:
+            return
+        self.timed('add_transaction', lambda: self.transport.post(reverse('add_transaction'), {
+            'category': self.rng.choice(self.categories),
+            'amount': f'{self.rng.uniform(2, 80):.2f}',
+            'description': 'Load test purchase',
+            'date': datetime.date.today().isoformat(),
+        }), expected=(302,))
+
+    def step(self):
+        routes, weights = zip(*ACTIONS)
+        route = self.rng.choices(routes, weights)[0]
+        if route == 'add_transaction':
+            self.add_transaction()
+        else:
+            self.timed(route, lambda: self.transport.get(reverse(route)))
+
+
+def run_worker(make_transport, user, password, results, deadline, session_length, seed):
+    rng = random.Random(seed)
+    try:
+        while time.monotonic() < deadline:
+            session = Session(make_transport(), user, password, results, rng)
+            session.login()
+            for _ in range(session_length):
+                if time.monotonic() >= deadline:
+                    break
+                session.step()
+    finally:
+        # Database connections are per thread
+        connections.close_all()
+
+
+def run_load_test(users, password, concurrency=4, duration=30, session_length=20, base_url=None, seed=0):
+    """Run concurrency worker threads for duration seconds and return (summary, elapsed)"""
+    if base_url:
+        def make_transport():
+            return HTTPTransport(base_url)
+    else:
+        make_transport = ClientTransport
+
+    results = LoadTestResults()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=run_worker,
+            args=(make_transport, users[index % len(users)], password, results, deadline,
+                  session_length, seed + index),
+            daemon=True,
+        )
+        for index in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return results.summary(elapsed), elapsed
@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from budget.benchmarks import BASELINE_PATH, DATASETS, DEFAULT_THRESHOLD, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot views and model properties against generated datasets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datasets',
+            default=','.join(DATASETS),
+            help=f'Comma-separated dataset sizes to run ({", ".join(DATASETS)})'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument(
+            '--baseline',
+            help=(
+                'Compare the results, including time and memory, with this JSON file. By default '
+                'only query counts are compared with the committed baseline, whose timings come '
+                'from one machine and are for reference only'
+            )
+        )
+        parser.add_argument(
+            '--no-baseline',
+            action='store_true',
+            help='Skip the comparison, e.g. when writing a new baseline with --output'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            help=(
+                'Allowed relative growth in time and memory before a case counts as a regression; '
+                f'giving it also compares them with the committed baseline (default with --baseline: '
+                f'{DEFAULT_THRESHOLD})'
+            )
+        )
+
+    def handle(self, *args, **options):
+        datasets = [name.strip() for name in options['datasets'].split(',') if name.strip()]
+        unknown = set(datasets) - set(DATASETS)
+        if unknown:
+            raise CommandError(f'Unknown datasets: {", ".join(sorted(unknown))}')
+        baseline = None
+        baseline_path = options['baseline'] or BASELINE_PATH
+        threshold = options['threshold']
+        if threshold is None and options['baseline']:
+            threshold = DEFAULT_THRESHOLD
+        if not options['no_baseline']:
+            try:
+                baseline = json.loads(Path(baseline_path).read_text())
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Cannot read baseline: {error}')
+
+        # Benchmarks seed their own data, so run them in a throwaway test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(datasets, repeat=options['repeat'], progress=self.progress)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(results, baseline, threshold)
+            for dataset, case, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f'{dataset} {case}: {metric} {before} -> {after}'
+                ))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {baseline_path}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def progress(self, dataset, case, figures):
+        self.stdout.write(
+            f'{dataset:<7} {case:<32} {figures["median_ms"]:>9.2f} ms '
+            f'{figures["queries"]:>4} queries {figures["peak_kb"]:>9.1f} KiB'
+        )
@@ -28,14 +28,12 @@ class Command(BaseCommand):
             demo_user.save()
             self.stdout.write(f'Created demo user: demo/demo123')
         
-        # Create or update user profile
-        profile, created = UserProfile.objects.get_or_create(
-            user=demo_user,
-            defaults={
-                'monthly_income': Decimal('5000.00'),
-                'savings_goal': Decimal('1000.00'),
-            }
-        )
+        # Fill in the profile created with the user
+        profile, _ = UserProfile.objects.get_or_create(user=demo_user)
+        if created:
+            profile.monthly_income = Decimal('5000.00')
+            profile.savings_goal = Decimal('1000.00')
+            profile.save()
         
         # Create sample categories if they don't exist
         categories_data = [
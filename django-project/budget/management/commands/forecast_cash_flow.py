@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from budget import forecasting
+
+
+class Command(BaseCommand):
+    help = 'Forecast the cash flow of every user in chunks and cache the results for the dashboard and API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only forecast this username (may be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Users forecast per query')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        started = time.perf_counter()
+
+        def progress(done, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {done}/{total} users ({done / elapsed:.0f} users/sec)')
+
+        done = forecasting.forecast_all(users, batch_size=options['batch_size'], progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Forecast {done} users in {elapsed:.2f}s'))
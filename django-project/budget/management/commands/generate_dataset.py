@@ -0,0 +1,92 @@
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from budget.datasets import DatasetSpec, create_users, delete_users, generate_shard, init_worker
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset of users, budgets and transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create')
+        parser.add_argument('--transactions', type=int, default=1000, help='Transactions per user')
+        parser.add_argument('--years', type=int, default=2, help='Years of history per user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument(
+            '--end-date',
+            type=datetime.date.fromisoformat,
+            help='Last day of the generated history, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument('--prefix', default='loadtest', help='Username prefix')
+        parser.add_argument('--password', default='loadtest', help='Password for every generated user')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes, each generating a shard of the users (not used with SQLite)'
+        )
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete existing users with the prefix first'
+        )
+
+    def handle(self, *args, **options):
+        existing = User.objects.filter(username__startswith=options['prefix'])
+        if options['flush']:
+            deleted = delete_users(existing)
+            self.stdout.write(f'Deleted {deleted} existing users with prefix "{options["prefix"]}"')
+        elif existing.exists():
+            raise CommandError(
+                f'Users with prefix "{options["prefix"]}" already exist; use --flush or another --prefix'
+            )
+
+        spec = DatasetSpec(
+            transactions=options['transactions'],
+            years=options['years'],
+            seed=options['seed'],
+            end_date=options['end_date'],
+            batch_size=options['batch_size'],
+        )
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using a single process'))
+            workers = 1
+
+        started = time.perf_counter()
+        user_ids = create_users(options['prefix'], options['users'], options['password'])
+        self.stdout.write(f'Created {len(user_ids)} users in {time.perf_counter() - started:.1f}s')
+
+        # Small shards keep the pool busy and give regular progress output
+        indexed = list(zip(user_ids, range(len(user_ids))))
+        shard_size = max(1, min(50, len(indexed) // (workers * 4) or 1))
+        shards = [indexed[start:start + shard_size] for start in range(0, len(indexed), shard_size)]
+
+        if workers > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = pool.map(generate_shard, shards, [spec] * len(shards))
+                self.report(results, started)
+        else:
+            self.report((generate_shard(shard, spec) for shard in shards), started)
+
+    def report(self, results, started):
+        users = written = 0
+        for shard_users, shard_written, _ in results:
+            users += shard_users
+            written += shard_written
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {users} users, {written} transactions ({written / elapsed:.0f} rows/sec)'
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {written} transactions for {users} users in {elapsed:.1f}s '
+            f'({written / elapsed if elapsed else 0:.0f} rows/sec)'
+        ))
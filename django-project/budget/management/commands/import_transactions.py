@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.importers import PARSERS, detect_format, import_transactions
+
+
+class Command(BaseCommand):
+    help = 'Import transactions for a user from a CSV or OFX bank export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User to import the transactions for')
+        parser.add_argument('path', help='CSV or OFX file to import')
+        parser.add_argument(
+            '--format',
+            choices=sorted(PARSERS),
+            help='File format (detected from the file extension by default)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows written per bulk insert'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Unknown user "{options["username"]}"')
+
+        file_format = options['format'] or detect_format(options['path'])
+
+        def progress(result):
+            self.stdout.write(f'  {result.rows} rows read ({result.rows_per_second:.0f} rows/sec)')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', errors='replace', newline='') as lines:
+                result = import_transactions(
+                    user, lines, file_format,
+                    batch_size=options['batch_size'],
+                    progress=progress
+                )
+        except OSError as error:
+            raise CommandError(str(error))
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from budget.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = 'Drive the app with concurrent scripted user sessions and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent sessions (threads)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run for')
+        parser.add_argument('--session-length', type=int, default=20, help='Requests per session after login')
+        parser.add_argument('--prefix', default='loadtest', help='Username prefix of the generated users to log in as')
+        parser.add_argument('--password', default='loadtest', help='Password of those users')
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server; by default requests go through the WSGI handler in-process'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the request mix')
+        parser.add_argument('--output', help='Write the per-route results as JSON to this file')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=options['prefix']).order_by('pk')[:options['concurrency']])
+        if not users:
+            raise CommandError(
+                f'No users with prefix "{options["prefix"]}"; create them with generate_dataset first'
+            )
+
+        self.stdout.write(
+            f'Running {options["concurrency"]} sessions for {options["duration"]:.0f}s '
+            f'against {options["url"] or "the in-process WSGI handler"}...'
+        )
+        overrides = {}
+        if not options['url']:
+            # Keep the request path production-like for in-process runs
+            overrides = {
+                'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+                'BUDGET_QUERY_INSPECTOR_MODE': '',
+                'BUDGET_PROFILE_SAMPLE_RATE': 0,
+            }
+        with override_settings(**overrides):
+            summary, elapsed = run_load_test(
+                users,
+                options['password'],
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                session_length=options['session_length'],
+                base_url=options['url'],
+                seed=options['seed'],
+            )
+
+        self.stdout.write(f'{"route":<22}{"requests":>9}{"errors":>8}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+        for route, row in summary.items():
+            line = (
+                f'{route:<22}{row["requests"]:>9}{row["errors"]:>8}{row["rps"]:>9}'
+                f'{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["p99_ms"]:>10}'
+            )
+            self.stdout.write(self.style.SUCCESS(line) if route == 'total' else line)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({
+                'concurrency': options['concurrency'],
+                'elapsed': round(elapsed, 2),
+                'routes': summary,
+            }, indent=2) + '\n')
+            self.stdout.write(f'Results written to {options["output"]}')
@@ -0,0 +1,46 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.onboarding import DEFAULT_TEMPLATE, UnknownTemplate, onboard_users
+
+
+class Command(BaseCommand):
+    help = 'Create accounts in bulk from a CSV, each with a profile and a category template'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV with a username column and optionally email, first_name, last_name, '
+                 'password_hash or password, monthly_income and savings_goal'
+        )
+        parser.add_argument('--template', default=DEFAULT_TEMPLATE, help='Category template to apply')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Accounts written per transaction')
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(f'  {result.created} users onboarded ({result.users_per_second:.0f} users/sec)')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                reader = csv.DictReader(lines)
+                if 'username' not in (reader.fieldnames or []):
+                    raise CommandError('The CSV needs a "username" column')
+                if 'password' in reader.fieldnames:
+                    self.stdout.write(self.style.WARNING(
+                        'Hashing plain passwords is slow; export password_hash instead for large cohorts'
+                    ))
+                result = onboard_users(
+                    reader,
+                    template=options['template'],
+                    batch_size=options['batch_size'],
+                    progress=progress
+                )
+        except OSError as error:
+            raise CommandError(str(error))
+        except UnknownTemplate as error:
+            raise CommandError(str(error))
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(str(result)))
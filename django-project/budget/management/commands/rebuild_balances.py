@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from budget import ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily balance ledger from the raw transactions and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only rebuild the ledger for this username (may be repeated)'
+        )
+        parser.add_argument(
+            '--check-only',
+            action='store_true',
+            help='Compare the ledger with the raw rows without rewriting it'
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+
+        if not options['check_only']:
+            written = ledger.rebuild(users)
+            self.stdout.write(f'Rebuilt {written} daily balance rows')
+
+        mismatches = ledger.verify(users)
+        for key, expected, actual in mismatches[:20]:
+            self.stdout.write(f'  {key}: expected {expected}, stored {actual}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} daily balance rows do not match the transactions')
+
+        self.stdout.write(
+            self.style.SUCCESS('Daily balances match the transactions')
+        )
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from budget import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly category rollup table from the raw transactions and verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only rebuild rollups for this username (may be repeated)'
+        )
+        parser.add_argument(
+            '--check-only',
+            action='store_true',
+            help='Compare the rollups with the raw rows without rewriting them'
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+            missing = set(options['usernames']) - set(users.values_list('username', flat=True))
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+
+        if not options['check_only']:
+            written = rollups.rebuild(users)
+            self.stdout.write(f'Rebuilt {written} rollup rows')
+
+        mismatches = rollups.verify(users)
+        for key, expected, actual in mismatches[:20]:
+            self.stdout.write(f'  {key}: expected {expected}, stored {actual}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollup rows do not match the transactions')
+
+        self.stdout.write(
+            self.style.SUCCESS('Monthly rollups match the transactions')
+        )
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from budget.datasets import init_worker
+from budget.simulation import goal_owner_ids, recompute_users
+
+
+class Command(BaseCommand):
+    help = 'Recompute the success probability of every savings goal and cache the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Only recompute the goals of this username (may be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Users simulated per task')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be at least 1')
+        user_ids = goal_owner_ids()
+        if options['usernames']:
+            users = dict(User.objects.filter(username__in=options['usernames']).values_list('username', 'pk'))
+            missing = set(options['usernames']) - set(users)
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+            user_ids = [user_id for user_id in user_ids if user_id in set(users.values())]
+
+        size = options['batch_size']
+        chunks = [user_ids[start:start + size] for start in range(0, len(user_ids), size)]
+        started = time.perf_counter()
+        if options['workers'] > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                self.report(pool.map(recompute_users, chunks), started)
+        else:
+            self.report((recompute_users(chunk) for chunk in chunks), started)
+
+    def report(self, results, started):
+        goals = 0
+        for count in results:
+            goals += count
+            self.stdout.write(f'  {goals} goals ({goals / (time.perf_counter() - started):.0f} goals/sec)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Simulated {goals} savings goals in {time.perf_counter() - started:.2f}s'
+        ))
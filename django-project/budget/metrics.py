@@ -0,0 +1,165 @@
+"""Per-request timings and per-view metrics in Prometheus text format
+
+RequestTimings collects what one request spends on SQL, template rendering
+and payload cache lookups; ServerTimingMiddleware (budget.middleware)
+reports it in a Server-Timing header and folds it into the per-view
+histograms served by the metrics view.
+"""
+import contextvars
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class RequestTimings:
+    """What the current request has spent so far"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper hook timing each query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f};desc="Templates"',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={self.elapsed * 1000:.1f}',
+        ])
+
+
+_current = contextvars.ContextVar('budget_request_timings', default=None)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_timings():
+    """The RequestTimings of the request being served, or None"""
+    return _current.get()
+
+
+def record_template_time(seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.template_time += seconds
+
+
+def record_cache_lookup(hit):
+    timings = _current.get()
+    if timings is not None:
+        if hit:
+            timings.cache_hits += 1
+        else:
+            timings.cache_misses += 1
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a label value"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label, value):
+        series = self.series.setdefault(label, {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0})
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][index] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self, label_name):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label, series in sorted(self.series.items()):
+            labels = f'{label_name}="{_escape(label)}"'
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{labels}}} {series["count"]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class ViewMetrics:
+    """Thread-safe per-view latency, query count and response size histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = Histogram(
+                'budget_request_duration_seconds', 'Time spent serving the request.', LATENCY_BUCKETS
+            )
+            self.queries = Histogram(
+                'budget_request_queries', 'SQL queries run by the request.', QUERY_BUCKETS
+            )
+            self.sizes = Histogram(
+                'budget_response_size_bytes', 'Size of non-streaming response bodies.', SIZE_BUCKETS
+            )
+
+    def observe(self, view, timings, size=None):
+        with self._lock:
+            self.latency.observe(view, timings.elapsed)
+            self.queries.observe(view, timings.queries)
+            if size is not None:
+                self.sizes.observe(view, size)
+
+    def render(self, cache=None):
+        """All metrics in the Prometheus text exposition format
+
+        cache is a budget.cache.CacheStats snapshot to include as counters.
+        """
+        with self._lock:
+            lines = (
+                self.latency.render('view') +
+                self.queries.render('view') +
+                self.sizes.render('view')
+            )
+        if cache is not None:
+            lines += [
+                '# HELP budget_payload_cache_hits_total Payload cache hits.',
+                '# TYPE budget_payload_cache_hits_total counter',
+                f'budget_payload_cache_hits_total {cache["hits"]}',
+                '# HELP budget_payload_cache_misses_total Payload cache misses.',
+                '# TYPE budget_payload_cache_misses_total counter',
+                f'budget_payload_cache_misses_total {cache["misses"]}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+view_metrics = ViewMetrics()
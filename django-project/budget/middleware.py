@@ -0,0 +1,233 @@
+"""Request middleware for the budget app"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+import warnings
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics, profiling
+from .models import UserProfile
+from .query_budgets import DEFAULT_QUERY_BUDGET, QUERY_BUDGETS, REPEATED_QUERY_THRESHOLD, UNBUDGETED_VIEWS
+
+logger = logging.getLogger('budget.queries')
+
+# Instrumentation frames that sit between a query and the code that ran it
+INSTRUMENTATION_FILES = {os.path.abspath(__file__), os.path.abspath(metrics.__file__)}
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more queries than its view's budget allows"""
+
+
+class QueryBudgetWarning(RuntimeWarning):
+    """Reported instead of QueryBudgetExceeded outside of 'raise' mode"""
+
+
+def _call_site():
+    """File, line and function of the innermost project frame running a query"""
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (filename.startswith(base_dir) and filename not in INSTRUMENTATION_FILES
+                and 'site-packages' not in filename):
+            relative = os.path.relpath(filename, base_dir)
+            return f'{relative}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryRecorder:
+    """execute_wrapper that records each statement with its call site"""
+
+    def __init__(self):
+        self.statements = Counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements[(sql, _call_site())] += 1
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+
+    def repeats(self, threshold):
+        return [
+            {'sql': sql, 'call_site': site, 'count': count}
+            for (sql, site), count in self.statements.most_common()
+            if count > threshold
+        ]
+
+
+class QueryInspectorMiddleware:
+    """Flag N+1 patterns and per-view query budget overruns
+
+    BUDGET_QUERY_INSPECTOR_MODE selects what happens to a violation:
+    'warn' issues a QueryBudgetWarning (development), 'raise' raises
+    QueryBudgetExceeded so the request fails (tests and CI) and 'log'
+    writes one JSON line to the budget.queries logger for a sample of
+    requests set by BUDGET_QUERY_INSPECTOR_SAMPLE_RATE (production). Any
+    other value turns the inspector off. Budgets live in budget.query_budgets.
+
+    Streaming responses run their queries while the body is iterated, so
+    they are recorded and checked once the body is exhausted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'BUDGET_QUERY_INSPECTOR_MODE', '')
+        if mode not in ('warn', 'raise', 'log'):
+            return self.get_response(request)
+        if mode == 'log' and random.random() >= getattr(settings, 'BUDGET_QUERY_INSPECTOR_SAMPLE_RATE', 0.01):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with self.recording(recorder):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.inspect_stream(
+                request, mode, recorder, response.streaming_content
+            )
+        else:
+            self.check(request, mode, recorder)
+        return response
+
+    @staticmethod
+    def recording(recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def inspect_stream(self, request, mode, recorder, content):
+        with self.recording(recorder):
+            yield from content
+        self.check(request, mode, recorder)
+
+    def check(self, request, mode, recorder):
+        report = self.inspect(request, recorder)
+        if report:
+            self.report(mode, report)
+
+    def inspect(self, request, recorder):
+        """Return a description of the request's violations, or None"""
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        url_name = match.url_name if match else None
+        if (request.method, url_name) in UNBUDGETED_VIEWS:
+            return None
+        budget = QUERY_BUDGETS.get((request.method, url_name), QUERY_BUDGETS.get(url_name, DEFAULT_QUERY_BUDGET))
+        threshold = getattr(settings, 'BUDGET_QUERY_REPEAT_THRESHOLD', REPEATED_QUERY_THRESHOLD)
+        repeats = recorder.repeats(threshold)
+        if recorder.count <= budget and not repeats:
+            return None
+        return {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'queries': recorder.count,
+            'budget': budget,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'repeats': repeats,
+        }
+
+    def report(self, mode, report):
+        if mode == 'log':
+            logger.warning(json.dumps(report, sort_keys=True))
+            return
+        lines = [
+            f"{report['method']} {report['path']} ({report['view']}) ran "
+            f"{report['queries']} queries, budget {report['budget']}"
+        ]
+        for repeat in report['repeats']:
+            lines.append(f"  {repeat['count']}x at {repeat['call_site']}: {repeat['sql'][:200]}")
+        message = '\n'.join(lines)
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        warnings.warn(message, QueryBudgetWarning)
+
+
+class ServerTimingMiddleware:
+    """Add a Server-Timing header and feed the per-view metrics
+
+    The header breaks the request down into SQL time and query count,
+    template render time and payload cache hits; the same request also
+    updates the histograms exposed by the metrics view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+
+        response['Server-Timing'] = timings.server_timing()
+        match = request.resolver_match
+        size = None if response.streaming else len(response.content)
+        metrics.view_metrics.observe(match.view_name if match else 'unmatched', timings, size)
+        return response
+
+
+class ProfilerMiddleware:
+    """Profile requests chosen by budget.profiling.should_profile
+
+    Place after AuthenticationMiddleware so staff tokens can be checked.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+        return profiling.profile_request(request, self.get_response)
+
+
+def get_profile(user):
+    """The user's profile, or None for anonymous users
+
+    Profiles are created with the user; get_or_create only covers accounts
+    whose profile was deleted since.
+    """
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        return profile
+
+
+class UserProfileMiddleware:
+    """Set request.profile, loaded on first use
+
+    Place after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_profile(request.user))
+        return self.get_response(request)
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_monthly_totals(apps, schema_editor):
+    Transaction = apps.get_model('budget', 'Transaction')
+    MonthlyCategoryTotal = apps.get_model('budget', 'MonthlyCategoryTotal')
+    rows = Transaction.objects.order_by().annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date')
+    ).values(
+        'user_id', 'category_id', 'year', 'month', 'transaction_type'
+    ).annotate(
+        total=models.Sum('amount'),
+        transaction_count=models.Count('id')
+    )
+    MonthlyCategoryTotal.objects.bulk_create(
+        [MonthlyCategoryTotal(**row) for row in rows],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budget', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to='budget.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'year', 'month'], name='budget_mct_user_period_idx')],
+                'unique_together': {('user', 'category', 'year', 'month', 'transaction_type')},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_totals, migrations.RunPython.noop),
+    ]
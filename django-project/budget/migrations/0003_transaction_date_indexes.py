@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0002_monthlycategorytotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'transaction_type', 'date'], name='budget_txn_user_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', 'date'], name='budget_txn_user_cat_date_idx'),
+        ),
+    ]
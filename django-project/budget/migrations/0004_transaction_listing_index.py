@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0003_transaction_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-date', '-created_at', 'id'], name='budget_txn_user_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-16 21:10
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserProfile = apps.get_model('budget', 'UserProfile')
+    missing = User.objects.filter(profile__isnull=True).values_list('pk', flat=True)
+    UserProfile.objects.bulk_create(
+        [UserProfile(user_id=user_id) for user_id in missing],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budget', '0004_transaction_listing_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
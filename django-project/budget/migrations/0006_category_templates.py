@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The categories signup used to create one by one
+DEFAULT_CATEGORIES = [
+    ('Food & Dining', 'expense', '🍽️', '#e74c3c'),
+    ('Transportation', 'expense', '🚗', '#f39c12'),
+    ('Shopping', 'expense', '🛍️', '#9b59b6'),
+    ('Entertainment', 'expense', '🎬', '#3498db'),
+    ('Bills & Utilities', 'expense', '💡', '#e67e22'),
+    ('Healthcare', 'expense', '🏥', '#1abc9c'),
+    ('Education', 'expense', '📚', '#34495e'),
+    ('Salary', 'income', '💼', '#27ae60'),
+    ('Freelance', 'income', '💻', '#2ecc71'),
+    ('Investment', 'income', '📈', '#16a085'),
+]
+
+
+def seed_default_template(apps, schema_editor):
+    CategoryTemplate = apps.get_model('budget', 'CategoryTemplate')
+    CategoryTemplateItem = apps.get_model('budget', 'CategoryTemplateItem')
+    template, _ = CategoryTemplate.objects.get_or_create(
+        name='default',
+        defaults={'description': 'Categories every new account starts with'}
+    )
+    CategoryTemplateItem.objects.bulk_create([
+        CategoryTemplateItem(
+            template=template, name=name, category_type=category_type,
+            icon=icon, color=color, position=position
+        )
+        for position, (name, category_type, icon, color) in enumerate(DEFAULT_CATEGORIES)
+    ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0005_backfill_user_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(unique=True)),
+                ('description', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryTemplateItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('category_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('icon', models.CharField(default='💰', max_length=50)),
+                ('color', models.CharField(default='#007bff', max_length=7)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='budget.categorytemplate')),
+            ],
+            options={
+                'ordering': ['template', 'position', 'pk'],
+                'unique_together': {('template', 'name', 'category_type')},
+            },
+        ),
+        migrations.RunPython(seed_default_template, migrations.RunPython.noop),
+    ]
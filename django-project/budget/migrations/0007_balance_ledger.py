@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+
+
+def backfill_ledger(apps, schema_editor):
+    Transaction = apps.get_model('budget', 'Transaction')
+    BalanceCheckpoint = apps.get_model('budget', 'BalanceCheckpoint')
+    DailyBalance = apps.get_model('budget', 'DailyBalance')
+    rows = Transaction.objects.order_by('user_id', 'date').values('user_id', 'date').annotate(
+        income=models.Sum('amount', filter=models.Q(transaction_type='income')),
+        expenses=models.Sum('amount', filter=models.Q(transaction_type='expense')),
+        transaction_count=models.Count('id')
+    )
+    days = defaultdict(lambda: defaultdict(list))
+    for row in rows:
+        net = (row['income'] or Decimal('0')) - (row['expenses'] or Decimal('0'))
+        days[row['user_id']][row['date'].replace(day=1)].append((row['date'], net, row['transaction_count']))
+    for user_id, months in days.items():
+        opening = Decimal('0')
+        for month in sorted(months):
+            checkpoint = BalanceCheckpoint.objects.create(user_id=user_id, month=month, opening_balance=opening)
+            running = Decimal('0')
+            day_rows = []
+            for date, net, count in months[month]:
+                running += net
+                day_rows.append(DailyBalance(
+                    user_id=user_id, checkpoint=checkpoint, date=date, net=net,
+                    month_balance=running, transaction_count=count
+                ))
+            DailyBalance.objects.bulk_create(day_rows)
+            opening += running
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('budget', '0006_category_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('opening_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('month_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='days', to='budget.balancecheckpoint')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
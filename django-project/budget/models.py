@@ -1,12 +1,57 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 import datetime
 
+from .periods import current_period
+
+
+class UserProfileQuerySet(models.QuerySet):
+    """Query helpers for profiles"""
+
+    def with_summary(self):
+        """Annotate current-month income and expenses and the record counts
+
+        Income, expenses and the transaction count are conditional sums over
+        the owner's rollup rows; category and budget counts are correlated
+        subqueries, so the whole summary is one query.
+        """
+        current_year, current_month = current_period()
+        this_month = models.Q(year=current_year, month=current_month)
+        rollups = MonthlyCategoryTotal.objects.filter(user=OuterRef('user')).order_by().values('user')
+        month_income = rollups.annotate(value=models.Sum(
+            'total', filter=this_month & models.Q(transaction_type='income')
+        )).values('value')
+        month_expenses = rollups.annotate(value=models.Sum(
+            'total', filter=this_month & models.Q(transaction_type='expense')
+        )).values('value')
+        transaction_count = rollups.annotate(value=models.Sum('transaction_count')).values('value')
+        category_count = Category.objects.filter(user=OuterRef('user')).order_by().values('user').annotate(
+            value=models.Count('pk')
+        ).values('value')
+        budget_count = Budget.objects.filter(user=OuterRef('user')).order_by().values('user').annotate(
+            value=models.Count('pk')
+        ).values('value')
+        money = models.DecimalField(max_digits=14, decimal_places=2)
+        return self.annotate(
+            month_income=Coalesce(Subquery(month_income), Value(Decimal('0.00')), output_field=money),
+            month_expenses=Coalesce(Subquery(month_expenses), Value(Decimal('0.00')), output_field=money),
+            transaction_count=Coalesce(Subquery(transaction_count), Value(0)),
+            category_count=Coalesce(Subquery(category_count), Value(0)),
+            budget_count=Coalesce(Subquery(budget_count), Value(0)),
+        )
+
 
 class UserProfile(models.Model):
-    """Extended user profile for budget planning"""
+    """Extended user profile for budget planning
+
+    Created for every new user by a post_save signal (budget.signals).
+    """
+    SUMMARY_FIELDS = ('month_income', 'month_expenses', 'transaction_count', 'category_count', 'budget_count')
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     monthly_income = models.DecimalField(
         max_digits=10, 
@@ -23,30 +68,29 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserProfileQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    def summary(self):
+        """Current-month figures and record counts, loaded together once"""
+        # Filled in by UserProfileQuerySet.with_summary(), otherwise fetched once
+        if any(field not in self.__dict__ for field in self.SUMMARY_FIELDS):
+            self.__dict__.update(
+                UserProfile.objects.filter(pk=self.pk).with_summary().values(*self.SUMMARY_FIELDS).get()
+            )
+        return {field: self.__dict__[field] for field in self.SUMMARY_FIELDS}
+
     @property
     def current_month_expenses(self):
         """Calculate total expenses for current month"""
-        current_month = datetime.datetime.now().month
-        current_year = datetime.datetime.now().year
-        return self.user.transactions.filter(
-            date__month=current_month,
-            date__year=current_year,
-            transaction_type='expense'
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        return self.summary()['month_expenses']
 
     @property
     def current_month_income(self):
         """Calculate total income for current month"""
-        current_month = datetime.datetime.now().month
-        current_year = datetime.datetime.now().year
-        return self.user.transactions.filter(
-            date__month=current_month,
-            date__year=current_year,
-            transaction_type='income'
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        return self.summary()['month_income']
 
     @property
     def current_savings(self):
@@ -54,6 +98,38 @@ class UserProfile(models.Model):
         return self.current_month_income - self.current_month_expenses
 
 
+class CategoryQuerySet(models.QuerySet):
+    """Query helpers for categories"""
+
+    def with_stats(self):
+        """Annotate current-month total, transaction count and budget counts
+
+        Each figure is a correlated subquery on the rollup or budget table,
+        so a whole listing costs one query however many categories there are.
+        """
+        current_year, current_month = current_period()
+        rollups = MonthlyCategoryTotal.objects.filter(category=OuterRef('pk')).order_by().values('category')
+        budgets = Budget.objects.filter(category=OuterRef('pk')).order_by().values('category')
+        month_total = rollups.filter(year=current_year, month=current_month).annotate(
+            value=models.Sum('total')
+        ).values('value')
+        transaction_count = rollups.annotate(value=models.Sum('transaction_count')).values('value')
+        budget_count = budgets.annotate(value=models.Count('pk')).values('value')
+        active_budget_count = budgets.filter(year=current_year, month=current_month).annotate(
+            value=models.Count('pk')
+        ).values('value')
+        return self.annotate(
+            month_total=Coalesce(
+                Subquery(month_total),
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2)
+            ),
+            transaction_count=Coalesce(Subquery(transaction_count), Value(0)),
+            budget_count=Coalesce(Subquery(budget_count), Value(0)),
+            active_budget_count=Coalesce(Subquery(active_budget_count), Value(0)),
+        )
+
+
 class Category(models.Model):
     """Expense and income categories"""
     CATEGORY_TYPES = [
@@ -68,6 +144,8 @@ class Category(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Categories'
         unique_together = ['name', 'user', 'category_type']
@@ -78,12 +156,33 @@ class Category(models.Model):
     @property
     def current_month_total(self):
         """Total amount for this category in current month"""
-        current_month = datetime.datetime.now().month
-        current_year = datetime.datetime.now().year
-        return self.transactions.filter(
-            date__month=current_month,
-            date__year=current_year
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        # Filled in by CategoryQuerySet.with_stats(), otherwise computed once
+        if 'month_total' not in self.__dict__:
+            current_year, current_month = current_period()
+            self.month_total = self.monthly_totals.filter(
+                month=current_month,
+                year=current_year
+            ).aggregate(total=models.Sum('total'))['total'] or 0
+        return self.month_total
+
+
+class BudgetQuerySet(models.QuerySet):
+    """Query helpers for budgets"""
+
+    def with_spend(self):
+        """Annotate each budget with its period spend in the same query"""
+        spend = MonthlyCategoryTotal.objects.filter(
+            user=OuterRef('user'),
+            category=OuterRef('category'),
+            month=OuterRef('month'),
+            year=OuterRef('year'),
+            transaction_type='expense'
+        ).values('total')[:1]
+        return self.annotate(spent_total=Coalesce(
+            Subquery(spend),
+            Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ))
 
 
 class Budget(models.Model):
@@ -100,21 +199,32 @@ class Budget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BudgetQuerySet.as_manager()
+
     class Meta:
         unique_together = ['user', 'category', 'month', 'year']
 
     def __str__(self):
         return f"{self.user.username} - {self.category.name} ({self.month}/{self.year})"
 
+    def save(self, *args, **kwargs):
+        # Category or period may have changed, so drop any memoized spend
+        self.__dict__.pop('spent_total', None)
+        super().save(*args, **kwargs)
+
     @property
     def spent_amount(self):
         """Amount spent in this category for the budget period"""
-        return self.category.transactions.filter(
-            date__month=self.month,
-            date__year=self.year,
-            user=self.user,
-            transaction_type='expense'
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        # Filled in by BudgetQuerySet.with_spend(), otherwise computed once
+        if 'spent_total' not in self.__dict__:
+            self.spent_total = MonthlyCategoryTotal.objects.filter(
+                category_id=self.category_id,
+                month=self.month,
+                year=self.year,
+                user_id=self.user_id,
+                transaction_type='expense'
+            ).aggregate(total=models.Sum('total'))['total'] or 0
+        return self.spent_total
 
     @property
     def remaining_amount(self):
@@ -141,6 +251,27 @@ class Budget(models.Model):
         return 0
 
 
+class TransactionQuerySet(models.QuerySet):
+    """Query helpers for transactions"""
+
+    def for_display(self):
+        """Join the category and skip columns that listings never render
+
+        Use for every queryset whose rows are rendered with their category,
+        so a page costs one query instead of one per row.
+        """
+        return self.select_related('category').defer('updated_at', 'category__created_at')
+
+    def delete(self):
+        """Delete the transactions and take them out of the rollups and ledger in bulk"""
+        from .signals import ROLLUP_FIELDS, remove_from_summaries
+        with db_transaction.atomic():
+            rows = list(self.order_by().values(*ROLLUP_FIELDS))
+            result = super().delete()
+            remove_from_summaries(rows)
+        return result
+
+
 class Transaction(models.Model):
     """Income and expense transactions"""
     TRANSACTION_TYPES = [
@@ -161,16 +292,161 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', 'transaction_type', 'date'], name='budget_txn_user_type_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='budget_txn_user_cat_date_idx'),
+            models.Index(fields=['user', '-date', '-created_at', 'id'], name='budget_txn_user_listing_idx'),
+        ]
 
     def __str__(self):
         return f"{self.description} - ${self.amount} ({self.date})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what is stored so the rollup signals can move the old amount
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
-        # Ensure transaction_type matches category type
-        self.transaction_type = self.category.category_type
-        super().save(*args, **kwargs)
+        # Ensure transaction_type matches category type, taking it from the
+        # category registry rather than loading the category row when the
+        # registry is kept current across workers
+        from .categories import registry_enabled, user_categories
+        info = None
+        if self.user_id is not None and not Transaction.category.is_cached(self) and registry_enabled():
+            info = user_categories(self.user_id).get(self.category_id)
+        self.transaction_type = info.category_type if info else self.category.category_type
+        # The rollups and ledger are updated by post_save in the same transaction
+        with db_transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Not a post_delete receiver, see budget.signals.remove_from_summaries
+        from .signals import remove_from_summaries, stored_values
+        with db_transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            remove_from_summaries([stored_values(self)])
+        return result
+
+
+class MonthlyCategoryTotalQuerySet(models.QuerySet):
+    """Query helpers for monthly rollups"""
+
+    def for_month(self, year, month):
+        return self.filter(year=year, month=month)
+
+    def totals_by_type(self):
+        """Return {'income': total, 'expense': total} for the rows in the queryset"""
+        totals = {'income': 0, 'expense': 0}
+        for row in self.order_by().values('transaction_type').annotate(
+            total=models.Sum('total')
+        ):
+            totals[row['transaction_type']] = row['total'] or 0
+        return totals
+
+
+class MonthlyCategoryTotal(models.Model):
+    """Per-user, per-category, per-month transaction totals
+
+    Maintained incrementally by the Transaction signals in budget.signals.
+    Bulk writes that skip signals must call budget.rollups.apply_deltas() or
+    rebuild with the rebuild_monthly_totals management command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_totals')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='monthly_totals')
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()  # 1-12
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    objects = MonthlyCategoryTotalQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ['user', 'category', 'year', 'month', 'transaction_type']
+        indexes = [
+            models.Index(fields=['user', 'year', 'month'], name='budget_mct_user_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} {self.month}/{self.year}: ${self.total}"
+
+
+class BalanceCheckpoint(models.Model):
+    """Balance a user carries into a month: the net of every earlier transaction
+
+    Maintained with DailyBalance by budget.ledger. A backdated write only
+    rewrites the day rows left in its own month plus one checkpoint per
+    later month, instead of every later day.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    month = models.DateField()  # First day of the month
+    opening_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ['user', 'month']
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}: ${self.opening_balance}"
+
+
+class DailyBalance(models.Model):
+    """Net cash flow of one day with activity and the running balance after it
+
+    Maintained incrementally by the Transaction signals in budget.signals.
+    Bulk writes that skip signals must call budget.ledger.apply_deltas() or
+    rebuild with the rebuild_balances management command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_balances')
+    checkpoint = models.ForeignKey(BalanceCheckpoint, on_delete=models.CASCADE, related_name='days')
+    date = models.DateField()
+    net = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Net since the checkpoint's month started, through this day
+    month_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'date']
+
+    def __str__(self):
+        return f"{self.user_id} {self.date}: ${self.net}"
+
+    @property
+    def balance(self):
+        """Balance at the end of the day"""
+        return self.checkpoint.opening_balance + self.month_balance
+
+
+class CategoryTemplate(models.Model):
+    """Named set of categories given to new users (see budget.onboarding)"""
+    name = models.SlugField(max_length=50, unique=True)
+    description = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryTemplateItem(models.Model):
+    """One category of a CategoryTemplate"""
+    template = models.ForeignKey(CategoryTemplate, on_delete=models.CASCADE, related_name='items')
+    name = models.CharField(max_length=100)
+    category_type = models.CharField(max_length=10, choices=Category.CATEGORY_TYPES)
+    icon = models.CharField(max_length=50, default='💰')
+    color = models.CharField(max_length=7, default='#007bff')
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['template', 'position', 'pk']
+        unique_together = ['template', 'name', 'category_type']
+
+    def __str__(self):
+        return f"{self.template.name}: {self.name} ({self.category_type})"
 
 
 class FinancialTip(models.Model):
@@ -244,3 +520,12 @@ class SavingsGoal(models.Model):
         if self.target_date <= today:
             return 0
         return (self.target_date - today).days
+
+    @property
+    def success_probability(self):
+        """Estimated chance (0-1) of reaching the target by the target date, None without enough history"""
+        # Filled in by budget.simulation.attach_probabilities(), otherwise looked up once
+        if 'simulation' not in self.__dict__:
+            from .simulation import cached_goal_probabilities
+            self.simulation = cached_goal_probabilities(self.user_id, [self])[self.pk]
+        return self.simulation['probability']
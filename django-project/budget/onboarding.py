@@ -0,0 +1,205 @@
+"""New-user provisioning from category templates
+
+A CategoryTemplate is a named set of categories stored in the database.
+Templates are read through a small in-process cache, dropped by the
+template signals in budget.signals and otherwise refreshed after
+TEMPLATE_CACHE_SECONDS, so provisioning a user costs a single bulk insert.
+onboard_users() does the same for thousands of accounts at a time, with
+batched user, profile and category inserts.
+"""
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import bump_data_version
+from .categories import bump_category_version
+from .models import Category, CategoryTemplate, CategoryTemplateItem, UserProfile
+
+DEFAULT_TEMPLATE = 'default'
+TEMPLATE_CACHE_SECONDS = 300
+MAX_REPORTED_ERRORS = 50
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+class UnknownTemplate(LookupError):
+    """No CategoryTemplate has the requested name"""
+
+
+def template_categories(name=DEFAULT_TEMPLATE):
+    """(name, category_type, icon, color) tuples of the named template"""
+    now = time.monotonic()
+    with _templates_lock:
+        cached = _templates.get(name)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+    items = tuple(CategoryTemplateItem.objects.filter(template__name=name).values_list(
+        'name', 'category_type', 'icon', 'color'
+    ))
+    if not items and not CategoryTemplate.objects.filter(name=name).exists():
+        raise UnknownTemplate(f'Unknown category template "{name}"')
+    with _templates_lock:
+        _templates[name] = (now + TEMPLATE_CACHE_SECONDS, items)
+    return items
+
+
+def clear_template_cache():
+    with _templates_lock:
+        _templates.clear()
+
+
+def template_category_objects(user_id, items):
+    return [
+        Category(user_id=user_id, name=name, category_type=category_type, icon=icon, color=color)
+        for name, category_type, icon, color in items
+    ]
+
+
+def provision_user(user, template=DEFAULT_TEMPLATE):
+    """Give a new user the template's categories with one bulk insert
+
+    The profile comes from the User post_save signal; call this inside the
+    same atomic block that saved the user so both are created together.
+    """
+    Category.objects.bulk_create(template_category_objects(user.pk, template_categories(template)))
+    # bulk_create sends no signals
+    bump_category_version(user.pk)
+    bump_data_version(user.pk)
+
+
+class OnboardResult:
+    """Counts of an onboard_users() run"""
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def users_per_second(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.created} users onboarded, {self.skipped} skipped '
+            f'in {self.elapsed:.2f}s ({self.users_per_second:.0f} users/sec)'
+        )
+
+
+def _password_hash(row):
+    """Hash for the account: a stored hash, a hashed plain password or unusable
+
+    Hashing plain passwords runs the full password hasher per account, which
+    dominates large cohorts; prefer exporting hashes where possible.
+    """
+    if row.get('password_hash'):
+        identify_hasher(row['password_hash'])
+        return row['password_hash']
+    return make_password(row.get('password') or None)
+
+
+def _money(value):
+    try:
+        amount = Decimal(value or '0')
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount "{value}"')
+    if amount < 0:
+        raise ValueError(f'Negative amount "{value}"')
+    return amount
+
+
+def _build_user(row):
+    username = (row.get('username') or '').strip()
+    if not username:
+        raise ValueError('Missing username')
+    user = User(
+        username=username,
+        email=(row.get('email') or '').strip(),
+        first_name=(row.get('first_name') or '').strip(),
+        last_name=(row.get('last_name') or '').strip(),
+        password=_password_hash(row),
+    )
+    try:
+        user.clean_fields(exclude=['password', 'last_login', 'date_joined'])
+    except ValidationError as error:
+        raise ValueError('; '.join(error.messages))
+    profile = UserProfile(
+        monthly_income=_money(row.get('monthly_income')),
+        savings_goal=_money(row.get('savings_goal')),
+    )
+    return user, profile
+
+
+def _onboard_batch(batch, items, result):
+    existing = set(User.objects.filter(
+        username__in=[user.username for user, _ in batch]
+    ).values_list('username', flat=True))
+    new = [(user, profile) for user, profile in batch if user.username not in existing]
+    result.skipped += len(batch) - len(new)
+    if not new:
+        return
+    with transaction.atomic():
+        # bulk_create sends no post_save, so profiles are created here
+        users = User.objects.bulk_create([user for user, _ in new])
+        if any(user.pk is None for user in users):
+            # Backends that cannot return ids from bulk inserts
+            ids = dict(User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+        profiles = []
+        categories = []
+        for user, profile in new:
+            profile.user_id = user.pk
+            profiles.append(profile)
+            categories.extend(template_category_objects(user.pk, items))
+        UserProfile.objects.bulk_create(profiles)
+        Category.objects.bulk_create(categories)
+    # Brand-new users have no cached payloads or category versions to bump
+    result.created += len(new)
+
+
+def onboard_users(rows, template=DEFAULT_TEMPLATE, batch_size=1000, progress=None):
+    """Create accounts from dict rows, each with a profile and the template's categories
+
+    Rows have a username and optionally email, first_name, last_name,
+    password_hash or password, monthly_income and savings_goal. Invalid
+    rows and usernames that already exist are skipped; each batch is
+    written in one transaction.
+    """
+    result = OnboardResult()
+    started = time.perf_counter()
+    items = template_categories(template)
+    batch = []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        try:
+            user, profile = _build_user(row)
+        except ValueError as error:
+            result.skipped += 1
+            if len(result.errors) < MAX_REPORTED_ERRORS:
+                result.errors.append(f'Row {number}: {error}')
+            continue
+        if user.username in seen:
+            result.skipped += 1
+            continue
+        seen.add(user.username)
+        batch.append((user, profile))
+        if len(batch) >= batch_size:
+            _onboard_batch(batch, items, result)
+            batch = []
+            if progress:
+                result.elapsed = time.perf_counter() - started
+                progress(result)
+    _onboard_batch(batch, items, result)
+    result.elapsed = time.perf_counter() - started
+    return result
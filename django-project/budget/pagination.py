@@ -0,0 +1,173 @@
+"""Pagination for large tables
+
+KeysetPaginator fetches pages with a WHERE clause on the ordering columns
+instead of OFFSET, and without a COUNT(*), so every page costs the same
+single indexed query however deep it is. Cursors are opaque url-safe
+strings. EstimatedCountPaginator keeps Django's page-number interface
+(for the admin) but never counts a whole large table.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """The cursor could not be decoded for this ordering"""
+
+
+class KeysetPage:
+    """One page of results plus the cursors for its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset by a unique ordering, e.g. ('-date', '-created_at', 'id')
+
+    The last ordering field must be unique so that every row has a distinct
+    position. A matching index keeps each page a single range scan.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name in self.fields:
+            field = self.queryset.model._meta.get_field(name)
+            values.append(field.value_to_string(obj))
+        payload = json.dumps({'d': direction, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, raw_values = payload['d'], payload['v']
+            if direction not in ('next', 'prev') or len(raw_values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, raw_values)
+            ]
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Rows strictly after (forward) or before the given position"""
+        condition = Q()
+        equal = Q()
+        for name, descending, value in zip(self.fields, self.descending, values):
+            after = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{after}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        """Return the page the cursor points at, or the first page"""
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return self._build(rows, has_next=has_more, has_previous=False)
+
+        direction, values = self.decode_cursor(cursor)
+        if direction == 'next':
+            rows = list(
+                self.queryset.filter(self._seek(values, forward=True))
+                .order_by(*self.ordering)[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return self._build(rows, has_next=has_more, has_previous=True)
+
+        reverse_ordering = [
+            name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+        ]
+        rows = list(
+            self.queryset.filter(self._seek(values, forward=False))
+            .order_by(*reverse_ordering)[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._build(rows, has_next=True, has_previous=has_more)
+
+    def _build(self, rows, has_next, has_previous):
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+        )
+
+
+def estimated_row_count(model, using='default'):
+    """Cheap estimate of the number of rows in model's table, or None
+
+    Uses the planner statistics on PostgreSQL and the highest primary key
+    elsewhere; both read a single row instead of scanning the table.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+        return None
+    if model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+        return model._default_manager.using(using).aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count never scans a large table
+
+    Unfiltered querysets use estimated_row_count(); filtered ones are
+    counted exactly up to count_limit rows and reported as count_limit
+    beyond that, so later pages of a huge filtered result are not offered.
+    """
+
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return min(queryset[:self.count_limit + 1].count(), self.count_limit)
@@ -0,0 +1,30 @@
+"""Helpers for turning budget periods into index-friendly date ranges"""
+import datetime
+
+
+def current_period():
+    """Return (year, month) for today"""
+    today = datetime.date.today()
+    return today.year, today.month
+
+
+def shift_month(year, month, offset):
+    """Move (year, month) by offset months, crossing year boundaries"""
+    index = year * 12 + (month - 1) + offset
+    return index // 12, index % 12 + 1
+
+
+def month_bounds(year, month):
+    """Return the half-open [start, end) date range covering a month"""
+    next_year, next_month = shift_month(year, month, 1)
+    return datetime.date(year, month, 1), datetime.date(next_year, next_month, 1)
+
+
+def month_range(year, month, field='date'):
+    """Filter kwargs selecting a month with plain range comparisons
+
+    Unlike date__month/date__year these compare the column directly, so the
+    database can use an index on it.
+    """
+    start, end = month_bounds(year, month)
+    return {f'{field}__gte': start, f'{field}__lt': end}
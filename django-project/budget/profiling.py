@@ -0,0 +1,161 @@
+"""On-demand request profiling with a bounded on-disk store
+
+A request is profiled when a staff user sends a valid signed token in the
+X-Budget-Profile header or the _profile query parameter, or when it is
+picked by BUDGET_PROFILE_SAMPLE_RATE. The view (including its template
+render) runs under cProfile; the .prof file and a JSON summary of the top
+functions and SQL are written to BUDGET_PROFILE_DIR, keeping only the
+newest BUDGET_PROFILE_KEEP profiles.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+
+PROFILE_HEADER = 'HTTP_X_BUDGET_PROFILE'
+PROFILE_PARAM = '_profile'
+TOKEN_SALT = 'budget.profiling'
+TOKEN_MAX_AGE = 60 * 60
+TOP_FUNCTIONS = 25
+TOP_QUERIES = 10
+PROFILE_ID = re.compile(r'^\d+-[a-z0-9_-]+$')
+DEFAULT_DIRECTORY = Path(tempfile.gettempdir()) / 'budget-planner-profiles'
+
+
+def make_token(user):
+    """Signed token that lets this staff user profile requests for an hour"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def has_valid_token(request):
+    token = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if not token or not (request.user.is_authenticated and request.user.is_staff):
+        return False
+    try:
+        user_id = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return user_id == str(request.user.pk)
+
+
+def should_profile(request):
+    if has_valid_token(request):
+        return True
+    rate = getattr(settings, 'BUDGET_PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+class SQLTimer:
+    """execute_wrapper totalling time per SQL statement"""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            entry = self.statements.setdefault(sql, {'sql': sql, 'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += time.perf_counter() - started
+
+    def top(self, limit=TOP_QUERIES):
+        return sorted(self.statements.values(), key=lambda entry: entry['seconds'], reverse=True)[:limit]
+
+
+def top_functions(profiler, limit=TOP_FUNCTIONS):
+    """The functions with the highest cumulative time"""
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({name})' if line else name,
+            'calls': calls,
+            'own': own,
+            'cumulative': cumulative,
+        })
+    rows.sort(key=lambda row: row['cumulative'], reverse=True)
+    return rows[:limit]
+
+
+class ProfileStore:
+    """Ring buffer of profiles in a directory: <id>.prof plus <id>.json"""
+
+    def __init__(self, directory=None, keep=None):
+        self.directory = Path(directory or getattr(settings, 'BUDGET_PROFILE_DIR', DEFAULT_DIRECTORY))
+        self.keep = keep or getattr(settings, 'BUDGET_PROFILE_KEEP', 50)
+
+    def save(self, profiler, summary):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^a-z0-9_-]+', '-', summary['view'].lower()).strip('-') or 'request'
+        profile_id = f'{time.time_ns()}-{slug}'
+        profiler.dump_stats(self.directory / f'{profile_id}.prof')
+        summary['id'] = profile_id
+        (self.directory / f'{profile_id}.json').write_text(json.dumps(summary))
+        self.prune()
+        return profile_id
+
+    def _ids(self):
+        if not self.directory.is_dir():
+            return []
+        return sorted((path.stem for path in self.directory.glob('*.json')), reverse=True)
+
+    def prune(self):
+        for profile_id in self._ids()[self.keep:]:
+            for suffix in ('.json', '.prof'):
+                (self.directory / f'{profile_id}{suffix}').unlink(missing_ok=True)
+
+    def recent(self):
+        summaries = []
+        for profile_id in self._ids():
+            try:
+                summaries.append(json.loads((self.directory / f'{profile_id}.json').read_text()))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def prof_path(self, profile_id):
+        """Path of a stored .prof file, or None for unknown or malformed ids"""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = self.directory / f'{profile_id}.prof'
+        return path if path.is_file() else None
+
+
+def profile_request(request, get_response):
+    """Run get_response under cProfile and store the result"""
+    if sys.getprofile() is not None:
+        # Another profiler or debugger already owns this thread
+        return get_response(request)
+    profiler = cProfile.Profile()
+    sql = SQLTimer()
+    started = time.perf_counter()
+    with connections['default'].execute_wrapper(sql):
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    match = request.resolver_match
+    ProfileStore().save(profiler, {
+        'view': match.view_name if match else 'unmatched',
+        'method': request.method,
+        'path': request.path,
+        'user': request.user.get_username() if request.user.is_authenticated else None,
+        'status': response.status_code,
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        'created': time.time(),
+        'functions': top_functions(profiler),
+        'queries': sql.top(),
+    })
+    return response
@@ -0,0 +1,63 @@
+"""Per-view SQL query budgets enforced by QueryInspectorMiddleware
+
+Keys are URL names from budget/urls.py (admin views use their own names),
+or (method, URL name) pairs for a budget that only applies to that method
+and takes precedence over the plain name. A budget is the most queries a
+single request to that view may run, including the session and user
+lookups, whatever the amount of data the user has. Raise a budget only
+together with the change that needs it.
+"""
+
+# Used for views that are not listed below
+DEFAULT_QUERY_BUDGET = 15
+
+QUERY_BUDGETS = {
+    'landing': 2,
+    'login': 10,
+    'signup': 16,
+    'dashboard': 12,
+    'transaction_list': 6,
+    'add_transaction': 10,
+    ('POST', 'add_transaction'): 14,
+    'import_transactions': 4,
+    'export_transactions': 4,
+    'edit_transaction': 8,
+    ('POST', 'edit_transaction'): 17,
+    'delete_transaction': 8,
+    ('POST', 'delete_transaction'): 11,
+    # The admin forms add a savepoint, foreign key checks and a log entry
+    # (plus its content type on a cold cache) to the same upkeep
+    ('POST', 'budget_transaction_add'): 21,
+    ('POST', 'budget_transaction_change'): 23,
+    'budget_overview': 5,
+    'create_budget': 6,
+    'edit_budget': 6,
+    'delete_budget': 6,
+    'category_list': 4,
+    'add_category': 4,
+    'edit_category': 5,
+    'delete_category': 8,
+    'profile': 6,
+    'reports_view': 6,
+    'savings_goals': 4,
+    'add_savings_goal': 4,
+    'edit_savings_goal': 5,
+    'delete_savings_goal': 5,
+    'expense_data_api': 4,
+    'budget_progress_api': 4,
+    'transactions_api': 4,
+    'balance_series_api': 4,
+    'forecast_api': 4,
+    'metrics': 2,
+    'profiles': 3,
+    'download_profile': 3,
+}
+
+# Bulk writes whose query count grows with the size of the upload (duplicate
+# lookups and inserts per batch of rows); they are not inspected
+UNBUDGETED_VIEWS = {
+    ('POST', 'import_transactions'),
+}
+
+# Identical statements from one call site beyond this count are reported as N+1
+REPEATED_QUERY_THRESHOLD = 5
@@ -0,0 +1,145 @@
+"""Maintenance of the MonthlyCategoryTotal rollup table"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import MonthlyCategoryTotal, Transaction
+
+KEY_FIELDS = ('user_id', 'category_id', 'year', 'month', 'transaction_type')
+# Rows changed by one UPDATE in apply_deltas; each adds two WHEN clauses
+UPDATE_CHUNK_SIZE = 100
+
+
+def rollup_key(user_id, category_id, date, transaction_type):
+    """Build the rollup row key a transaction contributes to"""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return (user_id, category_id, date.year, date.month, transaction_type)
+
+
+def apply_delta(key, amount, count):
+    """Add amount and count to a single rollup row, creating it if needed"""
+    apply_deltas({key: (amount, count)})
+
+
+def _key_filter(key):
+    return Q(**dict(zip(KEY_FIELDS, key)))
+
+
+@transaction.atomic(savepoint=False)
+def apply_deltas(deltas, batch_size=1000):
+    """Apply a {key: [amount, count]} mapping, e.g. after a bulk_create
+
+    Rows gaining transactions are first inserted empty, skipping those that
+    already exist (including ones another request just created), so every
+    row is then changed by the same UPDATE: a few statements per
+    UPDATE_CHUNK_SIZE rows. Rows left without transactions are deleted.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    MonthlyCategoryTotal.objects.bulk_create(
+        [
+            MonthlyCategoryTotal(total=0, transaction_count=0, **dict(zip(KEY_FIELDS, key)))
+            for key, (_, count) in deltas.items()
+            if count > 0
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    )
+    keys = list(deltas)
+    for start in range(0, len(keys), UPDATE_CHUNK_SIZE):
+        chunk = keys[start:start + UPDATE_CHUNK_SIZE]
+        MonthlyCategoryTotal.objects.filter(reduce(or_, map(_key_filter, chunk))).update(
+            total=F('total') + Case(
+                *(When(_key_filter(key), then=Value(deltas[key][0])) for key in chunk if deltas[key][0]),
+                default=Value(0),
+                output_field=models.DecimalField()
+            ),
+            transaction_count=F('transaction_count') + Case(
+                *(When(_key_filter(key), then=Value(deltas[key][1])) for key in chunk if deltas[key][1]),
+                default=Value(0)
+            )
+        )
+    emptied = [key for key, (_, count) in deltas.items() if count < 0]
+    for start in range(0, len(emptied), UPDATE_CHUNK_SIZE):
+        MonthlyCategoryTotal.objects.filter(
+            reduce(or_, map(_key_filter, emptied[start:start + UPDATE_CHUNK_SIZE])), transaction_count=0
+        ).delete()
+
+
+def collect_deltas(transactions):
+    """Accumulate rollup deltas for unsaved or bulk-created transactions"""
+    deltas = defaultdict(lambda: [Decimal('0.00'), 0])
+    for txn in transactions:
+        delta = deltas[rollup_key(txn.user_id, txn.category_id, txn.date, txn.transaction_type)]
+        delta[0] += txn.amount
+        delta[1] += 1
+    return deltas
+
+
+def compute_totals(users=None):
+    """Aggregate the raw Transaction rows into {key: (total, count)}"""
+    queryset = Transaction.objects.all()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    rows = queryset.order_by().annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date')
+    ).values(
+        'user_id', 'category_id', 'year', 'month', 'transaction_type'
+    ).annotate(
+        total=models.Sum('amount'),
+        transaction_count=models.Count('id')
+    )
+    return {
+        tuple(row[field] for field in KEY_FIELDS): (row['total'], row['transaction_count'])
+        for row in rows
+    }
+
+
+def stored_totals(users=None):
+    """Read the rollup table into {key: (total, count)}"""
+    queryset = MonthlyCategoryTotal.objects.all()
+    if users is not None:
+        queryset = queryset.filter(user__in=users)
+    return {
+        tuple(row[field] for field in KEY_FIELDS): (row['total'], row['transaction_count'])
+        for row in queryset.values(*KEY_FIELDS, 'total', 'transaction_count')
+    }
+
+
+@transaction.atomic
+def rebuild(users=None, batch_size=1000):
+    """Recreate the rollup rows from scratch and return how many were written"""
+    totals = compute_totals(users)
+    existing = MonthlyCategoryTotal.objects.all()
+    if users is not None:
+        existing = existing.filter(user__in=users)
+    existing.delete()
+    MonthlyCategoryTotal.objects.bulk_create(
+        [
+            MonthlyCategoryTotal(total=total, transaction_count=count, **dict(zip(KEY_FIELDS, key)))
+            for key, (total, count) in totals.items()
+        ],
+        batch_size=batch_size
+    )
+    return len(totals)
+
+
+def verify(users=None):
+    """Compare the rollup table with the raw rows and return mismatched keys"""
+    expected = compute_totals(users)
+    actual = stored_totals(users)
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(set(expected) | set(actual), key=str)
+        if expected.get(key) != actual.get(key)
+    ]
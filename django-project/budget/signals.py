@@ -0,0 +1,181 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import ledger, rollups
+from .cache import bump_data_version
+from .categories import bump_category_version
+from .models import (
+    Budget, Category, CategoryTemplate, CategoryTemplateItem, SavingsGoal, Transaction, UserProfile
+)
+from .onboarding import clear_template_cache
+
+
+ROLLUP_FIELDS = ('user_id', 'category_id', 'date', 'transaction_type', 'amount')
+
+
+def _stored_state(instance):
+    """Fields of the transaction as last read from or written to the database"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None or any(field not in loaded for field in ROLLUP_FIELDS):
+        return None
+    return (
+        rollups.rollup_key(loaded['user_id'], loaded['category_id'], loaded['date'], loaded['transaction_type']),
+        loaded['amount']
+    )
+
+
+def _remember_state(instance):
+    instance._loaded_values = {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+
+
+@receiver(pre_save, sender=Transaction)
+def load_stored_state(sender, instance, raw, **kwargs):
+    """Fetch the stored values for instances that were not loaded from the database"""
+    if raw or instance.pk is None or _stored_state(instance) is not None:
+        return
+    instance._loaded_values = Transaction.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+def stored_values(instance):
+    """The transaction's ROLLUP_FIELDS as stored, or as set if they were never read"""
+    if _stored_state(instance) is not None:
+        return instance._loaded_values
+    return {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+
+
+def _ledger_entry(values):
+    """((user_id, date), signed amount) of a transaction's ROLLUP_FIELDS values"""
+    date = values['date']
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return (values['user_id'], date), ledger.signed_amount(values['amount'], values['transaction_type'])
+
+
+def _add(deltas, key, amount, count):
+    delta = deltas.setdefault(key, [ledger.ZERO, 0])
+    delta[0] += amount
+    delta[1] += count
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, created, raw, **kwargs):
+    """Move the transaction's amount into its (possibly new) rollup row and ledger day
+
+    The old and new rows are changed together, so an edit costs the same
+    few statements as an add.
+    """
+    if raw:
+        return
+    rollup_deltas, ledger_deltas = {}, {}
+    new_key = rollups.rollup_key(instance.user_id, instance.category_id, instance.date, instance.transaction_type)
+    new_day, new_amount = _ledger_entry({field: getattr(instance, field) for field in ROLLUP_FIELDS})
+    _add(rollup_deltas, new_key, instance.amount, 1)
+    _add(ledger_deltas, new_day, new_amount, 1)
+    previous = None if created else _stored_state(instance)
+    if previous is not None:
+        old_key, old_amount = previous
+        old_day, old_signed = _ledger_entry(instance._loaded_values)
+        _add(rollup_deltas, old_key, -old_amount, -1)
+        _add(ledger_deltas, old_day, -old_signed, -1)
+    rollups.apply_deltas(rollup_deltas)
+    ledger.apply_deltas(ledger_deltas)
+    _remember_state(instance)
+
+
+def remove_from_summaries(rows):
+    """Take deleted transactions, given as ROLLUP_FIELDS dicts, out of the rollups and ledger
+
+    Called by Transaction.delete() and TransactionQuerySet.delete() rather
+    than from a post_delete receiver, which would stop Django from deleting
+    the transactions of a user or category with one query.
+    """
+    rollup_deltas, ledger_deltas = {}, {}
+    for values in rows:
+        key = rollups.rollup_key(values['user_id'], values['category_id'], values['date'], values['transaction_type'])
+        _add(rollup_deltas, key, -values['amount'], -1)
+        day, signed = _ledger_entry(values)
+        _add(ledger_deltas, day, -signed, -1)
+    rollups.apply_deltas(rollup_deltas)
+    ledger.apply_deltas(ledger_deltas)
+    for user_id in {user_id for user_id, _ in ledger_deltas}:
+        _invalidate(user_id)
+
+
+def _deleting_users(origin):
+    """Whether a delete cascades from deleting users, whose summaries go with them"""
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+
+@receiver(pre_delete, sender=Category)
+def collect_category_days(sender, instance, origin=None, **kwargs):
+    """Total the ledger days of the category's transactions before they are cascade-deleted
+
+    The rollup rows of the category are deleted with it, so the ledger is
+    the only summary left to correct, in one statement per changed day range.
+    """
+    if _deleting_users(origin):
+        return
+    instance._ledger_deltas = {
+        key: (-net, -count) for key, (net, count) in ledger.compute_days(categories=[instance]).items()
+    }
+
+
+@receiver(post_delete, sender=Category)
+def update_ledger_on_category_delete(sender, instance, **kwargs):
+    """Take the category's deleted transactions out of the ledger"""
+    ledger.apply_deltas(getattr(instance, '_ledger_deltas', {}))
+
+
+def _invalidate(user_id, bump=bump_data_version):
+    bump(user_id)
+    if transaction.get_connection().in_atomic_block:
+        # Concurrent readers may cache pre-commit data under the new version
+        transaction.on_commit(lambda: bump(user_id))
+
+
+@receiver(post_save, sender=User)
+def provision_profile(sender, instance, created, raw, **kwargs):
+    """Give every new user a profile, so requests never have to create one"""
+    if created and not raw:
+        UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Drop cached payloads when the account itself changes"""
+    _invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SavingsGoal)
+@receiver(post_delete, sender=SavingsGoal)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_owner_cache(sender, instance, **kwargs):
+    """Drop the owner's cached payloads"""
+    _invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry(sender, instance, **kwargs):
+    """Make the category registry reload the owner's categories"""
+    _invalidate(instance.user_id, bump=bump_category_version)
+
+
+@receiver(post_save, sender=CategoryTemplate)
+@receiver(post_delete, sender=CategoryTemplate)
+@receiver(post_save, sender=CategoryTemplateItem)
+@receiver(post_delete, sender=CategoryTemplateItem)
+def invalidate_template_cache(sender, **kwargs):
+    """Drop this process's cached category templates"""
+    clear_template_cache()
@@ -0,0 +1,149 @@
+"""Monte Carlo estimates of reaching savings goals
+
+Each user's monthly net savings (income minus expenses) over the rollup
+history window of budget.forecasting is bootstrapped into SIMULATION_PATHS
+paths of future months, drawn and accumulated in single array operations.
+A goal's probability is the share of paths whose current amount plus the
+savings accumulated by its target date reaches the target. All of a user's
+goals share the same paths. Results are cached per goal under the user's
+data version, which transaction and goal writes bump.
+"""
+import datetime
+
+import numpy as np
+
+from .cache import get_cache, get_data_version, get_data_versions, payload_key
+from .forecasting import HISTORY_MONTHS, load_history
+from .models import SavingsGoal
+
+SIMULATION_PATHS = 5000
+# Fewer months of history than this give no estimate
+MIN_HISTORY_MONTHS = 3
+# Goals further out are judged on this many months of simulated savings
+MAX_SIMULATION_MONTHS = 240
+PROBABILITY_CACHE_TIMEOUT = 60 * 60 * 26
+
+
+def payload_name(goal_id, today):
+    return f'goal-probability:{goal_id}:{today.isoformat()}'
+
+
+def months_until(today, target_date):
+    """Month ends still to come before target_date"""
+    return max(0, (target_date.year - today.year) * 12 + target_date.month - today.month)
+
+
+def monthly_net_history(user_ids, today):
+    """{user_id: monthly net savings array from their first active month on}"""
+    users, _, income, columns, totals = load_history(user_ids, today.year, today.month)
+    index = {user_id: position for position, user_id in enumerate(user_ids)}
+    rows = np.array([index[user_id] for user_id in users.tolist()], dtype=np.int64)
+    net = np.zeros((len(user_ids), HISTORY_MONTHS))
+    np.add.at(net, (rows, columns), np.where(income, totals, -totals))
+    starts = np.full(len(user_ids), HISTORY_MONTHS, dtype=np.int64)
+    np.minimum.at(starts, rows, columns)
+    return {user_id: net[position, starts[position]:] for user_id, position in index.items()}
+
+
+def simulate(history, current, target, months, paths=SIMULATION_PATHS, seed=0):
+    """Probability per goal that current + simulated savings reaches target
+
+    current, target and months are per-goal arrays; months counts the
+    months of savings before each goal's target date.
+    """
+    months = np.minimum(months, MAX_SIMULATION_MONTHS)
+    reached = current >= target
+    horizon = int(months.max()) if len(months) else 0
+    if horizon == 0:
+        return reached.astype(np.float64)
+    rng = np.random.default_rng(seed)
+    savings = history[rng.integers(0, len(history), size=(paths, horizon))].cumsum(axis=1)
+    # Goals due this month can only count what is already saved
+    at_target = np.where(months > 0, savings[:, np.maximum(months - 1, 0)], 0.0)
+    return (current[None, :] + at_target >= target[None, :]).mean(axis=0)
+
+
+def goal_probabilities(goals, today=None, paths=SIMULATION_PATHS):
+    """{goal id: payload} with the success probability of each goal
+
+    The probability is None when the user has too little history. One
+    rollup query covers all the goals' users.
+    """
+    goals = list(goals)
+    today = today or datetime.date.today()
+    by_user = {}
+    for goal in goals:
+        by_user.setdefault(goal.user_id, []).append(goal)
+    histories = monthly_net_history(list(by_user), today) if by_user else {}
+
+    payloads = {}
+    for user_id, user_goals in by_user.items():
+        history = histories[user_id]
+        months = np.array([months_until(today, goal.target_date) for goal in user_goals], dtype=np.int64)
+        current = np.array([goal.current_amount for goal in user_goals], dtype=np.float64)
+        target = np.array([goal.target_amount for goal in user_goals], dtype=np.float64)
+        if len(history) >= MIN_HISTORY_MONTHS:
+            probabilities = simulate(history, current, target, months, paths, seed=user_id).tolist()
+        else:
+            # Only goals already reached or out of time have a known outcome
+            probabilities = [
+                1.0 if reached else None if pending else 0.0
+                for reached, pending in zip((current >= target).tolist(), (months > 0).tolist())
+            ]
+        for goal, probability, goal_months in zip(user_goals, probabilities, months.tolist()):
+            payloads[goal.pk] = {
+                'probability': None if probability is None else round(probability, 3),
+                'months': goal_months,
+                'paths': paths,
+            }
+    return payloads
+
+
+def cached_goal_probabilities(user_id, goals, today=None):
+    """Goal probabilities from the payload cache, simulating only the missing ones"""
+    goals = list(goals)
+    today = today or datetime.date.today()
+    version = get_data_version(user_id)
+    keys = {goal.pk: payload_key(user_id, payload_name(goal.pk, today), version) for goal in goals}
+    cache = get_cache()
+    found = cache.get_many(keys.values())
+    payloads = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [goal for goal in goals if goal.pk not in payloads]
+    if missing:
+        computed = goal_probabilities(missing, today)
+        cache.set_many(
+            {keys[pk]: payload for pk, payload in computed.items()}, PROBABILITY_CACHE_TIMEOUT
+        )
+        payloads.update(computed)
+    return payloads
+
+
+def recompute_users(user_ids, today=None):
+    """Simulate every goal of the users and cache the results; returns the goal count"""
+    today = today or datetime.date.today()
+    # Versions first, so a write during the run leaves outdated entries behind
+    versions = get_data_versions(user_ids)
+    goals = list(SavingsGoal.objects.filter(user_id__in=user_ids))
+    payloads = goal_probabilities(goals, today)
+    get_cache().set_many(
+        {
+            payload_key(goal.user_id, payload_name(goal.pk, today), versions[goal.user_id]): payloads[goal.pk]
+            for goal in goals
+        },
+        PROBABILITY_CACHE_TIMEOUT
+    )
+    return len(goals)
+
+
+def goal_owner_ids():
+    """Ids of the users with savings goals, in order"""
+    return list(SavingsGoal.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+
+
+def attach_probabilities(user_id, goals):
+    """Load the probabilities of a user's goals together and return the goals"""
+    goals = list(goals)
+    payloads = cached_goal_probabilities(user_id, goals)
+    for goal in goals:
+        goal.simulation = payloads[goal.pk]
+    return goals
@@ -0,0 +1,25 @@
+"""Template backend that reports render time to budget.metrics"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import record_template_time
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template_time(time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose top-level renders count toward the request's template time"""
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
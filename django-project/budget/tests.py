@@ -1,3 +1,1323 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection, models
+from django.db.models import Max
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from .benchmarks import BASELINE_PATH, DATASETS, compare, property_cases, run_benchmarks, view_cases
+from .cache import _version_key, get_cache, get_data_version, payload_key
+from . import forecasting, ledger, rollups, simulation
+from .admin import RollupMonthFilter
+from .analytics import dashboard_totals, monthly_trend
+from .categories import user_categories
+from .datasets import DatasetSpec, create_users, generate_user
+from .importers import (
+    DUPLICATE_LOOKUP_KEYS, UNCATEGORIZED, TransactionImporter, import_transactions, parse_csv, parse_ofx
+)
+from .loadtest import run_load_test
+from .middleware import QueryBudgetExceeded
+from .onboarding import onboard_users
+from .pagination import EstimatedCountPaginator, KeysetPaginator
+from .periods import current_period, month_bounds, month_range, shift_month
+from .profiling import make_token
+from .models import (
+    Budget, Category, FinancialTip, MonthlyCategoryTotal, SavingsGoal, Transaction, UserProfile
+)
+from .views import TRANSACTION_PAGE_ORDERING
+
+
+class ListingQueryCountTests(TestCase):
+    """Rendering transactions must not cost a query per row"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('listing', password='secret')
+        self.client.login(username='listing', password='secret')
+
+    def add_transactions(self, count):
+        for index in range(count):
+            category = Category.objects.create(
+                user=self.user,
+                name=f'Category {Category.objects.count()}',
+                category_type='expense'
+            )
+            Transaction.objects.create(
+                user=self.user,
+                category=category,
+                amount=Decimal('10.00'),
+                description=f'Transaction {index}',
+                date=datetime.date.today()
+            )
+
+    def query_count(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assertConstantQueries(self, url):
+        # The first visit may create per-user rows such as the profile
+        self.client.get(url)
+        self.add_transactions(2)
+        few = self.query_count(url)
+        self.add_transactions(18)
+        self.assertEqual(self.query_count(url), few)
+
+    def test_transaction_list(self):
+        self.assertConstantQueries(reverse('transaction_list'))
+
+    def test_transactions_api(self):
+        self.assertConstantQueries(reverse('transactions_api'))
+
+    def test_dashboard(self):
+        self.assertConstantQueries(reverse('dashboard'))
+
+    def test_category_list(self):
+        self.assertConstantQueries(reverse('category_list'))
+
+    def test_admin_transaction_changelist(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        self.assertConstantQueries(reverse('admin:budget_transaction_changelist'))
+
+    def test_admin_filtered_transaction_changelist(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        today = datetime.date.today()
+        self.add_transactions(3)
+        category = Category.objects.filter(user=self.user).first()
+        response = self.client.get(reverse('admin:budget_transaction_changelist'), {
+            'user__id__exact': self.user.pk,
+            'month': f'{today.year}-{today.month:02d}',
+            'category__id__exact': category.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, today.strftime('%B %Y'))
+
+
+class BudgetSpendTests(TestCase):
+    """Budget spend is read with the budgets in one query, however many there are"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('spend', password='secret')
+        self.client.login(username='spend', password='secret')
+        self.year, self.month = current_period()
+
+    def add_budgets(self, count):
+        for index in range(count):
+            category = Category.objects.create(
+                user=self.user, name=f'Budget {Category.objects.count()}', category_type='expense'
+            )
+            Transaction.objects.create(
+                user=self.user, category=category, amount=Decimal('30.00'),
+                description=f'Spend {index}', date=datetime.date.today()
+            )
+            Budget.objects.create(
+                user=self.user, category=category, amount=Decimal('100.00'), month=self.month, year=self.year
+            )
+
+    def budget_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        statements = [query['sql'] for query in context.captured_queries]
+        return len(statements), [sql for sql in statements if 'FROM "budget_budget"' in sql]
+
+    def assertOneSpendQuery(self, url):
+        self.add_budgets(1)
+        few, _ = self.budget_queries(url)
+        self.add_budgets(4)
+        many, budget_queries = self.budget_queries(url)
+        self.assertEqual(many, few)
+        self.assertEqual(len(budget_queries), 1)
+        self.assertIn('budget_monthlycategorytotal', budget_queries[0])
+
+    def test_budget_overview(self):
+        self.assertOneSpendQuery(reverse('budget_overview'))
+
+    def test_dashboard(self):
+        self.assertOneSpendQuery(reverse('dashboard'))
+
+    def test_budget_progress_api(self):
+        self.assertOneSpendQuery(reverse('budget_progress_api'))
+        spent = [row['spent'] for row in self.client.get(reverse('budget_progress_api')).json()['budgets']]
+        self.assertEqual(spent, [30.0] * 5)
+
+    def test_save_clears_memoized_spend(self):
+        self.add_budgets(2)
+        first, second = Budget.objects.order_by('pk').with_spend()
+        self.assertEqual(first.spent_amount, Decimal('30.00'))
+        Transaction.objects.create(
+            user=self.user, category=second.category, amount=Decimal('15.00'),
+            description='More', date=datetime.date.today()
+        )
+        first.category = second.category
+        second.delete()
+        first.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(first.spent_amount, Decimal('45.00'))
+
+
+class PeriodTests(TestCase):
+    """Month arithmetic crosses year boundaries in both directions"""
+
+    def test_shift_month(self):
+        cases = [
+            ((2024, 12, 1), (2025, 1)), ((2025, 1, -1), (2024, 12)), ((2025, 1, -13), (2023, 12)),
+            ((2024, 11, 14), (2026, 1)), ((2025, 6, -30), (2022, 12)), ((2025, 3, 0), (2025, 3)),
+        ]
+        for args, expected in cases:
+            with self.subTest(args=args):
+                self.assertEqual(shift_month(*args), expected)
+
+    def test_month_bounds(self):
+        self.assertEqual(month_bounds(2024, 12), (datetime.date(2024, 12, 1), datetime.date(2025, 1, 1)))
+        self.assertEqual(month_bounds(2024, 2), (datetime.date(2024, 2, 1), datetime.date(2024, 3, 1)))
+        self.assertEqual(month_range(2024, 12, field='created'), {
+            'created__gte': datetime.date(2024, 12, 1), 'created__lt': datetime.date(2025, 1, 1),
+        })
+
+    def test_month_range_edges(self):
+        user = User.objects.create_user('periods')
+        category = Category.objects.create(user=user, name='Food', category_type='expense')
+        for day in (datetime.date(2024, 11, 30), datetime.date(2024, 12, 1),
+                    datetime.date(2024, 12, 31), datetime.date(2025, 1, 1)):
+            Transaction.objects.create(
+                user=user, category=category, amount=Decimal('1.00'), description=str(day), date=day
+            )
+        december = Transaction.objects.filter(**month_range(2024, 12)).order_by('date')
+        self.assertEqual([txn.description for txn in december], ['2024-12-01', '2024-12-31'])
+        january = Transaction.objects.filter(**month_range(*shift_month(2024, 12, 1)))
+        self.assertEqual([txn.description for txn in january], ['2025-01-01'])
+
+
+class DashboardTotalsTests(TestCase):
+    """The dashboard falls back to last month, then the last 30 days, in at most two queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('totals')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+
+    def add(self, category, amount, day):
+        Transaction.objects.create(
+            user=self.user, category=category, amount=Decimal(amount), description='Row', date=day
+        )
+
+    def totals(self, queries):
+        # March 2025, with the 30-day window reaching back to 30 January
+        with self.assertNumQueries(queries):
+            return dashboard_totals(self.user, 2025, 3, datetime.date(2025, 3, 1))
+
+    def test_no_history(self):
+        self.assertEqual(self.totals(1), {'income': 0, 'expenses': 0, 'transaction_count': 0})
+
+    def test_current_month(self):
+        self.add(self.salary, '100.00', datetime.date(2025, 3, 1))
+        self.add(self.food, '7.00', datetime.date(2025, 2, 10))
+        self.assertEqual(self.totals(1), {'income': Decimal('100.00'), 'expenses': 0, 'transaction_count': 2})
+
+    def test_last_month(self):
+        self.add(self.food, '7.00', datetime.date(2025, 2, 10))
+        self.add(self.food, '3.00', datetime.date(2025, 1, 31))
+        self.assertEqual(self.totals(1), {'income': 0, 'expenses': Decimal('7.00'), 'transaction_count': 2})
+
+    def test_last_30_days(self):
+        self.add(self.food, '3.00', datetime.date(2025, 1, 31))
+        self.add(self.salary, '50.00', datetime.date(2025, 1, 29))
+        self.assertEqual(self.totals(2), {'income': 0, 'expenses': Decimal('3.00'), 'transaction_count': 2})
+
+    def test_all_time_only(self):
+        # Older history keeps the count but no window has figures to show
+        self.add(self.salary, '50.00', datetime.date(2023, 6, 1))
+        self.assertEqual(self.totals(2), {'income': 0, 'expenses': 0, 'transaction_count': 1})
+
+
+class MonthlyTrendTests(TestCase):
+    """Report trends are one grouped query over a zero-filled window of months"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('trend', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+
+    def add(self, category, amount, day):
+        Transaction.objects.create(
+            user=self.user, category=category, amount=Decimal(amount), description='Row', date=day
+        )
+
+    def test_window_ending_in_january(self):
+        self.add(self.salary, '100.00', datetime.date(2024, 8, 1))
+        self.add(self.food, '10.00', datetime.date(2024, 12, 31))
+        self.add(self.salary, '5.00', datetime.date(2025, 1, 2))
+        self.add(self.food, '99.00', datetime.date(2024, 7, 31))
+        self.add(self.food, '99.00', datetime.date(2025, 2, 1))
+        with self.assertNumQueries(1):
+            trend = monthly_trend(self.user, 2025, 1, 6)
+        self.assertEqual(
+            [row['month'] for row in trend], ['8/2024', '9/2024', '10/2024', '11/2024', '12/2024', '1/2025']
+        )
+        self.assertEqual([(row['income'], row['expenses']) for row in trend], [
+            (100.0, 0.0), (0.0, 0.0), (0.0, 0.0), (0.0, 0.0), (0.0, 10.0), (5.0, 0.0),
+        ])
+        self.assertEqual(trend[4]['savings'], -10.0)
+
+    def test_empty_months_zero_filled(self):
+        with self.assertNumQueries(1):
+            trend = monthly_trend(self.user, 2025, 3, 12)
+        self.assertEqual(len(trend), 12)
+        self.assertEqual(trend[0]['month'], '4/2024')
+        self.assertEqual({(row['income'], row['expenses'], row['savings']) for row in trend}, {(0.0, 0.0, 0.0)})
+
+    def test_report_windows(self):
+        self.client.login(username='trend', password='secret')
+        today = datetime.date.today()
+        self.add(self.food, '4.00', today)
+        counts = set()
+        for months in (6, 12, 24, 60):
+            with self.subTest(months=months):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(reverse('reports_view'), {'months': months})
+                trend = response.context['monthly_trends']
+                self.assertEqual(len(trend), months)
+                self.assertEqual(trend[-1]['expenses'], 4.0)
+                self.assertEqual(trend[0]['month'], '{1}/{0}'.format(*shift_month(today.year, today.month, 1 - months)))
+                counts.add(len([query for query in context.captured_queries if 'budget_monthlycategorytotal' in query['sql']]))
+        # The category breakdown and the trend, whatever the window
+        self.assertEqual(counts, {2})
+        response = self.client.get(reverse('reports_view'), {'months': 7})
+        self.assertEqual(len(response.context['monthly_trends']), 6)
+
+
+class CategoryStatsTests(TestCase):
+    """Category listings and the delete page read their figures from with_stats()"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('stats', password='secret')
+        self.client.login(username='stats', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        today = datetime.date.today()
+        last_year, last_month = shift_month(today.year, today.month, -1)
+        for amount, day in (('10.00', today), ('5.00', today), ('7.00', datetime.date(last_year, last_month, 1))):
+            Transaction.objects.create(
+                user=self.user, category=self.food, amount=Decimal(amount), description='Row', date=day
+            )
+        Budget.objects.create(user=self.user, category=self.food, amount=Decimal('50.00'),
+                              month=today.month, year=today.year)
+        Budget.objects.create(user=self.user, category=self.food, amount=Decimal('50.00'),
+                              month=last_month, year=last_year)
+        other = User.objects.create_user('other')
+        Transaction.objects.create(
+            user=other, category=Category.objects.create(user=other, name='Food', category_type='expense'),
+            amount=Decimal('99.00'), description='Not mine', date=today
+        )
+
+    def test_with_stats(self):
+        response = self.client.get(reverse('category_list'))
+        stats = {
+            category.name: (category.month_total, category.transaction_count,
+                            category.budget_count, category.active_budget_count)
+            for category in response.context['categories']
+        }
+        self.assertEqual(stats, {
+            'Food': (Decimal('15.00'), 3, 2, 1),
+            'Salary': (Decimal('0.00'), 0, 0, 0),
+        })
+        with self.assertNumQueries(0):
+            self.assertEqual(response.context['categories'][0].current_month_total, Decimal('15.00'))
+
+    def test_delete_page_runs_no_counts(self):
+        for category, warning in ((self.food, 'This category has 3 transactions and 2 budgets.'), (self.salary, None)):
+            with self.subTest(category=category.name):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(reverse('delete_category', args=[category.pk]))
+                self.assertEqual(response.context['warning_message'], warning)
+                counting = [query['sql'] for query in context.captured_queries if 'COUNT(' in query['sql']]
+                # Only the annotated category lookup itself
+                self.assertEqual(len(counting), 1)
+                self.assertTrue(counting[0].startswith('SELECT "budget_category"."id"'))
+        response = self.client.post(reverse('delete_category', args=[self.food.pk]))
+        self.assertTrue(Category.objects.filter(pk=self.food.pk).exists())
+        self.client.post(reverse('delete_category', args=[self.salary.pk]))
+        self.assertFalse(Category.objects.filter(pk=self.salary.pk).exists())
+
+
+class KeysetPaginationTests(TestCase):
+    """Transaction pages are keyset seeks over (-date, -created_at, id)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('pages', password='secret')
+        self.client.login(username='pages', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        for index in range(7):
+            Transaction.objects.create(
+                user=self.user, category=self.salary if index % 3 == 0 else self.food,
+                amount=Decimal('1.00') + index, description=f'Row {index}',
+                date=datetime.date(2025, 1, 10 if index < 4 else 5)
+            )
+        # Same date and creation time: only the id tells the rows apart
+        Transaction.objects.update(created_at=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc))
+        self.paginator = KeysetPaginator(
+            Transaction.objects.filter(user=self.user), TRANSACTION_PAGE_ORDERING, 3
+        )
+
+    def test_cursor_round_trip(self):
+        first = self.paginator.page()
+        second = self.paginator.page(first.next_cursor)
+        third = self.paginator.page(second.next_cursor)
+        self.assertIsNone(third.next_cursor)
+        pages = [list(first), list(second), list(third)]
+        self.assertEqual(sum(len(page) for page in pages), 7)
+        self.assertEqual(list(self.paginator.page(third.previous_cursor)), pages[1])
+        self.assertEqual(list(self.paginator.page(second.previous_cursor)), pages[0])
+
+    def test_ties_ordered_by_id(self):
+        first = self.paginator.page()
+        rows = list(first) + list(self.paginator.page(first.next_cursor))
+        same_day = [row.pk for row in rows if row.date == datetime.date(2025, 1, 10)]
+        self.assertEqual(same_day, sorted(same_day))
+        self.assertEqual(len(same_day), 4)
+
+    def test_filters_preserved(self):
+        response = self.client.get(reverse('transaction_list'), {
+            'transaction_type': 'expense', 'category': self.food.pk, 'cursor': 'stale',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('cursor', response.context['filter_query'])
+        self.assertIn('transaction_type=expense', response.context['filter_query'])
+        self.assertEqual({row.category_id for row in response.context['page_obj']}, {self.food.pk})
+
+        data = self.client.get(reverse('transactions_api'), {'transaction_type': 'expense', 'limit': 2}).json()
+        following = self.client.get(reverse('transactions_api'), {
+            'transaction_type': 'expense', 'limit': 2, 'cursor': data['next'],
+        }).json()
+        seen = [row['id'] for row in data['results'] + following['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual({row['transaction_type'] for row in data['results'] + following['results']}, {'expense'})
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('transactions_api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AdminChangelistTests(TestCase):
+    """Admin changelists stay bounded however large the tables grow"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', password='secret')
+        self.client.login(username='admin', password='secret')
+        self.other = User.objects.create_user('other')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.rent = Category.objects.create(user=self.other, name='Rent', category_type='expense')
+        for month in (11, 12):
+            Transaction.objects.create(
+                user=self.user, category=self.food, amount=Decimal('5.00'),
+                description='Lunch', date=datetime.date(2024, month, 3)
+            )
+        for month in (1, 2):
+            Transaction.objects.create(
+                user=self.other, category=self.rent, amount=Decimal('50.00'),
+                description='Rent', date=datetime.date(2025, month, 1)
+            )
+
+    def test_filtered_count_is_capped(self):
+        paginator = EstimatedCountPaginator(Transaction.objects.filter(amount__gt=0).order_by('pk'), 1)
+        paginator.count_limit = 3
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 3)
+
+        paginator = EstimatedCountPaginator(Transaction.objects.filter(user=self.user).order_by('pk'), 1)
+        paginator.count_limit = 3
+        self.assertEqual(paginator.count, 2)
+
+    def test_unfiltered_count_is_estimated(self):
+        highest = Transaction.objects.aggregate(max_pk=Max('pk'))['max_pk']
+        paginator = EstimatedCountPaginator(Transaction.objects.order_by('pk'), 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, highest)
+
+    def month_choices(self, params):
+        response = self.client.get(reverse('admin:budget_transaction_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        spec = next(spec for spec in response.context['cl'].filter_specs if isinstance(spec, RollupMonthFilter))
+        return response, [value for value, _ in spec.lookup_choices]
+
+    def test_month_filter_lists_rollup_months(self):
+        _, months = self.month_choices({})
+        self.assertEqual(months, ['2025-02', '2025-01', '2024-12', '2024-11'])
+        _, months = self.month_choices({'user__id__exact': self.user.pk})
+        self.assertEqual(months, ['2024-12', '2024-11'])
+
+    def test_month_filter_selects_half_open_month(self):
+        Transaction.objects.create(
+            user=self.user, category=self.food, amount=Decimal('5.00'),
+            description='Late', date=datetime.date(2024, 12, 31)
+        )
+        response, _ = self.month_choices({'month': '2024-12'})
+        self.assertEqual(
+            sorted(row.date for row in response.context['cl'].result_list),
+            [datetime.date(2024, 12, 3), datetime.date(2024, 12, 31)]
+        )
+        response, _ = self.month_choices({'month': 'not-a-month'})
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+
+    def test_change_view_saves_every_field(self):
+        transaction = Transaction.objects.filter(user=self.user).first()
+        stale = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        Transaction.objects.filter(pk=transaction.pk).update(updated_at=stale)
+        response = self.client.post(reverse('admin:budget_transaction_change', args=[transaction.pk]), {
+            'user': self.user.pk, 'category': self.food.pk, 'amount': '2.00', 'description': 'Lunch',
+            'transaction_type': 'expense', 'date': transaction.date.isoformat(),
+        })
+        self.assertEqual(response.status_code, 302)
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.amount, Decimal('2.00'))
+        self.assertGreater(transaction.updated_at, stale)
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(ledger.verify(), [])
+
+    def add_budgets(self, count):
+        year, month = current_period()
+        for index in range(count):
+            category = Category.objects.create(
+                user=self.user, name=f'Budget {Category.objects.count()}', category_type='expense'
+            )
+            Transaction.objects.create(
+                user=self.user, category=category, amount=Decimal('25.00'),
+                description=f'Spend {index}', date=datetime.date.today()
+            )
+            Budget.objects.create(
+                user=self.user, category=category, amount=Decimal('100.00'), month=month, year=year
+            )
+
+    def budget_changelist(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:budget_budget_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(context)
+
+    def test_budget_changelist_reads_spend_with_the_page(self):
+        self.add_budgets(2)
+        _, few = self.budget_changelist()
+        self.add_budgets(8)
+        response, many = self.budget_changelist()
+        self.assertEqual(many, few)
+        self.assertContains(response, 'Used %')
+        self.assertContains(response, '25.0%', count=10)
+
+
+@override_settings(BUDGET_QUERY_INSPECTOR_MODE='raise')
+class QueryBudgetTests(TestCase):
+    """Every read view stays within its budget in budget/query_budgets.py"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('budgets', password='secret')
+        self.client.login(username='budgets', password='secret')
+        today = datetime.date.today()
+        for index in range(8):
+            category = Category.objects.create(
+                user=self.user,
+                name=f'Category {index}',
+                category_type='expense' if index % 2 else 'income'
+            )
+            Budget.objects.create(
+                user=self.user, category=category, amount=Decimal('100.00'),
+                month=today.month, year=today.year
+            )
+            for day in range(3):
+                Transaction.objects.create(
+                    user=self.user, category=category, amount=Decimal('5.00'),
+                    description=f'Transaction {day}', date=today
+                )
+        SavingsGoal.objects.create(
+            user=self.user, title='Holiday', target_amount=Decimal('500.00'),
+            target_date=today + datetime.timedelta(days=90)
+        )
+
+    def test_read_views_within_budget(self):
+        for name in [
+            'dashboard', 'transaction_list', 'transactions_api', 'budget_overview',
+            'category_list', 'profile', 'reports_view', 'savings_goals',
+            'expense_data_api', 'budget_progress_api', 'forecast_api',
+        ]:
+            with self.subTest(view=name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_write_views_within_budget(self):
+        category = Category.objects.filter(user=self.user, category_type='expense').first()
+        self.assertEqual(self.client.get(reverse('add_transaction')).status_code, 200)
+        response = self.client.post(reverse('add_transaction'), {
+            'category': category.pk, 'amount': '12.50', 'description': 'Backdated', 'date': '2024-02-10',
+        })
+        self.assertEqual(response.status_code, 302)
+        transaction = Transaction.objects.get(description='Backdated')
+        response = self.client.post(reverse('edit_transaction', args=[transaction.pk]), {
+            'category': category.pk, 'amount': '15.00', 'description': 'Backdated', 'date': '2023-06-01',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.post(reverse('delete_transaction', args=[transaction.pk])).status_code, 302)
+
+    def test_admin_transaction_writes_within_budget(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        category = Category.objects.filter(user=self.user, category_type='expense').first()
+        data = {
+            'user': self.user.pk, 'category': category.pk, 'amount': '12.50',
+            'description': 'Backdated', 'transaction_type': 'expense', 'date': '2024-02-10',
+        }
+        self.assertEqual(self.client.post(reverse('admin:budget_transaction_add'), data).status_code, 302)
+        transaction = Transaction.objects.get(description='Backdated')
+        response = self.client.post(
+            reverse('admin:budget_transaction_change', args=[transaction.pk]),
+            dict(data, amount='15.00', date='2023-06-01')
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_bulk_import_not_budgeted(self):
+        rows = ''.join(
+            f'2024-{month:02d}-{day:02d},Row {month}-{day},-{day}.00,Category {index}\n'
+            for month in range(1, 13) for day, index in ((3, 1), (9, 3), (20, 5))
+        )
+        upload = SimpleUploadedFile('bank.csv', ('date,description,amount,category\n' + rows).encode())
+        response = self.client.post(reverse('import_transactions'), {'file': upload, 'file_format': 'csv'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.filter(date__year=2024).count(), 36)
+
+    def test_streaming_export_checked_when_exhausted(self):
+        response = self.client.get(reverse('export_transactions'))
+        self.assertTrue(b''.join(response.streaming_content))
+        # The queries run before the body fit; the rows are only read while streaming
+        with mock.patch.dict('budget.middleware.QUERY_BUDGETS', {'export_transactions': 3}):
+            response = self.client.get(reverse('export_transactions'))
+            with self.assertRaises(QueryBudgetExceeded):
+                b''.join(response.streaming_content)
+
+    def test_overrun_raises(self):
+        with mock.patch.dict('budget.middleware.QUERY_BUDGETS', {'category_list': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('category_list'))
+
+
+@override_settings(BUDGET_CATEGORY_REGISTRY=True)
+class CategoryRegistryTests(TestCase):
+    """Category lookups on the write path come from the registry"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('registry', password='secret')
+        self.client.login(username='registry', password='secret')
+        self.category = Category.objects.create(user=self.user, name='Food', category_type='expense')
+
+    def test_adding_transaction_skips_category_rows(self):
+        self.client.get(reverse('add_transaction'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('add_transaction'), {
+                'category': self.category.pk, 'amount': '12.50',
+                'description': 'Lunch', 'date': datetime.date.today().isoformat(),
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse([query for query in context if 'budget_category' in query['sql']])
+        self.assertEqual(Transaction.objects.get().transaction_type, 'expense')
+
+    def test_other_users_categories_rejected(self):
+        other = User.objects.create_user('other')
+        category = Category.objects.create(user=other, name='Theirs', category_type='expense')
+        response = self.client.post(reverse('add_transaction'), {
+            'category': category.pk, 'amount': '1.00',
+            'description': 'Nope', 'date': datetime.date.today().isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_category_writes_refresh_registry(self):
+        self.assertEqual(len(user_categories(self.user.pk)), 1)
+        self.category.category_type = 'income'
+        self.category.save()
+        Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        categories = user_categories(self.user.pk)
+        self.assertEqual(categories.get(self.category.pk).category_type, 'income')
+        self.assertEqual([name for _, name in categories.choices('expense')], ['Rent (expense)'])
+
+    def test_category_created_by_another_worker_accepted(self):
+        user_categories(self.user.pk)
+        # bulk_create skips the signals, so this process keeps its cached list
+        rent, = Category.objects.bulk_create([Category(user=self.user, name='Rent', category_type='expense')])
+        self.assertIsNone(user_categories(self.user.pk).get(rent.pk))
+        response = self.client.post(reverse('add_transaction'), {
+            'category': rent.pk, 'amount': '1.00',
+            'description': 'Rent', 'date': datetime.date.today().isoformat(),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.get().category, rent)
+        self.assertIsNotNone(user_categories(self.user.pk).get(rent.pk))
+
+    @override_settings(BUDGET_CATEGORY_REGISTRY=None)
+    def test_local_cache_reads_categories_from_database(self):
+        user_categories(self.user.pk)
+        Category.objects.filter(pk=self.category.pk).update(category_type='income')
+        with self.assertNumQueries(1):
+            self.assertEqual(user_categories(self.user.pk).get(self.category.pk).category_type, 'income')
+
+        Transaction.objects.create(
+            user=self.user, category_id=self.category.pk, amount=Decimal('3.00'),
+            description='Refund', date=datetime.date.today()
+        )
+        self.assertEqual(Transaction.objects.get().transaction_type, 'income')
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(ledger.verify(), [])
+
+
+class UserProfileTests(TestCase):
+    """Profiles are provisioned with the user and summarised in one query"""
+
+    def test_profile_created_with_user(self):
+        user = User.objects.create_user('provisioned')
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+    def test_summary_is_one_query(self):
+        user = User.objects.create_user('summary')
+        today = datetime.date.today()
+        for name, kind, amount in [('Food', 'expense', '40.00'), ('Salary', 'income', '100.00')]:
+            category = Category.objects.create(user=user, name=name, category_type=kind)
+            Transaction.objects.create(
+                user=user, category=category, amount=Decimal(amount), description=name, date=today
+            )
+        profile = UserProfile.objects.get(user=user)
+        with self.assertNumQueries(1):
+            self.assertEqual(profile.current_savings, Decimal('60.00'))
+            self.assertEqual(profile.summary()['transaction_count'], 2)
+            self.assertEqual(profile.summary()['category_count'], 2)
+
+
+class OnboardingTests(TestCase):
+    """New accounts get a profile and the default category template"""
+
+    def test_signup_provisions_account(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'first_name': 'New', 'last_name': 'Comer',
+            'password1': 'Budget-planner-42', 'password2': 'Budget-planner-42',
+        })
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        user = User.objects.get(username='newcomer')
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+        self.assertEqual(Category.objects.filter(user=user).count(), 10)
+
+    def test_onboard_users_in_batches(self):
+        User.objects.create_user('taken')
+        rows = [{'username': f'cohort{index}', 'monthly_income': '3000'} for index in range(5)]
+        rows += [{'username': 'taken'}, {'username': ''}]
+        result = onboard_users(rows, batch_size=2)
+        self.assertEqual((result.created, result.skipped), (5, 2))
+        cohort = User.objects.filter(username__startswith='cohort')
+        self.assertEqual(UserProfile.objects.filter(user__in=cohort, monthly_income=3000).count(), 5)
+        self.assertEqual(Category.objects.filter(user__in=cohort).count(), 50)
+        self.assertFalse(cohort[0].has_usable_password())
+
+
+class PayloadCacheTests(TestCase):
+    """Cached payloads are reused until the user's data changes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cached', password='secret')
+        self.client.login(username='cached', password='secret')
+        self.category = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        Transaction.objects.create(
+            user=self.user, category=self.category, amount=Decimal('9.00'),
+            description='Lunch', date=datetime.date.today()
+        )
+
+    def test_repeat_dashboard_skips_aggregates(self):
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([sql for sql in statements if 'SUM(' in sql or 'budget_monthlycategorytotal' in sql])
+
+    def test_writes_bump_version(self):
+        version = get_data_version(self.user.pk)
+        Transaction.objects.create(
+            user=self.user, category=self.category, amount=Decimal('2.00'),
+            description='Tea', date=datetime.date.today()
+        )
+        bumped = get_data_version(self.user.pk)
+        self.assertGreater(bumped, version)
+        SavingsGoal.objects.create(
+            user=self.user, title='Bike', target_amount=Decimal('300.00'),
+            target_date=datetime.date.today() + datetime.timedelta(days=60)
+        )
+        self.assertGreater(get_data_version(self.user.pk), bumped)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['monthly_expenses'], 11.0)
+
+    def test_dashboard_payload_holds_plain_values(self):
+        today = datetime.date.today()
+        Budget.objects.create(
+            user=self.user, category=self.category, amount=Decimal('20.00'), month=today.month, year=today.year
+        )
+        SavingsGoal.objects.create(
+            user=self.user, title='Bike', target_amount=Decimal('300.00'),
+            target_date=today + datetime.timedelta(days=60)
+        )
+        FinancialTip.objects.create(title='Save', content='Pay yourself first', priority='high')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Lunch')
+        self.assertContains(response, 'text-danger">Save')
+        key = payload_key(self.user.pk, f'dashboard:{today.isoformat()}', get_data_version(self.user.pk))
+        payload = get_cache().get(key)
+        self.assertEqual(payload['budgets'][0]['spent_amount'], Decimal('9.00'))
+
+        def walk(value):
+            self.assertNotIsInstance(value, models.Model)
+            children = value.values() if isinstance(value, dict) else value if isinstance(value, list) else ()
+            for child in children:
+                walk(child)
+        walk(payload)
+
+
+class ConditionalResponseTests(TestCase):
+    """Chart APIs answer revalidation with 304 only while the payload is unchanged"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('etag', password='secret')
+        self.client.login(username='etag', password='secret')
+        self.url = reverse('expense_data_api')
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_after_day_rollover(self):
+        # Data last changed yesterday and the client revalidates with that time
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+        get_cache().set(_version_key(self.user.pk), int(yesterday.timestamp() * 1e9), timeout=None)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(yesterday.timestamp()))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+
+class ExportTests(TestCase):
+    """Exports stream the filtered transactions"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('export', password='secret')
+        self.client.login(username='export', password='secret')
+        food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        for category, amount, day in [(food, '4.50', 3), (salary, '2000.00', 5), (food, '7.25', 20)]:
+            Transaction.objects.create(
+                user=self.user, category=category, amount=Decimal(amount),
+                description=f'{category.name} {day}', date=datetime.date(2025, 1, day)
+            )
+        other = User.objects.create_user('other')
+        Transaction.objects.create(
+            user=other, category=Category.objects.create(user=other, name='Theirs', category_type='expense'),
+            amount=Decimal('1.00'), description='Not mine', date=datetime.date(2025, 1, 4)
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_transactions'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, body = self.export(end_date='2025-01-10')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ['date', 'description', 'category', 'type', 'amount'])
+        self.assertEqual(sorted(rows[1:]), [
+            ['2025-01-03', 'Food 3', 'Food', 'expense', '4.50'],
+            ['2025-01-05', 'Salary 5', 'Salary', 'income', '2000.00'],
+        ])
+
+    def test_ndjson(self):
+        response, body = self.export(format='ndjson', transaction_type='expense')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(sorted(row['description'] for row in rows), ['Food 20', 'Food 3'])
+        self.assertEqual({row['type'] for row in rows}, {'expense'})
+
+
+class RollupTests(TestCase):
+    """The Transaction signals keep MonthlyCategoryTotal in step with the raw rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('rollups')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+        self.rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        self.salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        Transaction.objects.create(
+            user=self.user, category=self.food, amount=Decimal('4.00'),
+            description='Other', date=datetime.date(2025, 3, 2)
+        )
+
+    def test_transaction_changes(self):
+        transaction = Transaction.objects.create(
+            user=self.user, category=self.food, amount=Decimal('10.00'),
+            description='Moving', date=datetime.date(2025, 3, 1)
+        )
+        self.assertEqual(rollups.verify(), [])
+        changes = [
+            ('category', self.rent), ('amount', Decimal('12.50')),
+            ('date', datetime.date(2024, 12, 31)), ('category', self.salary),
+        ]
+        for field, value in changes:
+            with self.subTest(field=field):
+                setattr(transaction, field, value)
+                transaction.save()
+                self.assertEqual(rollups.verify(), [])
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).transaction_type, 'income')
+        transaction.delete()
+        self.assertEqual(rollups.verify(), [])
+        self.food.delete()
+        self.assertEqual(rollups.verify(), [])
+        self.assertFalse(MonthlyCategoryTotal.objects.exists())
+
+    def test_rebuild_command(self):
+        call_command('rebuild_monthly_totals', '--check-only', stdout=io.StringIO())
+        MonthlyCategoryTotal.objects.update(total=Decimal('99.00'))
+        with self.assertRaises(CommandError):
+            call_command('rebuild_monthly_totals', '--check-only', stdout=io.StringIO())
+        self.assertEqual(len(rollups.verify()), 1)
+        call_command('rebuild_monthly_totals', '--user', 'rollups', stdout=io.StringIO())
+        self.assertEqual(rollups.verify(), [])
+
+
+class ImporterTests(TestCase):
+    """Bank exports are imported in bulk with their rollups and ledger in step"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('importer', password='secret')
+        self.food = Category.objects.create(user=self.user, name='Food', category_type='expense')
+
+    def import_csv(self, text):
+        return import_transactions(self.user, io.StringIO(text), 'csv')
+
+    def assertInStep(self):
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(ledger.verify(), [])
+
+    def test_parse_csv(self):
+        rows = list(parse_csv(io.StringIO(
+            ' Date ,Memo,Amount,Category,Type\n2025-01-02,Coffee,($3.50),food,Expense\n'
+        )))
+        self.assertEqual(rows, [{
+            'date': '2025-01-02', 'description': 'Coffee', 'amount': '($3.50)',
+            'category': 'food', 'type': 'expense',
+        }])
+
+    def test_parse_ofx(self):
+        ofx = (
+            'OFXHEADER:100\n<OFX><BANKTRANLIST>\n'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250103120000<TRNAMT>-12.40<NAME>Grocer</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20250105\n<TRNAMT>2000.00\n<MEMO>Salary\n</STMTTRN>\n'
+            '</BANKTRANLIST></OFX>\n'
+        )
+        rows = list(parse_ofx(io.StringIO(ofx)))
+        self.assertEqual([(row['date'], row['description'], row['amount']) for row in rows], [
+            ('20250103', 'Grocer', '-12.40'), ('20250105', 'Salary', '2000.00'),
+        ])
+        result = import_transactions(self.user, io.StringIO(ofx), 'ofx')
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            Transaction.objects.get(description='Salary').date, datetime.date(2025, 1, 5)
+        )
+        self.assertInStep()
+
+    def test_categories_and_fallback(self):
+        result = self.import_csv(
+            'date,description,amount,category\n'
+            '2025-01-02,Lunch,-8.00,FOOD\n'
+            '2025-01-03,Mystery,-4.00,Gadgets\n'
+            '2025-01-04,Refund,6.00,\n'
+        )
+        self.assertEqual(result.created, 3)
+        self.assertEqual(Transaction.objects.get(description='Lunch').category, self.food)
+        mystery = Transaction.objects.get(description='Mystery')
+        refund = Transaction.objects.get(description='Refund')
+        self.assertEqual((mystery.category.name, mystery.transaction_type), (UNCATEGORIZED, 'expense'))
+        self.assertEqual((refund.category.name, refund.transaction_type), (UNCATEGORIZED, 'income'))
+        self.assertEqual(Category.objects.filter(user=self.user, name=UNCATEGORIZED).count(), 2)
+        self.assertInStep()
+
+    def test_duplicates(self):
+        Transaction.objects.create(
+            user=self.user, category=self.food, amount=Decimal('3.50'),
+            description='Coffee', date=datetime.date(2025, 1, 2)
+        )
+        text = 'date,description,amount\n' + '2025-01-02,Coffee,-3.50\n' * 3 + '2025-02-02,Tea,-2.00\n' * 2
+        result = import_transactions(self.user, io.StringIO(text), 'csv', batch_size=2)
+        # One Coffee was already stored; repeats inside the file are kept
+        self.assertEqual((result.created, result.duplicates), (4, 1))
+        self.assertEqual(Transaction.objects.filter(description='Coffee').count(), 3)
+        self.assertEqual(self.import_csv(text).duplicates, 5)
+        self.assertInStep()
+
+    def test_duplicate_lookup_reads_only_batch_keys(self):
+        # Years of history between the batch's dates must not be loaded
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, category=self.food, amount=Decimal('3.50'), transaction_type='expense',
+                description=f'History {index}', date=datetime.date(2020, 1, 1) + datetime.timedelta(days=index)
+            )
+            for index in range(300)
+        ] + [Transaction(
+            user=self.user, category=self.food, amount=Decimal('3.50'), transaction_type='expense',
+            description='Coffee', date=datetime.date(2020, 1, 2)
+        )])
+        importer = TransactionImporter(self.user)
+        importer._existing_max_pk = Transaction.objects.aggregate(max_pk=Max('pk'))['max_pk']
+        keys = {(datetime.date(2020, 1, 2), Decimal('3.50'), 'Coffee')} | {
+            (datetime.date(2025, 1, 1) + datetime.timedelta(days=index), Decimal('1.00'), 'New')
+            for index in range(DUPLICATE_LOOKUP_KEYS)
+        }
+        with CaptureQueriesContext(connection) as context:
+            stored = importer._stored_counts(keys)
+        self.assertEqual(len(context), 2)
+        self.assertEqual(stored, {(datetime.date(2020, 1, 2), Decimal('3.50'), 'Coffee'): 1})
+
+    def test_bad_rows_skipped(self):
+        result = self.import_csv(
+            'Date,Description,Amount\n'
+            '2025-01-02,Coffee,-3.50,\n'
+            '2025-01-03,Broken,NaN\n'
+            '2025-01-04,Huge,Infinity\n'
+            f'2025-01-05,"{"x" * 200000}",-1.00\n'
+            'soon,Late,-2.00\n'
+            '2025-01-06,Free,0\n'
+        )
+        self.assertEqual((result.rows, result.created, result.skipped), (6, 1, 5))
+        self.assertIn('Unrecognised amount "NaN"', result.errors[0])
+        self.assertIn('Unreadable CSV line', result.errors[2])
+        self.assertEqual(Transaction.objects.get().amount, Decimal('3.50'))
+
+    def test_upload_with_trailing_commas(self):
+        self.client.login(username='importer', password='secret')
+        upload = SimpleUploadedFile('bank.csv', b'date,description,amount\n2025-01-02,Coffee,-3.50,\n')
+        response = self.client.post(reverse('import_transactions'), {'file': upload, 'file_format': 'auto'})
+        self.assertRedirects(response, reverse('transaction_list'), fetch_redirect_response=False)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+        message = str(list(response.wsgi_request._messages)[0])
+        self.assertRegex(message, r'^Imported 1 transactions .* in [\d.]+s, \d+ rows/sec\.$')
+
+
+class BalanceLedgerTests(TestCase):
+    """Backdated writes keep the daily balance ledger in step with the raw rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('ledger', password='secret')
+        self.income = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        self.expense = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+
+    def add(self, category, amount, date):
+        return Transaction.objects.create(
+            user=self.user, category=category, amount=Decimal(amount),
+            description='Entry', date=date
+        )
+
+    def test_backdated_writes(self):
+        self.add(self.income, '1000.00', datetime.date(2025, 3, 1))
+        rent = self.add(self.expense, '400.00', datetime.date(2025, 3, 5))
+        self.add(self.expense, '50.00', datetime.date(2025, 1, 20))
+        rent.date = datetime.date(2025, 2, 10)
+        rent.amount = Decimal('450.00')
+        rent.save()
+        self.add(self.expense, '25.00', datetime.date(2025, 3, 1)).delete()
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(ledger.rebuild_user(self.user.pk, since=datetime.date(2025, 2, 1)), 2)
+        self.assertEqual(ledger.verify(), [])
+
+    def add_spread(self, category, count):
+        for index in range(count):
+            self.add(category, '10.00', datetime.date(2024, 1, 1) + datetime.timedelta(days=17 * index))
+
+    def delete_queries(self, instance):
+        with CaptureQueriesContext(connection) as context:
+            instance.delete()
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(ledger.verify(), [])
+        return context
+
+    def test_category_delete_corrects_ledger_in_bulk(self):
+        self.add_spread(self.income, 5)
+        few = Category.objects.create(user=self.user, name='Few', category_type='expense')
+        self.add_spread(few, 3)
+        self.add_spread(self.expense, 20)
+        self.assertEqual(len(self.delete_queries(few)), len(self.delete_queries(self.expense)))
+        self.assertEqual(ledger.verify(), [])
+
+    def test_user_delete_skips_summary_upkeep(self):
+        self.add_spread(self.expense, 3)
+        other = User.objects.create_user('other')
+        other_category = Category.objects.create(user=other, name='Rent', category_type='expense')
+        for index in range(20):
+            Transaction.objects.create(
+                user=other, category=other_category, amount=Decimal('1.00'),
+                description='Entry', date=datetime.date(2024, 1, 1) + datetime.timedelta(days=index)
+            )
+        few = self.delete_queries(self.user)
+        many = self.delete_queries(other)
+        self.assertEqual(len(few), len(many))
+        # Transactions go with one DELETE, without being loaded first
+        self.assertFalse([
+            query for query in many if query['sql'].startswith('SELECT') and 'budget_transaction' in query['sql']
+        ])
+
+    def test_queryset_delete(self):
+        self.add_spread(self.income, 3)
+        self.add_spread(self.expense, ledger.SHIFT_DAYS_LIMIT + 5)
+        Transaction.objects.filter(category=self.income).delete()
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(rollups.verify(), [])
+        # More changed days than SHIFT_DAYS_LIMIT rebuild the ledger instead
+        Transaction.objects.filter(date__gte=datetime.date(2024, 3, 1)).delete()
+        self.assertEqual(ledger.verify(), [])
+        self.assertEqual(rollups.verify(), [])
+
+    def test_balance_series_api(self):
+        self.add(self.income, '1000.00', datetime.date(2025, 3, 1))
+        self.add(self.expense, '400.00', datetime.date(2025, 3, 3))
+        self.client.login(username='ledger', password='secret')
+        response = self.client.get(reverse('balance_series_api'), {'start': '2025-02-28', 'end': '2025-03-04'})
+        data = response.json()
+        self.assertEqual(data['opening_balance'], 0.0)
+        self.assertEqual(data['balance'], [0.0, 1000.0, 1000.0, 600.0, 600.0])
+        self.assertEqual(self.client.get(reverse('balance_series_api'), {'start': 'soon'}).status_code, 400)
+
+
+class ForecastTests(TestCase):
+    """Projections follow each category's level, trend and seasonality"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('forecast', password='secret')
+        salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        gifts = Category.objects.create(user=self.user, name='Gifts', category_type='expense')
+        self.today = datetime.date(2026, 10, 16)
+        for offset in range(1, 31):
+            year, month = divmod(2026 * 12 + 9 - offset, 12)
+            day = datetime.date(year, month + 1, 5)
+            for category, amount in [
+                (salary, 3000), (rent, 1000 + 10 * (30 - offset)), (gifts, 500 if day.month == 12 else 0),
+            ]:
+                if amount:
+                    Transaction.objects.create(
+                        user=self.user, category=category, amount=Decimal(amount),
+                        description='Monthly', date=day
+                    )
+
+    def test_projection(self):
+        forecast = forecasting.forecast_user(self.user.pk, horizon=3, today=self.today)
+        self.assertEqual(forecast['months'], ['2026-10', '2026-11', '2026-12'])
+        self.assertEqual(forecast['history_months'], 30)
+        self.assertEqual(forecast['income'], [3000.0] * 3)
+        by_name = {category['name']: category['amounts'] for category in forecast['categories']}
+        self.assertEqual(by_name['Rent'], [1300.0, 1310.0, 1320.0])
+        self.assertGreater(by_name['Gifts'][2], 400)
+        self.assertLess(by_name['Gifts'][0], 50)
+        self.assertEqual(forecast['cumulative_savings'][1], sum(forecast['savings'][:2]))
+
+    def test_api_and_batch(self):
+        self.client.login(username='forecast', password='secret')
+        self.assertEqual(self.client.get(reverse('forecast_api'), {'months': 24}).status_code, 400)
+        self.assertEqual(forecasting.forecast_all(batch_size=1), 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('forecast_api'), {'months': 12})
+        self.assertEqual(len(response.json()['months']), 12)
+        self.assertFalse(any('monthlycategorytotal' in query['sql'] for query in queries.captured_queries))
+
+
+class GoalSimulationTests(TestCase):
+    """Savings goals get a bootstrapped probability of success"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('goals', password='secret')
+        salary = Category.objects.create(user=self.user, name='Salary', category_type='income')
+        rent = Category.objects.create(user=self.user, name='Rent', category_type='expense')
+        today = datetime.date.today()
+        for offset in range(1, 13):
+            year, month = divmod(today.year * 12 + today.month - 1 - offset, 12)
+            day = datetime.date(year, month + 1, 1)
+            Transaction.objects.create(
+                user=self.user, category=salary, amount=Decimal('3000.00'), description='Pay', date=day
+            )
+            Transaction.objects.create(
+                user=self.user, category=rent, amount=Decimal('2000.00'), description='Rent', date=day
+            )
+
+    def goal(self, target, months):
+        today = datetime.date.today()
+        year, month = shift_month(today.year, today.month, months)
+        return SavingsGoal.objects.create(
+            user=self.user, title='Goal', target_amount=Decimal(target),
+            target_date=datetime.date(year, month, 28)
+        )
+
+    def test_probabilities(self):
+        easy, hard = self.goal('5000.00', 12), self.goal('50000.00', 12)
+        self.assertEqual(SavingsGoal.objects.get(pk=easy.pk).success_probability, 1.0)
+        self.assertEqual(SavingsGoal.objects.get(pk=hard.pk).success_probability, 0.0)
+        history = simulation.monthly_net_history([self.user.pk], datetime.date.today())[self.user.pk]
+        self.assertEqual(history.tolist(), [1000.0] * 12)
+
+    def test_cache_follows_writes(self):
+        goal = self.goal('11500.00', 11)
+        self.client.login(username='goals', password='secret')
+        response = self.client.get(reverse('savings_goals'))
+        self.assertEqual(response.context['savings_goals'][0].success_probability, 0.0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SavingsGoal.objects.get(pk=goal.pk).success_probability, 0.0)
+        self.assertEqual(len(queries), 1)
+        goal.current_amount = Decimal('2000.00')
+        goal.save()
+        self.assertEqual(simulation.recompute_users([self.user.pk]), 1)
+        self.assertEqual(SavingsGoal.objects.get(pk=goal.pk).success_probability, 1.0)
+
+
+class DatasetTests(TestCase):
+    """Generated datasets are deterministic and consistent with the rollups and ledger"""
+
+    def snapshot(self, prefix):
+        return sorted(
+            Transaction.objects.filter(user__username__startswith=prefix).values_list(
+                'category__name', 'date', 'amount', 'description'
+            )
+        )
+
+    def test_seeded_dataset(self):
+        for prefix in ('first', 'second'):
+            call_command(
+                'generate_dataset', '--users', 2, '--transactions', 60, '--years', 1, '--seed', 7,
+                '--end-date', '2025-06-30', '--prefix', prefix, stdout=io.StringIO()
+            )
+        first = self.snapshot('first')
+        self.assertEqual(len(first), 120)
+        self.assertEqual(first, self.snapshot('second'))
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(ledger.verify(), [])
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', '--users', 1, '--prefix', 'first', stdout=io.StringIO())
+
+        call_command(
+            'generate_dataset', '--users', 1, '--transactions', 60, '--years', 1, '--seed', 7,
+            '--prefix', 'first', '--flush', stdout=io.StringIO()
+        )
+        self.assertEqual(len(self.snapshot('first')), 60)
+        self.assertEqual(User.objects.filter(username__startswith='first').count(), 1)
+        self.assertEqual(rollups.verify(), [])
+        self.assertEqual(ledger.verify(), [])
+
+
+@override_settings(BUDGET_QUERY_INSPECTOR_MODE='', BUDGET_PROFILE_SAMPLE_RATE=0)
+class LoadTestTests(TransactionTestCase):
+    """The load test drives the real routes from worker threads"""
+
+    # Worker threads use their own connections, so the data must be committed
+    serialized_rollback = True
+
+    def test_report(self):
+        user_ids = create_users('smoke', 2, 'smoke-password')
+        for index, user_id in enumerate(user_ids):
+            generate_user(user_id, index, DatasetSpec(transactions=40, years=1, seed=3))
+        summary, elapsed = run_load_test(
+            list(User.objects.filter(pk__in=user_ids)), 'smoke-password',
+            # One worker: SQLite's shared in-memory test database locks on concurrent writes
+            concurrency=1, duration=1, session_length=5
+        )
+        self.assertGreater(elapsed, 0)
+        self.assertGreater(summary['total']['requests'], 2)
+        self.assertEqual(summary['total']['errors'], 0)
+        self.assertIn('login', summary)
+        self.assertLessEqual(summary['total']['p50_ms'], summary['total']['p99_ms'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('metrics', password='secret')
+
+    def test_server_timing_header(self):
+        self.client.login(username='metrics', password='secret')
+        response = self.client.get(reverse('dashboard'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.login(username='metrics', password='secret')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.logout()
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertContains(response, 'budget_request_duration_seconds_bucket')
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(BUDGET_PROFILE_DIR=self.directory.name, BUDGET_PROFILE_KEEP=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.login(username='staff', password='secret')
+
+    def test_signed_token_profiles_request(self):
+        self.client.get(reverse('dashboard'), {'_profile': 'forged'})
+        self.assertContains(self.client.get(reverse('profiles')), 'No Profiles Yet')
+        for _ in range(3):
+            self.client.get(reverse('dashboard'), HTTP_X_BUDGET_PROFILE=make_token(self.staff))
+        response = self.client.get(reverse('profiles'))
+        self.assertEqual(len(response.context['profiles']), 2)
+        profile_id = response.context['profiles'][0]['id']
+        download = self.client.get(reverse('download_profile', args=[profile_id]))
+        self.assertEqual(download.status_code, 200)
+
+    def test_profiles_are_staff_only(self):
+        User.objects.create_user('member', password='secret')
+        self.client.login(username='member', password='secret')
+        self.assertEqual(self.client.get(reverse('profiles')).status_code, 302)
+
+
+class BenchmarkTests(TestCase):
+    def test_small_dataset_and_baseline_comparison(self):
+        results = run_benchmarks(['small'], repeat=1)
+        cases = results['results']['small']
+        self.assertIn('transaction_list_deep', cases)
+        self.assertIn('Budget.spent_amount', cases)
+        self.assertTrue(all(figures['queries'] > 0 for figures in cases.values()))
+        self.assertEqual(compare(results, results), [])
+
+        slower = {'results': {'small': {
+            case: dict(figures, median_ms=figures['median_ms'] * 2, queries=figures['queries'] + 1)
+            for case, figures in cases.items()
+        }}}
+        regressions = compare(slower, results, threshold=0.5)
+        self.assertEqual(len(regressions), 2 * len(cases))
+        # Without a threshold only the machine-independent query counts are compared
+        self.assertEqual({metric for _, _, metric, _, _ in compare(slower, results)}, {'queries'})
+
+    def test_committed_baseline_covers_every_case(self):
+        baseline = json.loads(BASELINE_PATH.read_text())
+        self.assertEqual(set(baseline['results']), set(DATASETS))
+        user = User.objects.create_user('bench', password='secret')
+        cases = {case for case, _ in view_cases(user) + property_cases(user)}
+        for dataset in DATASETS:
+            self.assertEqual(set(baseline['results'][dataset]), cases)
@@ -15,6 +15,8 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('transactions/', views.transaction_list, name='transaction_list'),
     path('transactions/add/', views.add_transaction, name='add_transaction'),
+    path('transactions/import/', views.import_transactions_view, name='import_transactions'),
+    path('transactions/export/', views.export_transactions, name='export_transactions'),
     path('transactions/edit/<int:pk>/', views.edit_transaction, name='edit_transaction'),
     path('transactions/delete/<int:pk>/', views.delete_transaction, name='delete_transaction'),
     
@@ -39,4 +41,12 @@ urlpatterns = [
     # AJAX URLs for dynamic content
     path('api/expense-data/', views.expense_data_api, name='expense_data_api'),
     path('api/budget-progress/', views.budget_progress_api, name='budget_progress_api'),
+    path('api/transactions/', views.transactions_api, name='transactions_api'),
+    path('api/balance-series/', views.balance_series_api, name='balance_series_api'),
+    path('api/forecast/', views.forecast_api, name='forecast_api'),
+    
+    # Monitoring
+    path('metrics', views.metrics_view, name='metrics'),
+    path('profiles/', views.profiles_view, name='profiles'),
+    path('profiles/<str:profile_id>/download/', views.download_profile, name='download_profile'),
 ]
\ No newline at end of file
@@ -2,16 +2,41 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+)
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction as db_transaction
 from django.db.models import Sum, Count, Q
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
+import csv
+import hmac
+import io
+import itertools
 import json
 from datetime import datetime, date, timedelta
-from .models import UserProfile, Category, Budget, Transaction, FinancialTip, SavingsGoal
+from .models import (
+    Category, Budget, Transaction, FinancialTip, SavingsGoal,
+    MonthlyCategoryTotal
+)
+from .cache import cached_payload, conditional_on_user_data, stats as cache_stats
+from .metrics import view_metrics
+from .profiling import PROFILE_PARAM, ProfileStore, make_token
+from .importers import detect_format, import_transactions
+from . import forecasting
+from .ledger import balance_series
+from .onboarding import provision_user
+from .analytics import (
+    TREND_WINDOWS, approximate_transaction_count, dashboard_totals, monthly_trend
+)
+from .pagination import InvalidCursor, KeysetPaginator
+from .simulation import attach_probabilities
+from .periods import current_period
 from .forms import (
     CustomUserCreationForm, TransactionForm, BudgetForm, CategoryForm, 
-    UserProfileForm, SavingsGoalForm, DateRangeForm
+    UserProfileForm, SavingsGoalForm, DateRangeForm, TransactionImportForm
 )
 
 
@@ -54,11 +79,10 @@ def signup_view(request):
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             try:
-                user = form.save()
-                # Create user profile
-                UserProfile.objects.create(user=user)
-                # Create default categories
-                create_default_categories(user)
+                with db_transaction.atomic():
+                    # The profile is created by a post_save signal
+                    user = form.save()
+                    provision_user(user)
                 login(request, user)
                 messages.success(request, f'Welcome {user.first_name}! Your account has been created successfully.')
                 return redirect('dashboard')
@@ -72,126 +96,91 @@ def signup_view(request):
     return render(request, 'budget/signup.html', {'form': form})
 
 
-def create_default_categories(user):
-    """Create default categories for new users"""
-    default_categories = [
-        # Expense categories
-        {'name': 'Food & Dining', 'type': 'expense', 'icon': '🍽️', 'color': '#e74c3c'},
-        {'name': 'Transportation', 'type': 'expense', 'icon': '🚗', 'color': '#f39c12'},
-        {'name': 'Shopping', 'type': 'expense', 'icon': '🛍️', 'color': '#9b59b6'},
-        {'name': 'Entertainment', 'type': 'expense', 'icon': '🎬', 'color': '#3498db'},
-        {'name': 'Bills & Utilities', 'type': 'expense', 'icon': '💡', 'color': '#e67e22'},
-        {'name': 'Healthcare', 'type': 'expense', 'icon': '🏥', 'color': '#1abc9c'},
-        {'name': 'Education', 'type': 'expense', 'icon': '📚', 'color': '#34495e'},
-        # Income categories
-        {'name': 'Salary', 'type': 'income', 'icon': '💼', 'color': '#27ae60'},
-        {'name': 'Freelance', 'type': 'income', 'icon': '💻', 'color': '#2ecc71'},
-        {'name': 'Investment', 'type': 'income', 'icon': '📈', 'color': '#16a085'},
-    ]
-    
-    for cat_data in default_categories:
-        Category.objects.create(
-            user=user,
-            name=cat_data['name'],
-            category_type=cat_data['type'],
-            icon=cat_data['icon'],
-            color=cat_data['color']
-        )
+DASHBOARD_FORECAST_MONTHS = 3
 
 
 @login_required
 def dashboard(request):
     """Main dashboard view with enhanced financial insights"""
-    # Get or create user profile
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
-    
+    context = cached_payload(
+        request.user.pk,
+        f'dashboard:{date.today().isoformat()}',
+        lambda: dashboard_context(request.user)
+    )
+    forecast = forecasting.truncate(cached_forecast(request.user), DASHBOARD_FORECAST_MONTHS)
+    context = dict(
+        context, profile=request.profile, forecast=forecast,
+        forecast_rows=zip(forecast['months'], forecast['income'], forecast['expenses'], forecast['savings'])
+    )
+    return render(request, 'budget/dashboard.html', context)
+
+
+def transaction_summary(transaction):
+    """The values of a transaction that the dashboard renders"""
+    return {
+        'description': transaction.description,
+        'amount': transaction.amount,
+        'date': transaction.date,
+        'transaction_type': transaction.transaction_type,
+        'category': {'name': transaction.category.name, 'icon': transaction.category.icon},
+    }
+
+
+def budget_summary(budget):
+    """The values of a budget that the dashboard renders"""
+    return {
+        'category': {'name': budget.category.name, 'icon': budget.category.icon},
+        'amount': budget.amount,
+        'spent_amount': budget.spent_amount,
+        'remaining_amount': budget.remaining_amount,
+        'percentage_used': budget.percentage_used,
+        'is_over_budget': budget.is_over_budget,
+    }
+
+
+def savings_goal_summary(goal):
+    """The values of a savings goal that the dashboard renders"""
+    return {
+        'title': goal.title,
+        'current_amount': goal.current_amount,
+        'target_amount': goal.target_amount,
+        'progress_percentage': goal.progress_percentage,
+    }
+
+
+def dashboard_context(user):
+    """Build the cacheable part of the dashboard context
+
+    The result is cached, so it holds plain values rather than model
+    instances that a later model change could not unpickle.
+    """
     # Current month data
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    current_year, current_month = current_period()
     
-    # Get monthly totals - current month
-    monthly_income = Transaction.objects.filter(
-        user=request.user,
-        transaction_type='income',
-        date__month=current_month,
-        date__year=current_year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    monthly_expenses = Transaction.objects.filter(
-        user=request.user,
-        transaction_type='expense',
-        date__month=current_month,
-        date__year=current_year
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    # If no current month data, get last month's data for comparison
-    last_month = current_month - 1 if current_month > 1 else 12
-    last_month_year = current_year if current_month > 1 else current_year - 1
-    
-    if monthly_income == 0 and monthly_expenses == 0:
-        # Check if there's any data at all
-        total_income = Transaction.objects.filter(
-            user=request.user,
-            transaction_type='income'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        total_expenses = Transaction.objects.filter(
-            user=request.user,
-            transaction_type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # If there's historical data, use last month or recent data
-        if total_income > 0 or total_expenses > 0:
-            # Get last month's data
-            monthly_income = Transaction.objects.filter(
-                user=request.user,
-                transaction_type='income',
-                date__month=last_month,
-                date__year=last_month_year
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            monthly_expenses = Transaction.objects.filter(
-                user=request.user,
-                transaction_type='expense',
-                date__month=last_month,
-                date__year=last_month_year
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # If still no data, get last 30 days
-            if monthly_income == 0 and monthly_expenses == 0:
-                thirty_days_ago = datetime.now() - timedelta(days=30)
-                
-                monthly_income = Transaction.objects.filter(
-                    user=request.user,
-                    transaction_type='income',
-                    date__gte=thirty_days_ago
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                monthly_expenses = Transaction.objects.filter(
-                    user=request.user,
-                    transaction_type='expense',
-                    date__gte=thirty_days_ago
-                ).aggregate(total=Sum('amount'))['total'] or 0
+    # Monthly totals, falling back to last month or the last 30 days
+    totals = dashboard_totals(user, current_year, current_month, date.today())
+    monthly_income = totals['income']
+    monthly_expenses = totals['expenses']
     
     monthly_savings = monthly_income - monthly_expenses
     
     # Recent transactions
-    recent_transactions = Transaction.objects.filter(
-        user=request.user
-    ).order_by('-date')[:5]
+    recent_transactions = list(Transaction.objects.filter(
+        user=user
+    ).for_display().order_by('-date')[:5])
     
     # Budget overview - current month budgets
-    budgets = Budget.objects.filter(
-        user=request.user,
+    budgets = list(Budget.objects.filter(
+        user=user,
         month=current_month,
         year=current_year
-    ).select_related('category')
+    ).select_related('category').with_spend())
     
     # Savings goals
-    savings_goals = SavingsGoal.objects.filter(user=request.user)[:3]
+    savings_goals = list(SavingsGoal.objects.filter(user=user)[:3])
     
     # Financial tips
-    financial_tips = FinancialTip.objects.filter(is_active=True)[:3]
+    financial_tips = list(FinancialTip.objects.filter(is_active=True)[:3])
     
     # Calculate budget alerts
     budget_alerts = []
@@ -209,8 +198,7 @@ def dashboard(request):
     expense_ratio = (monthly_expenses / monthly_income * 100) if monthly_income > 0 else 0
     
     # Additional financial insights
-    total_transaction_count = Transaction.objects.filter(user=request.user).count()
-    average_monthly_expense = monthly_expenses  # Could be enhanced with historical average
+    total_transaction_count = totals['transaction_count']
     
     # Financial health status
     if monthly_income > 0:
@@ -235,8 +223,7 @@ def dashboard(request):
         financial_message = "Add income and expense transactions to see your financial health."
         financial_tip = "Start by recording your monthly income and tracking daily expenses."
     
-    context = {
-        'profile': profile,
+    return {
         'monthly_income': float(monthly_income),
         'monthly_expenses': float(monthly_expenses),
         'monthly_savings': float(monthly_savings),
@@ -246,23 +233,21 @@ def dashboard(request):
         'financial_message': financial_message,
         'financial_tip': financial_tip,
         'total_transaction_count': total_transaction_count,
-        'recent_transactions': recent_transactions,
-        'budgets': budgets,
-        'savings_goals': savings_goals,
-        'financial_tips': financial_tips,
+        'recent_transactions': [transaction_summary(transaction) for transaction in recent_transactions],
+        'budgets': [budget_summary(budget) for budget in budgets],
+        'savings_goals': [savings_goal_summary(goal) for goal in savings_goals],
+        'financial_tips': [
+            {'title': tip.title, 'content': tip.content, 'priority_color': tip.get_priority_color()}
+            for tip in financial_tips
+        ],
         'budget_alerts': budget_alerts,
         'current_month': current_month,
         'current_year': current_year,
     }
-    return render(request, 'budget/dashboard.html', context)
 
 
-@login_required
-def transaction_list(request):
-    """List all transactions with filtering"""
-    transactions = Transaction.objects.filter(user=request.user)
-    filter_form = DateRangeForm(request.GET, user=request.user)
-    
+def filter_transactions(transactions, filter_form):
+    """Apply the DateRangeForm filters to a transaction queryset"""
     if filter_form.is_valid():
         if filter_form.cleaned_data['start_date']:
             transactions = transactions.filter(date__gte=filter_form.cleaned_data['start_date'])
@@ -272,15 +257,48 @@ def transaction_list(request):
             transactions = transactions.filter(category=filter_form.cleaned_data['category'])
         if filter_form.cleaned_data['transaction_type']:
             transactions = transactions.filter(transaction_type=filter_form.cleaned_data['transaction_type'])
+    return transactions
+
+
+TRANSACTION_PAGE_ORDERING = ('-date', '-created_at', 'id')
+
+
+def filtered_count(user, filter_form):
+    """Approximate number of transactions matching the list filters"""
+    filters = filter_form.cleaned_data if filter_form.is_valid() else {}
+    return approximate_transaction_count(
+        user,
+        start_date=filters.get('start_date'),
+        end_date=filters.get('end_date'),
+        category=filters.get('category'),
+        transaction_type=filters.get('transaction_type'),
+    )
+
+
+@login_required
+def transaction_list(request):
+    """List all transactions with filtering"""
+    filter_form = DateRangeForm(request.GET, user=request.user)
+    transactions = filter_transactions(
+        Transaction.objects.filter(user=request.user), filter_form
+    ).for_display()
+    
+    # Keyset pagination: each page is one indexed seek, with no COUNT(*)
+    paginator = KeysetPaginator(transactions, TRANSACTION_PAGE_ORDERING, 20)
+    try:
+        page_obj = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = paginator.page()
     
-    # Pagination
-    paginator = Paginator(transactions, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    filter_query = request.GET.copy()
+    filter_query.pop('cursor', None)
+    filter_query.pop('page', None)
     
     return render(request, 'budget/transaction_list.html', {
         'page_obj': page_obj,
         'filter_form': filter_form,
+        'filter_query': filter_query.urlencode(),
+        'approximate_count': filtered_count(request.user, filter_form),
     })
 
 
@@ -300,6 +318,71 @@ def add_transaction(request):
     return render(request, 'budget/add_transaction.html', {'form': form})
 
 
+class Echo:
+    """File-like object that hands written rows straight back to the caller"""
+    def write(self, value):
+        return value
+
+
+EXPORT_COLUMNS = ['date', 'description', 'category', 'type', 'amount']
+
+
+@login_required
+def export_transactions(request):
+    """Stream the filtered transactions as CSV or NDJSON"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        export_format = 'csv'
+    filter_form = DateRangeForm(request.GET, user=request.user)
+    rows = filter_transactions(
+        Transaction.objects.filter(user=request.user), filter_form
+    ).values_list(
+        'date', 'description', 'category__name', 'transaction_type', 'amount'
+    ).iterator(chunk_size=2000)
+    
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        content = itertools.chain(
+            [writer.writerow(EXPORT_COLUMNS)],
+            (writer.writerow(row) for row in rows)
+        )
+        content_type = 'text/csv'
+    else:
+        content = (
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder) + '\n'
+            for row in rows
+        )
+        content_type = 'application/x-ndjson'
+    
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f'transactions-{date.today().isoformat()}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def import_transactions_view(request):
+    """Bulk import transactions from a CSV or OFX bank export"""
+    if request.method == 'POST':
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            file_format = form.cleaned_data['file_format']
+            if file_format == 'auto':
+                file_format = detect_format(upload.name)
+            lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+            result = import_transactions(request.user, lines, file_format)
+            messages.success(request, f'Imported {result.created} transactions '
+                                      f'({result.duplicates} duplicates and {result.skipped} invalid rows skipped) '
+                                      f'in {result.elapsed:.2f}s, {result.rows_per_second:.0f} rows/sec.')
+            for error in result.errors[:5]:
+                messages.warning(request, error)
+            return redirect('transaction_list')
+    else:
+        form = TransactionImportForm()
+    return render(request, 'budget/import_transactions.html', {'form': form})
+
+
 @login_required
 def edit_transaction(request, pk):
     """Edit existing transaction"""
@@ -333,14 +416,13 @@ def delete_transaction(request, pk):
 @login_required
 def budget_overview(request):
     """Budget overview and management"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    current_year, current_month = current_period()
     
     budgets = Budget.objects.filter(
         user=request.user,
         month=current_month,
         year=current_year
-    ).select_related('category')
+    ).select_related('category').with_spend()
     
     # Calculate total budgeted vs spent
     total_budgeted = sum(budget.amount for budget in budgets)
@@ -376,7 +458,10 @@ def create_budget(request):
 @login_required
 def edit_budget(request, pk):
     """Edit existing budget"""
-    budget = get_object_or_404(Budget, pk=pk, user=request.user)
+    budget = get_object_or_404(
+        Budget.objects.select_related('category').with_spend(),
+        pk=pk, user=request.user
+    )
     if request.method == 'POST':
         form = BudgetForm(request.POST, instance=budget, user=request.user)
         if form.is_valid():
@@ -409,7 +494,7 @@ def delete_budget(request, pk):
 @login_required
 def category_list(request):
     """List and manage categories"""
-    categories = Category.objects.filter(user=request.user).order_by('category_type', 'name')
+    categories = Category.objects.filter(user=request.user).with_stats().order_by('category_type', 'name')
     return render(request, 'budget/category_list.html', {'categories': categories})
 
 
@@ -449,11 +534,11 @@ def edit_category(request, pk):
 @login_required
 def delete_category(request, pk):
     """Delete existing category"""
-    category = get_object_or_404(Category, pk=pk, user=request.user)
+    category = get_object_or_404(Category.objects.with_stats(), pk=pk, user=request.user)
     
     # Check if category is being used in transactions or budgets
-    transaction_count = category.transactions.count()
-    budget_count = category.budgets.count()
+    transaction_count = category.transaction_count
+    budget_count = category.budget_count
     
     if request.method == 'POST':
         if transaction_count > 0 or budget_count > 0:
@@ -476,7 +561,7 @@ def delete_category(request, pk):
 @login_required
 def profile_view(request):
     """User profile management"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = request.profile
     if request.method == 'POST':
         form = UserProfileForm(request.POST, instance=profile)
         if form.is_valid():
@@ -486,17 +571,15 @@ def profile_view(request):
     else:
         form = UserProfileForm(instance=profile)
     
-    # Get user statistics
-    total_transactions = Transaction.objects.filter(user=request.user).count()
-    total_categories = Category.objects.filter(user=request.user).count()
-    total_budgets = Budget.objects.filter(user=request.user).count()
+    # User statistics come with the month figures in one query
+    summary = profile.summary()
     
     context = {
         'form': form, 
         'profile': profile,
-        'total_transactions': total_transactions,
-        'total_categories': total_categories,
-        'total_budgets': total_budgets,
+        'total_transactions': summary['transaction_count'],
+        'total_categories': summary['category_count'],
+        'total_budgets': summary['budget_count'],
     }
     return render(request, 'budget/profile.html', context)
 
@@ -504,68 +587,64 @@ def profile_view(request):
 @login_required
 def reports_view(request):
     """Financial reports and analytics"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    # Monthly trends, 6 months unless a longer window is requested
+    try:
+        trend_months = int(request.GET.get('months', 6))
+    except ValueError:
+        trend_months = 6
+    if trend_months not in TREND_WINDOWS:
+        trend_months = 6
+    
+    context = cached_payload(
+        request.user.pk,
+        f'reports:{date.today().isoformat()}:{trend_months}',
+        lambda: reports_context(request.user, trend_months)
+    )
+    return render(request, 'budget/reports.html', context)
+
+
+def reports_context(user, trend_months):
+    """Build the reports page context"""
+    current_year, current_month = current_period()
     
     # Monthly expense breakdown by category
-    expense_by_category = Transaction.objects.filter(
-        user=request.user,
+    expense_by_category = list(MonthlyCategoryTotal.objects.filter(
+        user=user,
         transaction_type='expense',
-        date__month=current_month,
-        date__year=current_year
+        month=current_month,
+        year=current_year
     ).values('category__name', 'category__color').annotate(
-        total=Sum('amount')
-    ).order_by('-total')
+        total=Sum('total')
+    ).order_by('-total'))
     
-    # Monthly trends (last 6 months)
-    monthly_trends = []
-    for i in range(6):
-        month = (current_month - i - 1) % 12 + 1
-        year = current_year if current_month - i > 0 else current_year - 1
-        
-        income = Transaction.objects.filter(
-            user=request.user,
-            transaction_type='income',
-            date__month=month,
-            date__year=year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        expenses = Transaction.objects.filter(
-            user=request.user,
-            transaction_type='expense',
-            date__month=month,
-            date__year=year
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        monthly_trends.append({
-            'month': f"{month}/{year}",
-            'income': float(income),
-            'expenses': float(expenses),
-            'savings': float(income - expenses)
-        })
+    monthly_trends = monthly_trend(user, current_year, current_month, trend_months)
     
     # Top spending categories (last 3 months)
-    three_months_ago = datetime.now() - timedelta(days=90)
-    top_categories = Transaction.objects.filter(
-        user=request.user,
+    three_months_ago = date.today() - timedelta(days=90)
+    top_categories = list(Transaction.objects.filter(
+        user=user,
         transaction_type='expense',
         date__gte=three_months_ago
     ).values('category__name').annotate(
         total=Sum('amount')
-    ).order_by('-total')[:5]
+    ).order_by('-total')[:5])
     
-    context = {
+    return {
         'expense_by_category': expense_by_category,
-        'monthly_trends': list(reversed(monthly_trends)),
+        'monthly_trends': monthly_trends,
+        'this_month': monthly_trends[-1],
+        'trend_months': trend_months,
+        'trend_windows': TREND_WINDOWS,
         'top_categories': top_categories,
     }
-    return render(request, 'budget/reports.html', context)
 
 
 @login_required
 def savings_goals_view(request):
     """Display and manage savings goals"""
-    savings_goals = SavingsGoal.objects.filter(user=request.user).order_by('-created_at')
+    savings_goals = attach_probabilities(
+        request.user.pk, SavingsGoal.objects.filter(user=request.user).order_by('-created_at')
+    )
     
     context = {
         'savings_goals': savings_goals,
@@ -624,46 +703,101 @@ def delete_savings_goal(request, pk):
 
 # API Views for AJAX requests
 @login_required
+@conditional_on_user_data
 def expense_data_api(request):
     """API endpoint for expense chart data"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    data = cached_payload(
+        request.user.pk,
+        f'expense-data:{date.today().isoformat()}',
+        lambda: expense_chart_data(request.user)
+    )
+    return JsonResponse(data)
+
+
+def expense_chart_data(user):
+    """Current month expenses by category for the chart API"""
+    current_year, current_month = current_period()
     
-    expense_data = Transaction.objects.filter(
-        user=request.user,
+    expense_data = MonthlyCategoryTotal.objects.filter(
+        user=user,
         transaction_type='expense',
-        date__month=current_month,
-        date__year=current_year
+        month=current_month,
+        year=current_year
     ).values('category__name', 'category__color').annotate(
-        total=Sum('amount')
+        total=Sum('total')
     )
     
-    if not expense_data:
-        return JsonResponse({
-            'labels': [],
-            'data': [],
-            'colors': [],
-        })
-    
-    data = {
+    return {
         'labels': [item['category__name'] for item in expense_data],
         'data': [float(item['total']) for item in expense_data],
         'colors': [item['category__color'] for item in expense_data],
     }
+
+
+@login_required
+def transactions_api(request):
+    """API endpoint listing transactions with cursor pagination"""
+    filter_form = DateRangeForm(request.GET, user=request.user)
+    transactions = filter_transactions(
+        Transaction.objects.filter(user=request.user), filter_form
+    ).for_display()
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 100)
+    except ValueError:
+        limit = 50
+    
+    paginator = KeysetPaginator(transactions, TRANSACTION_PAGE_ORDERING, limit)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    data = {
+        'results': [
+            {
+                'id': transaction.pk,
+                'date': transaction.date,
+                'description': transaction.description,
+                'amount': transaction.amount,
+                'transaction_type': transaction.transaction_type,
+                'category': {
+                    'id': transaction.category_id,
+                    'name': transaction.category.name,
+                    'icon': transaction.category.icon,
+                    'color': transaction.category.color,
+                },
+            }
+            for transaction in page
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+    if request.GET.get('count'):
+        data['approximate_count'] = filtered_count(request.user, filter_form)
     return JsonResponse(data)
 
 
 @login_required
+@conditional_on_user_data
 def budget_progress_api(request):
     """API endpoint for budget progress data"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    data = cached_payload(
+        request.user.pk,
+        f'budget-progress:{date.today().isoformat()}',
+        lambda: budget_progress_data(request.user)
+    )
+    return JsonResponse(data)
+
+
+def budget_progress_data(user):
+    """Current month budget progress for the chart API"""
+    current_year, current_month = current_period()
     
     budgets = Budget.objects.filter(
-        user=request.user,
+        user=user,
         month=current_month,
         year=current_year
-    )
+    ).select_related('category').with_spend()
     
     data = []
     for budget in budgets:
@@ -675,4 +809,108 @@ def budget_progress_api(request):
             'over_budget': budget.is_over_budget,
         })
     
-    return JsonResponse({'budgets': data})
+    return {'budgets': data}
+
+
+BALANCE_SERIES_DAYS = 90
+MAX_BALANCE_SERIES_DAYS = 3660
+
+
+@login_required
+@conditional_on_user_data
+def balance_series_api(request):
+    """API endpoint for the daily running balance between start and end"""
+    try:
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else date.today()
+        start = (
+            date.fromisoformat(request.GET['start']) if request.GET.get('start')
+            else end - timedelta(days=BALANCE_SERIES_DAYS - 1)
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD'}, status=400)
+    if start > end or (end - start).days >= MAX_BALANCE_SERIES_DAYS:
+        return JsonResponse(
+            {'error': f'start must not be after end, and the range at most {MAX_BALANCE_SERIES_DAYS} days'},
+            status=400
+        )
+    data = cached_payload(
+        request.user.pk,
+        f'balance-series:{start.isoformat()}:{end.isoformat()}',
+        lambda: balance_series_data(request.user, start, end)
+    )
+    return JsonResponse(data)
+
+
+def balance_series_data(user, start, end):
+    """Daily net cash flow and running balance for the balance chart API"""
+    opening, series = balance_series(user.pk, start, end)
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'opening_balance': float(opening),
+        'labels': [day.isoformat() for day, _, _ in series],
+        'net': [float(net) for _, net, _ in series],
+        'balance': [float(balance) for _, _, balance in series],
+    }
+
+
+@login_required
+@conditional_on_user_data
+def forecast_api(request):
+    """API endpoint for the projected income, expenses and savings of the next months"""
+    try:
+        horizon = int(request.GET.get('months', forecasting.DEFAULT_HORIZON))
+    except ValueError:
+        horizon = 0
+    if not forecasting.MIN_HORIZON <= horizon <= forecasting.MAX_HORIZON:
+        return JsonResponse(
+            {'error': f'months must be from {forecasting.MIN_HORIZON} to {forecasting.MAX_HORIZON}'},
+            status=400
+        )
+    return JsonResponse(forecasting.truncate(cached_forecast(request.user), horizon))
+
+
+def cached_forecast(user):
+    """The user's MAX_HORIZON forecast, shared with the forecast_cash_flow command"""
+    today = date.today()
+    return cached_payload(
+        user.pk,
+        forecasting.payload_name(today.year, today.month),
+        lambda: forecasting.forecast_user(user.pk, today=today),
+        forecasting.FORECAST_CACHE_TIMEOUT
+    )
+
+
+def metrics_view(request):
+    """Per-view request metrics in Prometheus text format, for staff or METRICS_TOKEN"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    has_token = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    if not has_token and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        view_metrics.render(cache=cache_stats.snapshot()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@staff_member_required
+def profiles_view(request):
+    """Recent request profiles with their top functions and SQL"""
+    profiles = ProfileStore().recent()
+    for profile in profiles:
+        profile['created'] = datetime.fromtimestamp(profile['created'])
+    return render(request, 'budget/profiles.html', {
+        'profiles': profiles,
+        'profile_param': PROFILE_PARAM,
+        'profile_token': make_token(request.user),
+    })
+
+
+@staff_member_required
+def download_profile(request, profile_id):
+    """Download a stored .prof file for pstats or snakeviz"""
+    path = ProfileStore().prof_path(profile_id)
+    if path is None:
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
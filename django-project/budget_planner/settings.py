@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,19 +44,23 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'budget.middleware.ServerTimingMiddleware',
+    'budget.middleware.QueryInspectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'budget.middleware.UserProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'budget.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'budget_planner.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'budget.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,6 +88,57 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; set REDIS_URL to share the cache between workers.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'budget-planner',
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+
+# Serve categories from the per-worker registry (budget/categories.py). Its
+# entries are invalidated through the cache, so by default it is only used
+# when the cache is shared (REDIS_URL); set BUDGET_CATEGORY_REGISTRY=1 to use
+# it with the local memory cache in a single-process deployment, or 0 to
+# turn it off.
+BUDGET_CATEGORY_REGISTRY = {'1': True, '0': False}.get(os.environ.get('BUDGET_CATEGORY_REGISTRY', ''))
+
+# Seconds a computed dashboard/report/API payload stays cached. Payloads are
+# also invalidated as soon as the user changes any of their data.
+BUDGET_CACHE_TIMEOUT = 300
+
+# What to do when a request exceeds its query budget (budget/query_budgets.py)
+# or repeats a statement: 'warn', 'raise' (CI), 'log' (sampled) or '' for off.
+BUDGET_QUERY_INSPECTOR_MODE = os.environ.get('BUDGET_QUERY_INSPECTOR_MODE', 'warn' if DEBUG else 'log')
+BUDGET_QUERY_INSPECTOR_SAMPLE_RATE = float(os.environ.get('BUDGET_QUERY_INSPECTOR_SAMPLE_RATE', '0.01'))
+
+# Bearer token that lets a scraper read /metrics without a staff session
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Request profiling (budget/profiling.py): share of requests to profile at
+# random, where profiles are written (outside the source tree unless
+# BUDGET_PROFILE_DIR says otherwise) and how many of the newest are kept
+BUDGET_PROFILE_SAMPLE_RATE = float(os.environ.get('BUDGET_PROFILE_SAMPLE_RATE', '0'))
+BUDGET_PROFILE_DIR = Path(
+    os.environ.get('BUDGET_PROFILE_DIR') or Path(tempfile.gettempdir()) / 'budget-planner-profiles'
+)
+BUDGET_PROFILE_KEEP = 50
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
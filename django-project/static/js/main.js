@@ -41,10 +41,52 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Fetch JSON with conditional headers, reusing the stored body on 304
+function fetchJsonConditional(url) {
+    const storageKey = `conditional:${url}`;
+    let stored = null;
+    try {
+        stored = JSON.parse(sessionStorage.getItem(storageKey));
+    } catch (error) {
+        stored = null;
+    }
+
+    const headers = {};
+    if (stored) {
+        if (stored.etag) {
+            headers['If-None-Match'] = stored.etag;
+        }
+        if (stored.lastModified) {
+            headers['If-Modified-Since'] = stored.lastModified;
+        }
+    }
+
+    return fetch(url, { headers: headers, cache: 'no-store', credentials: 'same-origin' })
+        .then(response => {
+            if (response.status === 304 && stored) {
+                return stored.data;
+            }
+            if (!response.ok) {
+                throw new Error(`Request for ${url} failed with ${response.status}`);
+            }
+            return response.json().then(data => {
+                try {
+                    sessionStorage.setItem(storageKey, JSON.stringify({
+                        etag: response.headers.get('ETag'),
+                        lastModified: response.headers.get('Last-Modified'),
+                        data: data
+                    }));
+                } catch (error) {
+                    // Storage full or disabled: just skip the conditional cache
+                }
+                return data;
+            });
+        });
+}
+
 // Initialize expense pie chart
 function initializeExpenseChart() {
-    fetch('/api/expense-data/')
-        .then(response => response.json())
+    fetchJsonConditional('/api/expense-data/')
         .then(data => {
             const ctx = document.getElementById('expenseChart').getContext('2d');
             new Chart(ctx, {
@@ -90,8 +132,7 @@ function initializeExpenseChart() {
 
 // Initialize budget progress indicators
 function initializeBudgetProgress() {
-    fetch('/api/budget-progress/')
-        .then(response => response.json())
+    fetchJsonConditional('/api/budget-progress/')
         .then(data => {
             data.budgets.forEach(budget => {
                 updateBudgetProgressBar(budget);